@@ -4,13 +4,38 @@ Api routes for hw_proxy module
 import logging
 import asyncio
 import base64
+from typing import Any, Literal, Optional, Union
 from fastapi import APIRouter, HTTPException, Header, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from escpos.printer import Dummy
+from hw_proxy.tools.connection_manager import connection_manager
+from hw_proxy.tools.print_spooler import PrintJob, print_spooler
+from hw_proxy.tools.receipt_cache import receipt_cache
+from hw_proxy.tools.spool_journal import spool_journal
+from hw_proxy.tools.receipt_templates import receipt_templates
+from hw_proxy.tools.glyph_atlas import glyph_atlas
+from hw_proxy.tools.nv_graphics import NvGraphic, nv_graphics
 from hw_proxy.tools.pos_helper import EscPosHelper
-from hw_proxy.core.schemas import PrintRequest
-from hw_proxy.core.deps import get_templates
+from hw_proxy.tools.text_receipt import parse_markup
+from hw_proxy.tools.status_poller import status_poller
+from hw_proxy.tools.device_helper import DeviceHelper
+from hw_proxy.tools.device_registry import device_registry
+from hw_proxy.tools.metrics import metrics
+from hw_proxy.core.schemas import (
+    BatchRequest,
+    BinaryPrintRequest,
+    ItemTicketsRequest,
+    TemplateReceiptRequest,
+    TextReceiptRequest
+)
 from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import (
+    HwDeviceError,
+    HwImageError,
+    HwQueueFullError,
+    HwTemplateError
+)
+from hw_proxy.core.supported_devices import DeviceType
 
 logger = logging.getLogger("hw_proxy")
 
@@ -20,6 +45,64 @@ IOT_BOX_SECRET = None
 # --- Constantes ESC/POS legibles ---
 CMD_CUT = b"\x1D\x56\x01"        # Corte completo
 CMD_CASHDRAWER = b"\x1B\x70\x00\x19\xFA"  # Apertura de cajón
+# Actions Odoo can run with default_printer_action
+DEFAULT_PRINTER_ACTIONS = (
+    "print_receipt", "cut_receipt", "cashbox", "cashdrawer",
+    "print_text", "print_markup", "print_tickets"
+)
+# Spooler actions only run from their own endpoint
+ACTION_ENDPOINTS = {
+    "print_raw": "/binary_printer_action",
+    "batch": "/batch_printer_action",
+    "nv_store": "/nv_graphics/{key}",
+    "nv_delete": "/nv_graphics/{key}"
+}
+
+
+def get_printer_key(printer_name: Optional[Union[str, int]] = None) -> str:
+    """
+    Get device or printer group key a request is routed to.
+
+    printer_name is a device or group key, name or Odoo printer id,
+    PRINTER_KEY setting is used when not set.
+    """
+    if printer_name is None or str(printer_name).strip() == "":
+        return settings.PRINTER_KEY
+    device_key = DeviceHelper.find_device_key(printer_name)\
+        or DeviceHelper.find_group_key(printer_name)
+    if device_key is None:
+        raise HwDeviceError(f"Unknown printer: {printer_name}")
+    return device_key
+
+
+def get_printer_columns(printer_key: str) -> int:
+    """Get characters per line of a printer, or of a group first member."""
+    group = DeviceHelper.select_group(printer_key)
+    if group is not None:
+        printer_key = group.members[0]
+    return EscPosHelper(printer_key).get_text_columns()
+
+
+def get_printer_devices(printer_name: Optional[str] = None) -> list:
+    """Get device keys of a printer, or of a printer group members."""
+    try:
+        printer_key = get_printer_key(printer_name)
+    except HwDeviceError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    group = DeviceHelper.select_group(printer_key)
+    return list(group.members) if group is not None else [printer_key]
+
+
+def get_request_printer_name(params: dict) -> Optional[Any]:
+    """Get printer name or Odoo printer id of a JSON-RPC request params."""
+    data = params.get("data")
+    if not isinstance(data, dict):
+        data = {}
+    for source in (data, params):
+        for name in ("printer_name", "printer_id"):
+            if source.get(name) not in (None, ""):
+                return source.get(name)
+    return None
 
 
 # --- Security Dependency ---
@@ -80,23 +163,45 @@ async def status_json(req: Request):
     Get Hardware status.
     Only accept printer and cashdrawer.
     Exact expected output is not clear.
+    Printer status is answered from the status poller cache,
+    printer_detail holds its updated_at timestamp and age in seconds.
+    Main status is the one of the requested printer, or PRINTER_KEY,
+    printers holds the status of every configured printer.
     """
     try:
-        logger.debug(
-            f"[status_json] Get printer status for device: {settings.PRINTER_KEY}"
+        try:
+            body = await req.json()
+        except ValueError:
+            body = {}
+        params = body.get("params") if isinstance(body, dict) else None
+        printer_key = get_printer_key(
+            get_request_printer_name(params if isinstance(params, dict) else {})
         )
-        pos = EscPosHelper(settings.PRINTER_KEY)
-        #await asyncio.to_thread(pos.get_printer_status())
-        status = pos.get_full_printer_status()
+        group = DeviceHelper.select_group(printer_key)
+        if group is not None:
+            # A printer group is ready if one of its members is
+            printer_key = next(
+                (
+                    key for key in group.members
+                    if status_poller.get_status(key).is_ready()
+                ),
+                group.members[0]
+            )
         logger.debug(
-            f"[status_json] status: {status}"
-        )
-        current_status = pos.get_str_full_printer_status(
-            printer_status=status
+            f"[status_json] Get printer status for device: {printer_key}"
         )
+        printer_status = status_poller.get_status(printer_key)
+        status = printer_status.to_dict()
+        current_status = printer_status.get_str_status()
         logger.debug(
-            f"[status_json] current_status: {current_status}"
+            f"[status_json] current_status: {current_status}, "
+            f"age: {status.get('age')}"
         )
+        printers = {}
+        for device_key in DeviceHelper.get_device_keys(DeviceType.PRINTER):
+            device_status = status_poller.get_status(device_key)
+            printers[device_key] = device_status.to_dict()
+            printers[device_key]["status"] = device_status.get_str_status()
         return JSONResponse({
             "jsonrpc": "2.0",
             # in case of global status is required
@@ -125,7 +230,8 @@ async def status_json(req: Request):
             "display": {  # Possible: no utilities to work
                 "status": "disconnected"
             },
-            "printer_detail": status
+            "printer_detail": status,
+            "printers": printers
         })
     except Exception as e:
         logger.error(f"Error in status_json: {e}")
@@ -134,15 +240,170 @@ async def status_json(req: Request):
             detail=f"Internal Server Error: {e}"
         ) from e
 
+def get_queue_full_exception(
+    error: HwQueueFullError,
+    detail: Optional[Any] = None
+) -> HTTPException:
+    """Get 429 response of a job rejected by the spooler, with Retry-After."""
+    return HTTPException(
+        status_code=429,
+        detail=detail if detail is not None else str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def read_request_body(req: Request, max_bytes: int = 0) -> bytearray:
+    """
+    Read request body chunk by chunk into one buffer,
+    with a 413 response once over max_bytes (0: no limit),
+    so an oversized body is never held whole.
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Request body over {max_bytes} bytes."
+    )
+    length = req.headers.get("content-length")
+    if max_bytes and length is not None and length.isdigit()\
+            and int(length) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in req.stream():
+        body += chunk
+        if max_bytes and len(body) > max_bytes:
+            raise too_large
+    return body
+
+
+def check_default_action(action: Optional[str], receipt: Any):
+    """
+    Raise ValueError if action can not be run by default_printer_action,
+    or if its receipt is not valid, see check_markup_receipt().
+    """
+    if action not in DEFAULT_PRINTER_ACTIONS:
+        endpoint = ACTION_ENDPOINTS.get(action)
+        raise ValueError(
+            f"Unsupported printer action: {action}"
+            + (f", use {endpoint}" if endpoint is not None else "")
+        )
+    check_markup_receipt(action, receipt)
+
+
+def check_markup_receipt(action: Optional[str], receipt: Any):
+    """
+    Raise ValueError if a print_markup receipt is not valid markup,
+    so it is rejected before being queued, not half printed.
+    """
+    if action != "print_markup":
+        return
+    if not isinstance(receipt, str):
+        raise ValueError("Receipt markup must be a string.")
+    parse_markup(receipt)
+
+
+async def wait_job_result(job) -> bool:
+    """
+    Get job result in "completed" response mode,
+    or True once queued in "accepted" mode,
+    after the job is committed to the spool journal if enabled.
+    """
+    await job.wait_journaled()
+    if settings.PRINT_RESPONSE_MODE == "accepted":
+        return True
+    return await job.wait(timeout=settings.PRINT_JOB_TIMEOUT)
+
+
+async def run_spooled_job(
+    request: Any,
+    action: str,
+    receipt: Any = None,
+    task: str = "run printer action",
+    **debug_content
+) -> JSONResponse:
+    """
+    Queue the job of a print request and get its JSON response.
+
+    request holds printer_name, request_id and debug,
+    and cut and cashdrawer when the action supports them.
+    debug adds the job stage timings and stats to the response,
+    with debug_content items. An unknown printer gets a 404 response,
+    a job over the device queue limits a 429 response.
+    """
+    job = None
+    try:
+        try:
+            printer_key = get_printer_key(request.printer_name)
+        except HwDeviceError as e:
+            raise HTTPException(status_code=404, detail=str(e)) from e
+        job = print_spooler.submit(
+            printer_key,
+            action=action,
+            receipt=receipt,
+            request_id=request.request_id,
+            cut=getattr(request, "cut", True),
+            cashdrawer=getattr(request, "cashdrawer", False)
+        )
+        result = await wait_job_result(job)
+        content = {
+            "success": result is True,
+            "job_id": job.job_id,
+            "error": job.error
+        }
+        if request.debug:
+            content["timings"] = job.get_timings()
+            content["stats"] = job.stats
+            content.update(debug_content)
+        return JSONResponse(content=content)
+    except HTTPException:
+        raise
+    except HwQueueFullError as e:
+        raise get_queue_full_exception(e) from e
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Unable to {task}: job {job.job_id} still running after "
+            f"{settings.PRINT_JOB_TIMEOUT}s"
+        )
+        return JSONResponse(
+            content={
+                "success": False,
+                "job_id": job.job_id,
+                "error": "Printer action timeout"
+            }
+        )
+    except Exception as e:
+        logger.error(f"Fatal Error: Unable to {task}")
+        logger.debug(f"Exception: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "job_id": job.job_id if job is not None else None,
+                "error": f"Fatal Error: Unable to {task}"
+            }
+        )
+
+
 @router.post("/default_printer_action")
 async def default_printer_action(req: Request):
     """
     Handle generic default_printer_action calls from Odoo POS
     see odoo  /web/static/src/core/network/rpc.js 
     For response format.
+
+    The action is queued on the spooler of the printer
+    given by printer_name or printer_id, else of PRINTER_KEY.
+    Only DEFAULT_PRINTER_ACTIONS are accepted, other spooler actions
+    are run from their own endpoint.
+    The response is sent once the job is accepted or completed,
+    depending on PRINT_RESPONSE_MODE setting.
+    Jobs are run by priority class: cash drawer, cut, receipt,
+    and low with a "low" priority param, e.g. for reprints and reports.
+    A cut queued behind a receipt is run right after that receipt.
+    With a true debug param, the result holds the job stage timings.
     """
     logger.debug("Start Default printer Action...")
     action = None
+    body = {}
+    job = None
     try:
         body = await req.json()
         req_id = body.get("id")
@@ -150,19 +411,27 @@ async def default_printer_action(req: Request):
         data = params.get("data", {})
         action = data.get("action")
         receipt = data.get("receipt")
-        pos = EscPosHelper(settings.PRINTER_KEY)
-        # asyncio.create_task(asyncio.to_thread(_job))
-        result = pos.default_printer_action(
+        printer_key = get_printer_key(get_request_printer_name(params))
+        debug = params.get("debug") is True or data.get("debug") is True
+        check_default_action(action, receipt)
+        job = print_spooler.submit(
+            printer_key,
             action=action,
-            receipt=receipt
+            receipt=receipt,
+            request_id=req_id,
+            priority=params.get("priority") or data.get("priority")
         )
+        result = await wait_job_result(job)
         if result:
             # Successful response
+            content = {"success": True, "job_id": job.job_id}
+            if debug:
+                content["timings"] = job.get_timings()
             return JSONResponse(
                 content={
                     "jsonrpc": "2.0",
                     "id": req_id,
-                    "result": {"success": True}
+                    "result": content
                 }
             )
         else:
@@ -174,11 +443,75 @@ async def default_printer_action(req: Request):
                     "error": {
                         "code": -1,
                         "message": "Unable to run printer action",
-                        "data": {"action": action}
+                        "data": {
+                            "action": action,
+                            "job_id": job.job_id,
+                            "timings": job.get_timings() if debug else None
+                        }
                     }
                 }
             )
 
+    except HwQueueFullError as e:
+        raise get_queue_full_exception(
+            e,
+            detail={
+                "jsonrpc": "2.0",
+                "id": body.get("id"),
+                "error": {
+                    "code": -1,
+                    "message": str(e),
+                    "data": {"action": action, "retry_after": e.retry_after}
+                }
+            }
+        ) from e
+
+    except ValueError as e:
+        logger.error(f"Invalid printer action: {action}, error: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "jsonrpc": "2.0",
+                "id": body.get("id"),
+                "error": {
+                    "code": -1,
+                    "message": str(e),
+                    "data": {"action": action}
+                }
+            }
+        ) from e
+
+    except HwDeviceError as e:
+        logger.error(f"Unable to route printer action: {action}, error: {e}")
+        return JSONResponse(
+            content={
+                "jsonrpc": "2.0",
+                "id": body.get("id"),
+                "error": {
+                    "code": -1,
+                    "message": str(e),
+                    "data": {"action": action}
+                }
+            }
+        )
+
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Printer action: {action} still running after "
+            f"{settings.PRINT_JOB_TIMEOUT}s, job: {job.job_id}"
+        )
+        return JSONResponse(
+            content={
+                "jsonrpc": "2.0",
+                "id": body.get("id"),
+                "error": {
+                    "code": -1,
+                    "message": "Printer action timeout",
+                    "data": {"action": action, "job_id": job.job_id}
+                }
+            }
+        )
+
     except Exception as e:
         logger.error(f"Fatal Error: Unable to run printer action: {action}")
         logger.debug(f"Exception: {e}")
@@ -192,18 +525,347 @@ async def default_printer_action(req: Request):
                 "error": {
                     "code": -1,
                     "message": f"Fatal Error: Unable to run printer action: {action}",
-                    "data": {"action": action}
+                    "data": {
+                        "action": action,
+                        "job_id": job.job_id if job is not None else None
+                    }
                 }
             }
         )
 
 
+@router.post("/binary_printer_action")
+async def binary_printer_action(
+    req: Request,
+    action: Literal["print_receipt", "print_raw"] = "print_receipt",
+    cut: bool = True,
+    cashdrawer: bool = False,
+    request_id: Optional[str] = None,
+    printer_name: Optional[str] = None,
+    debug: bool = False
+):
+    """
+    Print a receipt sent as raw request body (application/octet-stream),
+    without base64 nor JSON encoding.
+
+    - print_receipt: body is an image file (PNG, JPEG...)
+    - print_raw: body is raw ESC/POS data
+
+    Metadata is read from the query string,
+    printer_name routes the job as for default_printer_action,
+    debug adds the job stage timings and stats to the response.
+    The body is streamed into the job payload, and rejected with 413
+    once over the printer queue max_bytes limit.
+    """
+    try:
+        printer_key = get_printer_key(printer_name)
+    except HwDeviceError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    payload = await read_request_body(
+        req,
+        max_bytes=print_spooler.get_queue_limits(printer_key)["max_bytes"]
+    )
+    if not payload:
+        raise HTTPException(
+            status_code=400,
+            detail="Empty request body."
+        )
+    return await run_spooled_job(
+        BinaryPrintRequest(
+            printer_name=printer_name,
+            cut=cut,
+            cashdrawer=cashdrawer,
+            request_id=request_id,
+            debug=debug
+        ),
+        action=action,
+        receipt=payload,
+        task=f"run binary printer action: {action}"
+    )
+
+
+@router.post("/batch_printer_action")
+async def batch_printer_action(request: BatchRequest):
+    """
+    Run several printer actions in one printer session:
+    receipts, raw ESC/POS, text receipts, cuts and cash drawer kicks.
+
+    The printer status is checked once for the whole batch,
+    and cut and cash drawer bytes are sent with the receipt before them.
+    printer_name routes the job as for default_printer_action,
+    debug adds the job stage timings and stats to the response.
+    """
+    try:
+        for item in request.actions:
+            check_markup_receipt(item.action, item.receipt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return await run_spooled_job(
+        request,
+        action="batch",
+        receipt=[action.model_dump() for action in request.actions],
+        task="run batch printer actions"
+    )
+
+
+@router.post("/text_receipt")
+async def text_receipt(request: TextReceiptRequest):
+    """
+    Print a structured receipt with the printer fonts:
+    header, item lines, totals and footer, as JSON.
+
+    Receipts are sent as ESC/POS text and style commands,
+    a few hundred bytes instead of a raster image.
+    Lines with characters missing from the printer code pages
+    are printed as images.
+    printer_name routes the job as for default_printer_action,
+    debug adds the job stage timings and stats to the response.
+    """
+    return await run_spooled_job(
+        request,
+        action="print_text",
+        receipt=request.receipt,
+        task="print text receipt"
+    )
+
+
+@router.post("/item_tickets")
+async def item_tickets(request: ItemTicketsRequest):
+    """
+    Print one ticket per order item, or per unit with per_unit,
+    each with the order header and footer, e.g. one per drink.
+
+    Header and footer are encoded once and every ticket
+    is sent with its cut in a single printer session.
+    printer_name routes the job as for default_printer_action,
+    debug adds the job stage timings and stats to the response.
+    """
+    return await run_spooled_job(
+        request,
+        action="print_tickets",
+        receipt=request.receipt,
+        task="print item tickets"
+    )
+
+
+@router.post("/template_receipt")
+async def template_receipt(request: TemplateReceiptRequest):
+    """
+    Print a receipt template rendered with order data.
+
+    Templates are stored under TEMPLATES_BASE_PATH/receipts as <name>.j2,
+    and render to receipt markup printed with the printer fonts.
+    printer_name routes the job as for default_printer_action,
+    debug adds the job stage timings, stats and markup to the response.
+    """
+    try:
+        printer_key = get_printer_key(request.printer_name)
+    except HwDeviceError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    if not receipt_templates.exists(request.template):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown receipt template: {request.template}"
+        )
+    try:
+        markup = receipt_templates.render(
+            request.template,
+            request.data,
+            columns=get_printer_columns(printer_key)
+        )
+    except HwTemplateError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return await run_spooled_job(
+        request,
+        action="print_markup",
+        receipt=markup,
+        task=f"print receipt template: {request.template}",
+        markup=markup
+    )
+
+
+def submit_nv_job(
+    device_key: str,
+    action: str,
+    key: str,
+    previous: Optional[NvGraphic]
+) -> PrintJob:
+    """
+    Queue a NV graphics job, the registry was already updated
+    for the printer to read it. If the job is not queued, the graphic
+    tracked before is restored, so the registry matches the printer.
+    """
+    try:
+        return print_spooler.submit(device_key, action=action, receipt=key)
+    except Exception as e:
+        if previous is not None:
+            nv_graphics.restore(previous)
+        else:
+            nv_graphics.remove(device_key, key)
+        if isinstance(e, HwQueueFullError):
+            raise get_queue_full_exception(e) from e
+        raise
+
+
+@router.get("/nv_graphics")
+async def get_nv_graphics(printer_name: Optional[str] = None):
+    """List graphics stored in printers NV memory."""
+    if printer_name is None:
+        return nv_graphics.get_stats()
+    return {
+        "graphics": [
+            graphic.to_dict()
+            for device_key in get_printer_devices(printer_name)
+            for graphic in nv_graphics.get_graphics(device_key)
+        ]
+    }
+
+
+@router.post("/nv_graphics/{key}")
+async def store_nv_graphic(
+    key: str,
+    req: Request,
+    printer_name: Optional[str] = None,
+    header: bool = False
+):
+    """
+    Store an image (raw PNG, JPEG... body) in printer NV memory as key,
+    two printable characters.
+
+    With header, receipt images starting with this exact band
+    print it from NV memory, on devices with image_conf nv_headers.
+    A printer group stores it in every member.
+    NV memory supports a limited number of writes: upload on changes only.
+    """
+    payload = await req.body()
+    if not payload:
+        raise HTTPException(status_code=400, detail="Empty request body.")
+    try:
+        nv_graphics.check_key(key)
+        img = EscPosHelper.format_bytes_to_image(payload, mode=None)
+    except (ValueError, HwImageError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    jobs = []
+    for device_key in get_printer_devices(printer_name):
+        previous = nv_graphics.get(device_key, key)
+        nv_graphics.add(
+            device_key,
+            key,
+            img,
+            header=header,
+            dither=EscPosHelper(device_key).get_image_conf().dither
+        )
+        jobs.append(submit_nv_job(
+            device_key,
+            action="nv_store",
+            key=key,
+            previous=previous
+        ))
+    try:
+        results = await asyncio.gather(*(
+            job.wait(timeout=settings.PRINT_JOB_TIMEOUT) for job in jobs
+        ))
+    except asyncio.TimeoutError:
+        results = [job.result is True for job in jobs]
+    graphics = (nv_graphics.get(job.device_key, key) for job in jobs)
+    return JSONResponse(content={
+        "success": all(result is True for result in results),
+        "jobs": [
+            {
+                "device_key": job.device_key,
+                "job_id": job.job_id,
+                "error": job.error
+            }
+            for job in jobs
+        ],
+        "graphics": [
+            graphic.to_dict() for graphic in graphics if graphic is not None
+        ]
+    })
+
+
+@router.delete("/nv_graphics/{key}")
+async def delete_nv_graphic(key: str, printer_name: Optional[str] = None):
+    """Delete a graphic from printer NV memory and stop tracking it."""
+    jobs = []
+    for device_key in get_printer_devices(printer_name):
+        previous = nv_graphics.remove(device_key, key)
+        if previous is None:
+            continue
+        jobs.append(submit_nv_job(
+            device_key,
+            action="nv_delete",
+            key=key,
+            previous=previous
+        ))
+    if not jobs:
+        raise HTTPException(
+            status_code=404,
+            detail=f"NV graphic not found: {key}"
+        )
+    return {
+        "success": True,
+        "jobs": [job.job_id for job in jobs]
+    }
+
+
+@router.get("/proxy_status")
+async def proxy_status():
+    """Get hw_proxy internals status: connections, workers and caches."""
+    return {
+        "devices": device_registry.get_stats(),
+        "connections": connection_manager.get_stats(),
+        "workers": print_spooler.get_stats(),
+        "receipt_cache": receipt_cache.get_stats(),
+        "receipt_templates": receipt_templates.get_stats(),
+        "glyph_atlas": glyph_atlas.get_stats(),
+        "nv_graphics": nv_graphics.get_stats(),
+        "spool_journal": spool_journal.get_stats()
+    }
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Get hw_proxy metrics in Prometheus text exposition format."""
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/jobs")
+async def get_jobs(device_key: Optional[str] = None):
+    """List tracked print jobs, newest last."""
+    return {
+        "jobs": [
+            job.to_dict()
+            for job in print_spooler.get_jobs(device_key=device_key)
+        ],
+        "workers": print_spooler.get_stats()
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get print job status: queued, printing, done or failed."""
+    job = print_spooler.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Print job not found: {job_id}"
+        )
+    return job.to_dict()
+
+
 @router.post("/open_cashdrawer")
-async def open_cashdrawer():
+async def open_cashdrawer(printer_name: Optional[str] = None):
     """Open cash drawer without printing."""
     try:
-        pos = EscPosHelper(settings.PRINTER_KEY)
-        pos.open_cashdrawer()
+        job = print_spooler.submit(
+            get_printer_key(printer_name),
+            action="cashbox"
+        )
+        await job.wait(timeout=settings.PRINT_JOB_TIMEOUT)
     except Exception as e:
         logger.error("Unable to oppen cash drawer.")
         logger.debug("Exception: {e}")
@@ -218,9 +880,9 @@ async def open_cashdrawer():
 @router.post("/cut")
 async def cut_paper(printer_name: str):
     """Cut paper without printing."""
-    async def _job():
-        pos = EscPosHelper(settings.PRINTER_KEY)
-        printer = pos.get_printer()
-        await asyncio.to_thread(printer._raw, CMD_CUT)
-    asyncio.create_task(_job())
-    return {"success": True}
+    try:
+        printer_key = get_printer_key(printer_name)
+    except HwDeviceError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    job = print_spooler.submit(printer_key, action="cut_receipt")
+    return {"success": True, "job_id": job.job_id}
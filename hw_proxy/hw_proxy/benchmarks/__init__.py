@@ -0,0 +1 @@
+"""hw_proxy Benchmarks module"""
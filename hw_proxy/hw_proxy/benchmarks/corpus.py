@@ -0,0 +1,94 @@
+"""
+Synthetic Odoo like receipt images for hw_proxy benchmarks
+"""
+import base64
+from io import BytesIO
+from typing import Callable, Dict
+from PIL import Image, ImageDraw
+
+RECEIPT_WIDTH = 512
+LINE_HEIGHT = 28
+MARGIN = 16
+
+
+def make_receipt(lines: int, width: int = RECEIPT_WIDTH) -> Image.Image:
+    """
+    Draw a receipt with a title, lines items and a total,
+    rendered on white RGB background as Odoo POS does.
+    """
+    height = MARGIN * 2 + LINE_HEIGHT * (lines + 6)
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    y = MARGIN
+    draw.text((width // 2 - 60, y), "Fiesta POS", fill=(0, 0, 0))
+    y += LINE_HEIGHT * 2
+    for i in range(lines):
+        draw.text((MARGIN, y), f"{i % 9 + 1} x Item {i:03d}", fill=(0, 0, 0))
+        draw.text((width - 90, y), f"{(i % 7) + 1.5:.2f} EUR", fill=(0, 0, 0))
+        y += LINE_HEIGHT
+    y += LINE_HEIGHT
+    draw.line((MARGIN, y, width - MARGIN, y), fill=(0, 0, 0), width=2)
+    y += LINE_HEIGHT // 2
+    draw.text((MARGIN, y), "TOTAL", fill=(0, 0, 0))
+    draw.text((width - 90, y), f"{lines * 2.5:.2f} EUR", fill=(0, 0, 0))
+    return img
+
+
+def make_z_report(sections: int = 12, width: int = RECEIPT_WIDTH) -> Image.Image:
+    """Draw a long Z report: sections of totals split by rules."""
+    rows = sections * 14
+    height = MARGIN * 2 + LINE_HEIGHT * (rows + 4)
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    y = MARGIN
+    draw.text((width // 2 - 40, y), "Z REPORT", fill=(0, 0, 0))
+    y += LINE_HEIGHT * 2
+    for section in range(sections):
+        draw.rectangle((MARGIN, y, width - MARGIN, y + 20), fill=(0, 0, 0))
+        draw.text((MARGIN + 4, y + 4), f"Section {section}", fill=(255, 255, 255))
+        y += LINE_HEIGHT
+        for i in range(12):
+            draw.text((MARGIN, y), f"Account {section:02d}-{i:02d}", fill=(0, 0, 0))
+            draw.text((width - 110, y), f"{section * 12.5 + i:9.2f}", fill=(0, 0, 0))
+            y += LINE_HEIGHT
+        draw.line((MARGIN, y, width - MARGIN, y), fill=(0, 0, 0), width=1)
+        y += LINE_HEIGHT
+    return img
+
+
+def make_logo_receipt(lines: int = 12, width: int = RECEIPT_WIDTH) -> Image.Image:
+    """Draw a receipt topped with a large grey-scale logo, dithering heavy."""
+    logo_height = 320
+    receipt = make_receipt(lines, width=width)
+    img = Image.new(
+        "RGB",
+        (width, logo_height + receipt.height),
+        (255, 255, 255)
+    )
+    logo = Image.radial_gradient("L").resize((logo_height, logo_height))
+    img.paste(logo.convert("RGB"), ((width - logo_height) // 2, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse(
+        (width // 2 - 80, 80, width // 2 + 80, 240),
+        outline=(0, 0, 0),
+        width=8
+    )
+    img.paste(receipt, (0, logo_height))
+    return img
+
+
+#: Named receipt images of the benchmark corpus
+CORPUS: Dict[str, Callable[[], Image.Image]] = {
+    "short_order": lambda: make_receipt(5),
+    "long_order": lambda: make_receipt(60),
+    "z_report": make_z_report,
+    "logo_heavy": make_logo_receipt
+}
+
+
+def encode_receipt(img: Image.Image) -> str:
+    """Encode image as an Odoo POS base64 PNG data URL."""
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return "data:image/png;base64," \
+        + base64.b64encode(buffer.getvalue()).decode("ascii")
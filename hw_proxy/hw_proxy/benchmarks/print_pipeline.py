@@ -0,0 +1,216 @@
+"""
+Benchmark each stage of the hw_proxy receipt print pipeline
+
+Runs the EscPosHelper receipt pipeline against a Dummy printer,
+on the synthetic receipts corpus, and times separately:
+    - b64decode: base64 data URL decoding
+    - image_open: Pillow image open and decode
+    - encode: ESC/POS image encoding, with the device image settings
+    - transport: write to the printer transport
+    - pipeline: the whole print_receipt data path
+
+Throughput is given in receipts/s and ESC/POS bytes/s of the pipeline.
+Peak memory is traced with tracemalloc, which sees Python and NumPy
+allocations but not Pillow internal buffers; max_rss_kb gives the
+process peak resident memory.
+
+Results are written as JSON, to compare runs across versions.
+
+Usage:
+    python -m hw_proxy.benchmarks.print_pipeline [--device PP6800]
+        [--encoder numpy|escpos] [--repeat 5] [--output results.json]
+        [--compare previous.json]
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import platform
+import resource
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+from io import BytesIO
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import PIL
+from escpos.printer import Dummy
+from escpos import __version__ as escpos_version
+from PIL import Image
+from hw_proxy.__version__ import VERSION
+from hw_proxy.benchmarks.corpus import CORPUS, encode_receipt
+from hw_proxy.tools.pos_helper import EscPosHelper
+
+STAGES = ("b64decode", "image_open", "encode", "transport", "pipeline")
+
+
+def time_runs(func: Callable[[], object], repeat: int) -> List[float]:
+    """Get run times of func in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return times
+
+
+def summarize(times: List[float]) -> dict:
+    """Get min, median and mean of run times, in milliseconds."""
+    return {
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "mean_ms": round(statistics.mean(times) * 1000, 3)
+    }
+
+
+def make_helper(device_key: str, encoder: Optional[str]) -> EscPosHelper:
+    """Get an EscPosHelper of device writing to a Dummy printer."""
+    helper = EscPosHelper(device_key)
+    if not helper.has_printer_conf():
+        raise SystemExit(f"Unknown device key: {device_key}")
+    if encoder is not None:
+        # Registry device configurations are shared, update a copy
+        helper.device = helper.device.model_copy(update={
+            "image_conf": helper.get_image_conf().model_copy(
+                update={"encoder": encoder}
+            )
+        })
+    helper.printer = Dummy()
+    return helper
+
+
+def run_pipeline(helper: EscPosHelper, receipt: str) -> int:
+    """Run print_receipt data path on a fresh Dummy printer."""
+    helper.printer = Dummy()
+    # escpos prints a warning on stdout for profiles without media width
+    with contextlib.redirect_stdout(io.StringIO()):
+        return helper.write_stream(helper.iter_receipt_data(receipt))
+
+
+def bench_receipt(helper: EscPosHelper, img: Image.Image, repeat: int) -> dict:
+    """Benchmark all stages on a receipt image."""
+    receipt = encode_receipt(img)
+    b64string = receipt.split(",", 1)[1]
+    raw = base64.b64decode(b64string)
+    decoded = Image.open(BytesIO(raw))
+    decoded.load()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = helper.encode_image(decoded)
+
+    def _open():
+        opened = Image.open(BytesIO(raw))
+        opened.load()
+
+    def _encode():
+        with contextlib.redirect_stdout(io.StringIO()):
+            helper.encode_image(decoded)
+
+    stages = {
+        "b64decode": time_runs(lambda: base64.b64decode(b64string), repeat),
+        "image_open": time_runs(_open, repeat),
+        "encode": time_runs(_encode, repeat),
+        "transport": time_runs(lambda: Dummy()._raw(data), repeat),
+        "pipeline": time_runs(lambda: run_pipeline(helper, receipt), repeat)
+    }
+    written = run_pipeline(helper, receipt)
+
+    tracemalloc.start()
+    run_pipeline(helper, receipt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pipeline_time = statistics.median(stages["pipeline"])
+    return {
+        "image": {"width": img.width, "height": img.height},
+        "payload_bytes": len(receipt),
+        "escpos_bytes": written,
+        "print_stats": dict(helper.print_stats),
+        "stages": {name: summarize(times) for name, times in stages.items()},
+        "throughput": {
+            "receipts_per_s": round(1 / pipeline_time, 2),
+            "bytes_per_s": round(written / pipeline_time)
+        },
+        "peak_memory": {"tracemalloc_bytes": peak}
+    }
+
+
+def run(device_key: str, encoder: Optional[str], repeat: int) -> dict:
+    """Benchmark the whole corpus."""
+    helper = make_helper(device_key, encoder)
+    results = {}
+    for name, make_image in CORPUS.items():
+        results[name] = bench_receipt(helper, make_image(), repeat)
+    return {
+        "meta": {
+            "version": VERSION,
+            "date": datetime.now(timezone.utc).isoformat(),
+            "device_key": device_key,
+            "image_conf": helper.get_image_conf().model_dump(),
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "escpos": escpos_version,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        },
+        "results": results
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    """Print median stage times, with ratio to baseline if any."""
+    header = f"{'receipt':<12} " + " ".join(f"{s:>11}" for s in STAGES)
+    print(header + f" {'rcpt/s':>8} {'KB/s':>9} {'peak KB':>8}")
+    for name, result in report["results"].items():
+        cells = []
+        for stage in STAGES:
+            median = result["stages"][stage]["median_ms"]
+            cell = f"{median:.2f}"
+            base = (baseline or {}).get("results", {}).get(name)
+            if base is not None:
+                base_median = base["stages"][stage]["median_ms"]
+                cell += f"/{median / base_median:.2f}x" if base_median else ""
+            cells.append(f"{cell:>11}")
+        throughput = result["throughput"]
+        print(
+            f"{name:<12} " + " ".join(cells)
+            + f" {throughput['receipts_per_s']:>8.1f}"
+            + f" {throughput['bytes_per_s'] / 1024:>9.0f}"
+            + f" {result['peak_memory']['tracemalloc_bytes'] / 1024:>8.0f}"
+        )
+    if baseline is not None:
+        print(
+            "Stage times in ms / ratio to baseline "
+            f"{baseline['meta'].get('version')} ({baseline['meta'].get('date')})"
+        )
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--device", default="PP6800")
+    parser.add_argument("--encoder", choices=("numpy", "escpos"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON results file to write")
+    parser.add_argument("--compare", help="JSON results file to compare to")
+    args = parser.parse_args()
+    report = run(args.device, args.encoder, args.repeat)
+    baseline: Optional[Dict] = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
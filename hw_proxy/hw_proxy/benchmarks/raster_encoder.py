@@ -0,0 +1,73 @@
+"""
+Benchmark escpos Escpos.image() against hw_proxy RasterEncoder
+
+Usage:
+    python -m hw_proxy.benchmarks.raster_encoder [--lines 40 200] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+from time import perf_counter
+from escpos.printer import Dummy
+from hw_proxy.benchmarks.corpus import make_receipt
+from hw_proxy.tools.raster_encoder import RasterEncoder
+
+IMPLS = ("bitImageColumn", "bitImageRaster", "graphics")
+
+
+def escpos_encode(img, impl: str, fragment_height: int = 960) -> bytes:
+    """
+    Encode image the escpos way, through a Dummy printer,
+    the reference output of RasterEncoder.
+    """
+    d = Dummy()
+    # escpos prints a warning on stdout for profiles without media width
+    with contextlib.redirect_stdout(io.StringIO()):
+        d.image(img, impl=impl, fragment_height=fragment_height)
+    return d.output
+
+
+def best_time(func, repeat: int) -> float:
+    """Get best run time of func in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(lines_list, repeat: int):
+    """Run benchmark and print a result line per receipt and impl."""
+    print(
+        f"{'lines':>6} {'height':>6} {'impl':<15} {'escpos ms':>10} "
+        f"{'numpy ms':>9} {'speedup':>8} {'bytes':>8} same"
+    )
+    for lines in lines_list:
+        img = make_receipt(lines)
+        for impl in IMPLS:
+            encoder = RasterEncoder(impl=impl)
+            expected = escpos_encode(img, impl)
+            output = encoder.encode(img)
+            escpos_time = best_time(lambda: escpos_encode(img, impl), repeat)
+            numpy_time = best_time(lambda: encoder.encode(img), repeat)
+            print(
+                f"{lines:>6} {img.height:>6} {impl:<15} "
+                f"{escpos_time * 1000:>10.2f} {numpy_time * 1000:>9.2f} "
+                f"{escpos_time / numpy_time:>7.1f}x {len(output):>8} "
+                f"{output == expected}"
+            )
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 40, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
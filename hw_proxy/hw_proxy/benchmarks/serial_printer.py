@@ -0,0 +1,108 @@
+"""
+Benchmark the serial printer path on the ESC/POS simulator
+
+Runs EscPosHelper on the real escpos Serial printer,
+connected to a PrinterSimulator pty, and times:
+    - open: serial device open
+    - status: full printer status query (DLE EOT 1 and 4)
+    - print: print_receipt call, bytes handed to the pty
+    - drain: until the simulated printer consumed all bytes
+
+Usage:
+    python -m hw_proxy.benchmarks.serial_printer [--baudrate 115200]
+        [--print-speed 76800] [--latency 0.005] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+from time import perf_counter, sleep
+from hw_proxy.benchmarks.corpus import CORPUS, encode_receipt
+from hw_proxy.tools.pos_helper import EscPosHelper
+from hw_proxy.tools.printer_simulator import PrinterSimulator
+
+
+def wait_drained(simulator: PrinterSimulator, total: int, timeout: float = 60):
+    """Wait until simulator received total bytes."""
+    end = perf_counter() + timeout
+    while simulator.bytes_received < total and perf_counter() < end:
+        sleep(0.001)
+
+
+def run(simulator: PrinterSimulator, repeat: int) -> dict:
+    """Benchmark open, status and print of the corpus on the simulator."""
+    results = {}
+    helper = EscPosHelper(simulator.key, keep_open=True)
+    start = perf_counter()
+    helper.open_printer()
+    results["open_ms"] = round((perf_counter() - start) * 1000, 3)
+
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        helper.get_full_printer_status(initialized=True)
+        times.append(perf_counter() - start)
+    results["status_ms"] = round(statistics.median(times) * 1000, 3)
+
+    for name, make_image in CORPUS.items():
+        receipt = encode_receipt(make_image())
+        end_data = helper.get_end_data(cut=True, cashdrawer=False)
+        print_times, drain_times = [], []
+        for _ in range(repeat):
+            received = simulator.bytes_received
+            start = perf_counter()
+            # escpos prints a warning on stdout for profiles without media width
+            with contextlib.redirect_stdout(io.StringIO()):
+                helper.print_receipt(receipt)
+            print_times.append(perf_counter() - start)
+            sent = helper.print_stats["bytes"] + len(end_data)
+            wait_drained(simulator, received + sent)
+            drain_times.append(perf_counter() - start)
+        results[name] = {
+            "bytes": helper.print_stats["bytes"],
+            "print_ms": round(statistics.median(print_times) * 1000, 3),
+            "drain_ms": round(statistics.median(drain_times) * 1000, 3)
+        }
+    helper.close_printer(force=True)
+    return results
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument(
+        "--print-speed", type=float,
+        help="Print-head rate in bytes/s"
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    simulator = PrinterSimulator(
+        key="BENCH_SIMULATOR",
+        baudrate=args.baudrate,
+        print_speed=args.print_speed,
+        latency=args.latency
+    )
+    simulator.register()
+    simulator.start()
+    try:
+        results = run(simulator, args.repeat)
+    finally:
+        simulator.stop()
+        simulator.unregister()
+    print(f"open: {results.pop('open_ms')} ms")
+    print(f"status: {results.pop('status_ms')} ms")
+    print(f"{'receipt':<12} {'bytes':>8} {'print ms':>10} {'drain ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12} {result['bytes']:>8} "
+            f"{result['print_ms']:>10.1f} {result['drain_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
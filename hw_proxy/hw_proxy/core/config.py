@@ -173,6 +173,55 @@ class Settings(BaseSettings):
     BACKEND_HOST: HttpUrl
     SENTRY_DSN: HttpUrl | None = None
     PRINTER_KEY: str = Field(..., pattern=ValidationConstants.KEY_REGEX.pattern)
+    # Seconds before an unused printer connection is closed (0: never)
+    PRINTER_IDLE_TIMEOUT: float = Field(60, ge=0)
+    # Seconds between background printer status refreshes
+    PRINTER_STATUS_INTERVAL: float = Field(10, gt=0)
+    # Minimum seconds between two printer status queries
+    PRINTER_STATUS_MIN_INTERVAL: float = Field(2, gt=0)
+    # Total bytes of encoded receipts kept for reprints (0: disabled)
+    RECEIPT_CACHE_MAX_BYTES: int = Field(8 * 1024 * 1024, ge=0)
+    # Answer print requests once the job is "accepted" or "completed"
+    PRINT_RESPONSE_MODE: Literal["accepted", "completed"] = "completed"
+    # Seconds to wait for a job result in "completed" mode
+    PRINT_JOB_TIMEOUT: float = Field(60, gt=0)
+    # JSON or YAML devices config file, watched for changes.
+    # supported_devices device_list is used when not set.
+    DEVICES_CONFIG_FILE: Optional[str] = None
+    # Seconds between devices config file modification checks
+    DEVICES_CONFIG_WATCH_INTERVAL: float = Field(2, gt=0)
+    # Seconds a device worker waits for more jobs to run
+    # in the same printer session (0: no wait, queued jobs only),
+    # a lone job waits that long before printing
+    PRINT_COALESCE_WINDOW: float = Field(0, ge=0)
+    # Seconds a job with the same request id and payload
+    # is attached to instead of printed again, after it is done (0: disabled)
+    PRINT_DEDUP_WINDOW: float = Field(60, ge=0)
+    # Directory of the persistent print spool journal, replayed on startup
+    # (None: jobs are only kept in memory)
+    PRINT_SPOOL_DIR: Optional[str] = None
+    # Seconds a queued job waits before being served
+    # as the next higher priority class (0: no aging)
+    PRINT_PRIORITY_AGING: float = Field(10, ge=0)
+    # Print spooler admission limits of each device queue,
+    # overridden by device queue_limits (0: unlimited).
+    # Jobs queued
+    PRINT_QUEUE_MAX_JOBS: int = Field(50, ge=0)
+    # Total receipt payload bytes queued
+    PRINT_QUEUE_MAX_BYTES: int = Field(16 * 1024 * 1024, ge=0)
+    # Seconds a new job is expected to wait, from the drain rate
+    PRINT_QUEUE_MAX_WAIT: float = Field(60, ge=0)
+    # Number of jobs kept for the job status API
+    PRINT_JOB_HISTORY: int = Field(200, gt=0)
+    # Log each print path span as a JSON line, at debug level
+    TRACE_LOG_SPANS: bool = False
+    # Span hooks to load, as "module.path:attribute" (JSON list)
+    TRACE_HOOKS: List[str] = Field(default_factory=list)
+    # TrueType font of text receipt lines printed as images,
+    # when the printer code pages miss some of their characters
+    TEXT_RECEIPT_FONT: Optional[str] = None
+    # JSON file tracking graphics stored in printers NV memory
+    NV_GRAPHICS_FILE: Optional[str] = None
 
     LOG_LEVEL: str = "Warning"
 
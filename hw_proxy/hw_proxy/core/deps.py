@@ -1,11 +0,0 @@
-"""
-Module for FastAPI dependency injection.
-"""
-from fastapi.templating import Jinja2Templates
-from hw_proxy.core.config import settings
-
-def get_templates():
-    """
-    Define Template directory
-    """
-    return Jinja2Templates(directory=settings.TEMPLATES_BASE_PATH)
\ No newline at end of file
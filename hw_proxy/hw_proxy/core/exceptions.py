@@ -16,4 +16,20 @@ class HwPrinterError(HwDeviceError):
 
 
 class HwEscPosError(HwPrinterError):
-    """HwEscPosError from printer device escpos"""
\ No newline at end of file
+    """HwEscPosError from printer device escpos"""
+
+
+class HwImageError(HwPrinterError):
+    """HwImageError from receipt image decoding"""
+
+
+class HwTemplateError(HwProxyError):
+    """HwTemplateError from receipt templates"""
+
+
+class HwQueueFullError(HwProxyError):
+    """HwQueueFullError from print spooler admission control"""
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        # Seconds before the queue is expected to accept the job
+        self.retry_after = retry_after
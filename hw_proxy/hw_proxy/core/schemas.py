@@ -3,8 +3,8 @@ Pydantic schemas for hw_proxy module
 """
 
 
-from typing import Literal, Optional, Union
-from pydantic import BaseModel
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel, Field, field_validator
 
 from hw_proxy.core.supported_devices import DevicePortType, DeviceType
 
@@ -31,9 +31,39 @@ class SerialDeviceSchemas(BaseModel):
     profile: Optional[str] = None
 
 
+# Former image_conf impl values, "Image" was escpos image() default impl
+IMAGE_IMPL_ALIASES = {"Image": "bitImageRaster"}
+
+
 class PrinteImageConfSchemas(BaseModel):
     """Device pydantic Schemas"""
-    impl: Literal["bitImageColumn", "Image"]
+    impl: Literal["bitImageColumn", "bitImageRaster", "graphics"]
+    # numpy: hw_proxy RasterEncoder, escpos: escpos Escpos.image()
+    encoder: Literal["numpy", "escpos"] = "numpy"
+    dither: bool = True
+    fragment_height: int = Field(960, gt=0)
+    # Send white rows runs as paper feed and crop white side margins
+    trim_blank: bool = False
+    min_blank_rows: int = Field(8, gt=0)
+    # Printer resolution, for blank trimming, printer profile dpi when not set
+    dpi: Optional[int] = Field(None, gt=0, lt=256)
+    # NV graphics commands: graphics (GS ( L), bitImage (FS q / FS p)
+    nv_impl: Literal["graphics", "bitImage"] = "graphics"
+    # Print stored header graphics instead of matching receipt top bands
+    nv_headers: bool = False
+
+    @field_validator("impl", mode="before")
+    @classmethod
+    def get_impl(cls, value):
+        """Get impl of a former impl value, see IMAGE_IMPL_ALIASES."""
+        return IMAGE_IMPL_ALIASES.get(value, value)
+
+
+class QueueLimitsSchemas(BaseModel):
+    """Device print queue limits pydantic Schemas, settings when not set"""
+    max_jobs: Optional[int] = Field(None, ge=0)
+    max_bytes: Optional[int] = Field(None, ge=0)
+    max_wait: Optional[float] = Field(None, ge=0)
 
 
 class DeviceConfigSchemas(BaseModel):
@@ -50,10 +80,136 @@ class DeviceConfigSchemas(BaseModel):
         SerialDeviceSchemas
     ]
     image_conf: Optional[PrinteImageConfSchemas] = None
+    queue_limits: Optional[QueueLimitsSchemas] = None
+    # Odoo printer ids routed to this device
+    odoo_printer_ids: List[Union[int, str]] = Field(default_factory=list)
+
+
+class PrinterGroupSchemas(BaseModel):
+    """Printer group pydantic Schemas"""
+    key: str
+    name: str
+    # Device keys, in failover order
+    members: List[str] = Field(min_length=1)
+    odoo_printer_ids: List[Union[int, str]] = Field(default_factory=list)
 
 
 class PrintRequest(BaseModel):
     printer_name: str
     data: str              # base64-encoded ESC/POS bytes
     cut: bool = True
-    cashdrawer: bool = False
\ No newline at end of file
+    cashdrawer: bool = False
+
+class TextBlockSchemas(BaseModel):
+    """Text receipt header or footer line pydantic Schemas"""
+    text: str
+    align: Literal["left", "center", "right"] = "left"
+    bold: bool = False
+    underline: bool = False
+    double_width: bool = False
+    double_height: bool = False
+
+
+class TextReceiptLineSchemas(BaseModel):
+    """Text receipt item line pydantic Schemas"""
+    name: str
+    qty: Optional[Union[int, float]] = None
+    # Amounts are printed as is when given as strings
+    unit_price: Optional[Union[float, str]] = None
+    price: Optional[Union[float, str]] = None
+    note: Optional[str] = None
+
+
+class TextReceiptTotalSchemas(BaseModel):
+    """Text receipt total line pydantic Schemas"""
+    label: str
+    amount: Union[float, str]
+    bold: bool = False
+    double_height: bool = False
+
+
+class TextReceiptSchemas(BaseModel):
+    """Structured text receipt pydantic Schemas"""
+    header: List[TextBlockSchemas] = Field(default_factory=list)
+    lines: List[TextReceiptLineSchemas] = Field(default_factory=list)
+    totals: List[TextReceiptTotalSchemas] = Field(default_factory=list)
+    footer: List[TextBlockSchemas] = Field(default_factory=list)
+    currency: str = ""
+    decimals: int = Field(2, ge=0)
+    # Characters per line, from the printer profile when not set
+    columns: Optional[int] = Field(None, gt=0)
+
+
+class ItemTicketsSchemas(TextReceiptSchemas):
+    """Per item tickets pydantic Schemas, totals are not printed"""
+    # One ticket per unit of integer quantities, else per item line
+    per_unit: bool = False
+    # Print ticket number and count, e.g. 3/20
+    numbering: bool = True
+
+
+class TextReceiptRequest(BaseModel):
+    """Text receipt print request pydantic Schemas"""
+    receipt: TextReceiptSchemas
+    printer_name: Optional[Union[str, int]] = None
+    cut: bool = True
+    cashdrawer: bool = False
+    request_id: Optional[str] = None
+    debug: bool = False
+
+
+class BinaryPrintRequest(BaseModel):
+    """Binary print request query parameters pydantic Schemas"""
+    printer_name: Optional[Union[str, int]] = None
+    cut: bool = True
+    cashdrawer: bool = False
+    request_id: Optional[str] = None
+    debug: bool = False
+
+
+class BatchActionSchemas(BaseModel):
+    """Batch printer action pydantic Schemas"""
+    action: Literal[
+        "print_receipt",
+        "print_raw",
+        "print_text",
+        "print_markup",
+        "print_tickets",
+        "cut_receipt",
+        "cashbox"
+    ]
+    # base64 image or raw ESC/POS, text receipt, item tickets, or markup
+    receipt: Optional[Union[str, TextReceiptSchemas, ItemTicketsSchemas]] = None
+    cut: bool = True
+    cashdrawer: bool = False
+
+
+class BatchRequest(BaseModel):
+    """Batch print request pydantic Schemas"""
+    actions: List[BatchActionSchemas] = Field(min_length=1)
+    printer_name: Optional[Union[str, int]] = None
+    request_id: Optional[str] = None
+    debug: bool = False
+
+
+class ItemTicketsRequest(BaseModel):
+    """Per item tickets print request pydantic Schemas"""
+    receipt: ItemTicketsSchemas
+    printer_name: Optional[Union[str, int]] = None
+    # Cut after the last ticket, others are always cut
+    cut: bool = True
+    cashdrawer: bool = False
+    request_id: Optional[str] = None
+    debug: bool = False
+
+
+class TemplateReceiptRequest(BaseModel):
+    """Receipt template print request pydantic Schemas"""
+    template: str
+    # Order data the template is rendered with
+    data: dict = Field(default_factory=dict)
+    printer_name: Optional[Union[str, int]] = None
+    cut: bool = True
+    cashdrawer: bool = False
+    request_id: Optional[str] = None
+    debug: bool = False
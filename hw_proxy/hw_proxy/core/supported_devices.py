@@ -35,7 +35,23 @@ device_list = [
             "profile": "TM-T88II"
         },
         'image_conf': {
-            "impl": "bitImageColumn"
-        }
+            "impl": "bitImageRaster",
+            "encoder": "numpy",
+            "trim_blank": True,
+            # Band height streamed to the printer while the next is encoded
+            "fragment_height": 256
+        },
+        # Odoo printer ids (pos.printer) routed to this printer
+        'odoo_printer_ids': []
     },
-]
\ No newline at end of file
+]
+
+# Printer groups, a job sent to a group is printed
+# by its first healthy member, in members order. e.g.:
+#     {
+#         'key': 'RECEIPT',
+#         'name': 'Receipt printers',
+#         'members': ['PP6800', 'PP6800_BACKUP'],
+#         'odoo_printer_ids': []
+#     }
+printer_groups = []
\ No newline at end of file
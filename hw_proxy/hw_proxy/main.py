@@ -1,5 +1,6 @@
 """FastAPI Async IoT Box Proxy for Odoo (Printer)"""
 import logging
+from contextlib import asynccontextmanager
 from ipaddress import ip_address, ip_network
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
@@ -10,6 +11,13 @@ from fastapi.responses import JSONResponse
 from hw_proxy.__init__ import configure_logging
 from hw_proxy.app.main import app_router
 from hw_proxy.core.config import settings
+from hw_proxy.tools.connection_manager import connection_manager
+from hw_proxy.tools.print_spooler import print_spooler
+from hw_proxy.tools.status_poller import status_poller
+from hw_proxy.tools.device_helper import DeviceHelper
+from hw_proxy.tools.device_registry import device_registry
+from hw_proxy.tools.receipt_templates import receipt_templates
+from hw_proxy.core.supported_devices import DeviceType
 from urllib.parse import urlparse
 
 
@@ -50,9 +58,24 @@ def is_origin_allowed(origin: str) -> bool:
         )
         return False
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background printer services."""
+    device_registry.start()
+    receipt_templates.load()
+    connection_manager.start()
+    status_poller.start(DeviceHelper.get_device_keys(DeviceType.PRINTER))
+    print_spooler.replay()
+    yield
+    device_registry.stop()
+    status_poller.stop()
+    print_spooler.stop()
+    connection_manager.stop()
+
 # --- App Initialization ---
 app = FastAPI(
     title="Odoo IoT Box Proxy (FastAPI Async)",
+    lifespan=lifespan,
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc"
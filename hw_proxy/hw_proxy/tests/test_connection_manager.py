@@ -0,0 +1,86 @@
+"""
+Printer connection manager tests for hw_proxy module
+"""
+import pytest
+from escpos.printer import Dummy
+from hw_proxy.core.exceptions import HwImageError, HwPrinterError
+from hw_proxy.tools.connection_manager import PrinterConnectionManager
+from hw_proxy.tools.pos_helper import EscPosHelper
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """Get a manager opening Dummy printer connections."""
+    manager = PrinterConnectionManager(idle_timeout=0)
+    def _connect(conn):
+        if conn.helper is None:
+            conn.helper = EscPosHelper(conn.device_key, keep_open=True)
+            conn.helper.printer = Dummy()
+            conn.connects += 1
+        return conn.helper
+    monkeypatch.setattr(manager, "_connect", _connect)
+    return manager
+
+
+def make_action(errors: list, written: int = 0):
+    """Get a printer action raising errors in turn, then returning True."""
+    calls = []
+    def _action(helper: EscPosHelper) -> bool:
+        calls.append(helper)
+        helper.bytes_written += written
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return True
+    _action.calls = calls
+    return _action
+
+
+def connection_error() -> HwPrinterError:
+    """Get a printer error caused by a broken connection."""
+    error = HwPrinterError("Unable to print receipt")
+    error.__cause__ = OSError("Device disconnected")
+    return error
+
+
+def test_retry_with_new_connection(manager):
+    action = make_action([connection_error()])
+    assert manager.run("printer", action) is True
+    assert len(action.calls) == 2
+    # The broken connection was dropped, then reopened
+    assert action.calls[0] is not action.calls[1]
+    stats, = manager.get_stats()
+    assert stats["connects"] == 2
+    assert stats["errors"] == 1
+
+
+def test_no_retry_after_bytes_written(manager):
+    action = make_action([connection_error()], written=10)
+    with pytest.raises(HwPrinterError):
+        manager.run("printer", action)
+    assert len(action.calls) == 1
+    stats, = manager.get_stats()
+    assert stats["is_open"] is False
+
+
+def test_no_retry_of_other_errors(manager):
+    # Pillow raises OSError on bad images
+    image_error = HwImageError("Unable to decode image")
+    image_error.__cause__ = OSError("Truncated image")
+    action = make_action([image_error])
+    with pytest.raises(HwImageError):
+        manager.run("printer", action)
+    assert len(action.calls) == 1
+    action = make_action([connection_error()])
+    with pytest.raises(HwPrinterError):
+        manager.run("printer", action, retry=False)
+    assert len(action.calls) == 1
+
+
+def test_connection_kept_open(manager):
+    action = make_action([])
+    manager.run("printer", action)
+    manager.run("printer", action)
+    assert action.calls[0] is action.calls[1]
+    assert manager.get_stats()[0]["connects"] == 1
+    assert manager.close("printer") is True
+    assert manager.get_stats()[0]["is_open"] is False
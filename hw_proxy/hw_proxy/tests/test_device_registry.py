@@ -0,0 +1,122 @@
+"""
+Device registry tests for hw_proxy module
+"""
+import json
+import os
+import pytest
+from hw_proxy.core.exceptions import HwDeviceError
+from hw_proxy.core.supported_devices import DevicePortType, DeviceType
+from hw_proxy.tools.device_registry import DeviceRegistry, RegistrySnapshot
+
+
+def make_device(key: str, host: str = "127.0.0.1", **kwargs) -> dict:
+    """Get a network printer config entry."""
+    device = {
+        "vendor": "0x0000",
+        "product": "0x0000",
+        "name": f"Printer {key}",
+        "key": key,
+        "type": "printer",
+        "port_type": "network",
+        "conf": {"host": host}
+    }
+    device.update(kwargs)
+    return device
+
+
+def write_config(path, devices: list, groups: list = None, mtime=None):
+    """Write a JSON devices config file."""
+    path.write_text(json.dumps({
+        "devices": devices,
+        "printer_groups": groups or []
+    }))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "devices.json"
+    write_config(
+        path,
+        [make_device("A", odoo_printer_ids=[3]), make_device("B")],
+        [{"key": "RECEIPT", "name": "Receipt", "members": ["A", "B"]}],
+        mtime=1000
+    )
+    return path
+
+
+@pytest.fixture
+def registry(config_path):
+    return DeviceRegistry(path=str(config_path))
+
+
+def test_snapshot_validated():
+    snapshot = RegistrySnapshot([
+        make_device("A", image_conf={"impl": "graphics"})
+    ])
+    device = snapshot.devices["A"]
+    assert device.port_type == DevicePortType.NETWORK
+    assert device.type == DeviceType.PRINTER
+    assert device.conf.port == 9100
+    assert device.image_conf.impl == "graphics"
+
+
+@pytest.mark.parametrize("devices, groups", [
+    ([make_device("A"), make_device("A")], []),
+    ([make_device("A", conf={})], []),
+    ([make_device("A", port_type="bluetooth")], []),
+    ([make_device("A")], [{"key": "G", "name": "G", "members": ["B"]}])
+])
+def test_snapshot_invalid(devices, groups):
+    with pytest.raises(HwDeviceError, match="Invalid devices configuration"):
+        RegistrySnapshot(devices, groups)
+
+
+def test_find_keys(registry):
+    assert registry.get_device_keys() == ["A", "B"]
+    assert registry.find_device_key("A") == "A"
+    # By name, case insensitive, or by Odoo printer id
+    assert registry.find_device_key(" printer b ") == "B"
+    assert registry.find_device_key(3) == "A"
+    assert registry.find_device_key("C") is None
+    assert registry.find_group_key("receipt") == "RECEIPT"
+    assert registry.get_group("RECEIPT").members == ["A", "B"]
+
+
+def test_reload(registry, config_path):
+    swaps = []
+    registry.add_listener(lambda old, new: swaps.append((old, new)))
+    snapshot = registry.snapshot
+    assert registry.has_changed() is False
+    write_config(config_path, [make_device("A", host="10.0.0.2")], mtime=2000)
+    assert registry.has_changed() is True
+    assert registry.reload() is True
+    assert registry.has_changed() is False
+    assert registry.get_device("A").conf.host == "10.0.0.2"
+    assert registry.get_device("B") is None
+    assert swaps == [(snapshot, registry.snapshot)]
+
+
+def test_invalid_reload_keeps_snapshot(registry, config_path):
+    snapshot = registry.snapshot
+    write_config(config_path, [make_device("A", conf={})], mtime=2000)
+    assert registry.reload() is False
+    assert registry.snapshot is snapshot
+    # The invalid file is not reloaded until modified again
+    assert registry.has_changed() is False
+    stats = registry.get_stats()
+    assert stats["reload_errors"] == 1
+    assert "Invalid devices configuration" in stats["last_error"]
+
+
+def test_runtime_devices(registry):
+    registry.register_device(make_device("SIM"))
+    assert registry.get_device_keys() == ["A", "B", "SIM"]
+    registry.register_device(make_device("A", host="10.0.0.2"))
+    assert registry.get_device("A").conf.host == "10.0.0.2"
+    assert registry.get_group("RECEIPT") is not None
+    # Groups using a removed device are removed
+    registry.unregister_device("B")
+    assert registry.get_device_keys() == ["SIM", "A"]
+    assert registry.get_group("RECEIPT") is None
@@ -0,0 +1,73 @@
+"""
+Glyph atlas tests for hw_proxy module
+"""
+import numpy as np
+import pytest
+from hw_proxy.tools.glyph_atlas import GlyphAtlas
+
+
+@pytest.fixture
+def atlas():
+    return GlyphAtlas(max_glyphs=2)
+
+
+def test_glyphs_cached(atlas):
+    glyph = atlas.get_glyph("A", 20, "default")
+    assert glyph.bits.dtype == bool
+    assert glyph.bits.shape[1] == glyph.advance
+    assert glyph.bits.any()
+    assert atlas.get_glyph("A", 20, "default") is glyph
+    # Other sizes are other glyphs
+    assert atlas.get_glyph("A", 30, "default") is not glyph
+    stats = atlas.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_glyphs_evicted(atlas):
+    glyph = atlas.get_glyph("A", 20, "default")
+    atlas.get_glyph("B", 20, "default")
+    atlas.get_glyph("A", 20, "default")
+    atlas.get_glyph("C", 20, "default")
+    assert atlas.get_stats()["glyphs"] == 2
+    # Least recently used glyph was dropped
+    assert atlas.get_glyph("A", 20, "default") is glyph
+    assert atlas.get_stats()["misses"] == 3
+    atlas.get_glyph("B", 20, "default")
+    assert atlas.get_stats()["misses"] == 4
+
+
+def test_render_line(atlas):
+    line = atlas.render_line("AB", 100, 24)
+    assert line.shape == (24, 100)
+    # Text is composed from glyphs side by side
+    a_glyph = atlas.get_glyph("A", 20, "default")
+    text_width = a_glyph.advance + atlas.get_glyph("B", 20, "default").advance
+    assert not line[:, text_width:].any()
+    rows = min(a_glyph.bits.shape[0], 24)
+    assert np.array_equal(
+        line[:rows, :a_glyph.advance], a_glyph.bits[:rows]
+    )
+    right = atlas.render_line("AB", 100, 24, align="right")
+    assert np.array_equal(right[:, 100 - text_width:], line[:, :text_width])
+    wide = atlas.render_line("AB", 100, 24, double_width=True)
+    assert wide.shape == (24, 100)
+    assert np.array_equal(wide, np.repeat(line, 2, axis=1)[:, :100])
+    high = atlas.render_line("AB", 100, 24, double_height=True)
+    assert high.shape == (48, 100)
+    underline = atlas.render_line("AB", 100, 24, underline=True)
+    assert underline[-1, :text_width].all()
+    assert not underline[-1, text_width:].any()
+
+
+def test_render_line_cut(atlas):
+    line = atlas.render_line("ABCDEFGHIJ", 20, 24)
+    assert line.shape == (24, 20)
+
+
+def test_compose_band(atlas):
+    lines = [atlas.render_line("A", 40, 24), atlas.render_line("B", 40, 24)]
+    img = atlas.compose_band(lines)
+    assert img.size == (40, 48)
+    # Printed dots are black
+    assert np.array_equal(np.asarray(img) == 0, np.vstack(lines))
@@ -0,0 +1,87 @@
+"""
+Prometheus metrics tests for hw_proxy module
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from hw_proxy.app.routes.hw_proxy import router
+from hw_proxy.tools.metrics import (
+    MetricsRegistry,
+    format_labels,
+    format_value
+)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_format():
+    assert format_value(3.0) == "3"
+    assert format_value(0.25) == "0.25"
+    assert format_value(float("inf")) == "+Inf"
+    assert format_labels((), ()) == ""
+    assert format_labels(("device", "kind"), ("A\\B", 'x"\ny'))\
+        == '{device="A\\\\B",kind="x\\"\\ny"}'
+
+
+def test_counter(registry):
+    jobs = registry.counter("jobs_total", "Jobs.", ("device", "status"))
+    # Registering a metric twice gets the first one
+    assert registry.counter("jobs_total", "Jobs.") is jobs
+    jobs.inc(device="A", status="done")
+    jobs.inc(2, device="A", status="done")
+    jobs.inc(device="B", status="failed")
+    assert registry.render() == (
+        "# HELP jobs_total Jobs.\n"
+        "# TYPE jobs_total counter\n"
+        'jobs_total{device="A",status="done"} 3\n'
+        'jobs_total{device="B",status="failed"} 1\n'
+    )
+    with pytest.raises(ValueError):
+        jobs.inc(device="A")
+
+
+def test_histogram(registry):
+    seconds = registry.histogram(
+        "job_seconds", "Job time.", ("device",), buckets=(1, 0.5)
+    )
+    seconds.observe(0.5, device="A")
+    seconds.observe(0.75, device="A")
+    seconds.observe(4, device="A")
+    # Buckets are cumulative, upper bounds included
+    assert seconds.render().splitlines()[2:] == [
+        'job_seconds_bucket{device="A",le="0.5"} 1',
+        'job_seconds_bucket{device="A",le="1"} 2',
+        'job_seconds_bucket{device="A",le="+Inf"} 3',
+        'job_seconds_sum{device="A"} 5.25',
+        'job_seconds_count{device="A"} 3'
+    ]
+
+
+def test_collectors(registry):
+    depth = registry.gauge("queue_depth", "Queued jobs.", ("device",))
+    depths = {"A": 2, "B": 1}
+    def _collect():
+        depth.clear()
+        for device, value in depths.items():
+            depth.set(value, device=device)
+    registry.add_collector(_collect)
+    assert 'queue_depth{device="B"} 1\n' in registry.render()
+    del depths["B"]
+    output = registry.render()
+    assert "# TYPE queue_depth gauge\n" in output
+    assert 'queue_depth{device="A"} 2\n' in output
+    assert 'device="B"' not in output
+
+
+def test_metrics_route():
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"]\
+        == "text/plain; version=0.0.4; charset=utf-8"
+    for name in ("hw_proxy_jobs_total", "hw_proxy_queue_depth"):
+        assert f"# TYPE {name} " in response.text
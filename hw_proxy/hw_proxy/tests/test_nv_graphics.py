@@ -0,0 +1,89 @@
+"""
+NV graphics tests for hw_proxy module
+"""
+import numpy as np
+import pytest
+from PIL import Image
+from hw_proxy.tools.nv_graphics import (
+    NvGraphicsRegistry,
+    define_bit_images,
+    define_graphics,
+    delete_graphics,
+    graphics_nv_command,
+    print_bit_image,
+    print_graphics
+)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return NvGraphicsRegistry(path=str(tmp_path / "nv_graphics.json"))
+
+
+def make_image(width: int, height: int) -> Image.Image:
+    """Get a black image."""
+    return Image.new("1", (width, height), 0)
+
+
+def test_graphics_commands():
+    bits = np.ones((2, 3), dtype=bool)
+    assert define_graphics("A1", bits) == (
+        b"\x1d(L\x0d\x00" + b"0C" + b"0A1\x01"
+        + b"\x03\x00" + b"\x02\x00" + b"1" + b"\xe0\xe0"
+    )
+    assert print_graphics("A1") == b"\x1d(L\x06\x00" + b"0EA1\x01\x01"
+    assert delete_graphics("A1") == b"\x1d(L\x04\x00" + b"0BA1"
+
+
+def test_graphics_long_command():
+    command = graphics_nv_command(67, b"\x00" * 0x10000)
+    assert command[:7] == b"\x1d8L\x02\x00\x01\x00"
+    assert len(command) == 7 + 0x10002
+
+
+def test_bit_image_commands():
+    bits = np.ones((9, 10), dtype=bool)
+    # Padded to 16 x 16 dots, columns of 2 bytes, top dot first
+    assert define_bit_images([bits]) == (
+        b"\x1cq\x01" + b"\x02\x00" + b"\x02\x00"
+        + b"\xff\x80" * 10 + b"\x00\x00" * 6
+    )
+    assert print_bit_image(1) == b"\x1cp\x01\x00"
+    # Deleting the last image sends an empty image list
+    assert define_bit_images([]) == b"\x1cq\x00"
+
+
+def test_registry_define_commands(registry):
+    registry.add("printer", "A1", make_image(8, 8))
+    registry.add("printer", "B2", make_image(16, 8))
+    graphic = registry.get("printer", "B2")
+    assert registry.get_print_command(graphic, "bitImage")\
+        == print_bit_image(2)
+    assert registry.get_print_command(graphic, "graphics")\
+        == print_graphics("B2")
+    assert registry.get_define_command("printer", "A1", "bitImage")\
+        .startswith(b"\x1cq\x02")
+    with pytest.raises(ValueError):
+        registry.get_define_command("printer", "C3", "graphics")
+    registry.remove("printer", "A1")
+    registry.remove("printer", "B2")
+    assert registry.get_define_command("printer", "B2", "bitImage")\
+        == b"\x1cq\x00"
+
+
+def test_registry_restore(registry):
+    graphic = registry.add("printer", "A1", make_image(8, 8), header=True)
+    registry.set_stored("printer", "A1")
+    registry.remove("printer", "A1")
+    assert registry.get("printer", "A1") is None
+    registry.restore(graphic)
+    assert registry.get("printer", "A1") is graphic
+    loaded = NvGraphicsRegistry(path=registry.path).get("printer", "A1")
+    assert loaded.to_dict() == graphic.to_dict()
+    assert np.array_equal(loaded.bits, graphic.bits)
+
+
+@pytest.mark.parametrize("key", ["A", "ABC", "\x01A", "é1"])
+def test_registry_invalid_key(registry, key):
+    with pytest.raises(ValueError):
+        registry.add("printer", key, make_image(8, 8))
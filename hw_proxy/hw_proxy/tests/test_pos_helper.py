@@ -0,0 +1,136 @@
+"""
+EscPosHelper tests for hw_proxy module
+"""
+import pytest
+from escpos.printer import Dummy
+from PIL import Image
+from hw_proxy.core.exceptions import HwPrinterError
+from hw_proxy.tools.pos_helper import (
+    CMD_CASHDRAWER,
+    EscPosHelper,
+    get_raw_data
+)
+
+CUT = EscPosHelper.get_end_data(cut=True)
+
+ACTIONS = [
+    {"action": "print_raw", "receipt": b"A"},
+    {"action": "print_text", "receipt": {"lines": "invalid"}},
+    {"action": "print_raw", "receipt": b"B"},
+    {"action": "unknown"}
+]
+
+
+@pytest.fixture
+def printer(monkeypatch):
+    """Get a helper printing to a ready Dummy printer."""
+    helper = EscPosHelper("TEST_PRINTER", keep_open=True)
+    helper.printer = Dummy()
+    monkeypatch.setattr(
+        helper, "is_printer_ready", lambda initialized=False: True
+    )
+    return helper
+
+
+@pytest.fixture
+def helper():
+    helper = EscPosHelper("TEST_BATCH")
+    helper.batch_results = [
+        {"done": False, "bytes": 0, "error": None} for _ in ACTIONS
+    ]
+    return helper
+
+
+def test_batch_data(helper):
+    chunks = list(helper.iter_batch_data(ACTIONS))
+    # Actions are cut once rendered, failed actions print nothing
+    assert chunks == [b"A" + CUT, b"B" + CUT]
+    assert helper.batch_results[1]["error"] is not None
+    assert helper.batch_results[3]["error"] is not None
+    helper.set_batch_results(len(b"".join(chunks)), complete=True)
+    assert [item["done"] for item in helper.batch_results]\
+        == [True, False, True, False]
+    assert [item["bytes"] for item in helper.batch_results]\
+        == [len(chunks[0]), 0, len(chunks[1]), 0]
+
+
+def test_batch_results_partial_write(helper):
+    chunks = list(helper.iter_batch_data(ACTIONS))
+    # Last sent chunk may be partially written
+    helper.set_batch_results(len(chunks[0]), complete=False)
+    assert [item["done"] for item in helper.batch_results]\
+        == [False, False, False, False]
+    assert helper.batch_results[0]["bytes"] == len(chunks[0])
+    helper.set_batch_results(len(b"".join(chunks)), complete=False)
+    assert [item["done"] for item in helper.batch_results]\
+        == [True, False, False, False]
+    assert helper.batch_results[2]["bytes"] == len(chunks[1])
+
+
+def test_raw_data():
+    assert get_raw_data(b"\x1b@") == b"\x1b@"
+    # JSON requests send raw data as base64
+    assert get_raw_data("G0A=") == b"\x1b@"
+
+
+@pytest.mark.parametrize("receipt", [b"\x1b@", "G0A="])
+def test_print_raw(printer, receipt):
+    assert printer.default_printer_action(
+        "print_raw", receipt, cut=False
+    ) is True
+    assert printer.printer.output == b"\x1b@"
+    assert printer.print_stats == {"bytes": 2}
+    assert list(printer.iter_action_data("print_raw", receipt))\
+        == [b"\x1b@"]
+
+
+def test_cut_receipt(printer):
+    expected = Dummy()
+    expected.cut(feed=True)
+    assert printer.cut_receipt() is True
+    assert printer.printer.output == expected.output
+
+
+def test_printer_not_ready(printer, monkeypatch):
+    monkeypatch.setattr(
+        printer, "is_printer_ready", lambda initialized=False: False
+    )
+    assert printer.cut_receipt() is False
+    assert printer.print_raw(b"\x1b@") is False
+    assert printer.printer.output == b""
+    # The cash drawer opens without paper
+    assert printer.open_cashdrawer() is True
+    assert printer.printer.output == CMD_CASHDRAWER
+
+
+def test_batch(printer):
+    assert printer.run_batch([
+        {"action": "print_raw", "receipt": b"A", "cut": False},
+        {"action": "cashbox"}
+    ]) is True
+    assert printer.printer.output == b"A" + CMD_CASHDRAWER
+    assert [item["done"] for item in printer.batch_results] == [True, True]
+    assert printer.run_batch(ACTIONS) is False
+    assert [item["done"] for item in printer.batch_results]\
+        == [True, False, True, False]
+
+
+def test_printer_action_error(printer, monkeypatch):
+    def _raw(data):
+        raise OSError("Device disconnected")
+    monkeypatch.setattr(printer.printer, "_raw", _raw)
+    with pytest.raises(HwPrinterError, match="Unable to print raw data"):
+        printer.print_raw(b"\x1b@")
+    with pytest.raises(HwPrinterError, match="Unable to run printer actions"):
+        printer.run_batch(ACTIONS)
+    # Nothing was written
+    assert printer.batch_results[0]["done"] is False
+
+
+def test_image_streamed_by_band(helper):
+    img = Image.new("1", (16, 2000), 0)
+    conf = helper.get_image_conf()
+    chunks = list(helper.iter_encode_image(img))
+    # One chunk per band of fragment_height rows
+    assert len(chunks) == -(-img.height // conf.fragment_height)
+    assert b"".join(chunks) == helper.encode_image(img)
@@ -0,0 +1,458 @@
+"""
+Print spooler tests for hw_proxy module
+"""
+import threading
+from time import time
+import pytest
+from hw_proxy.app.routes.hw_proxy import (
+    get_printer_key,
+    get_queue_full_exception
+)
+from hw_proxy.core.exceptions import HwDeviceError, HwQueueFullError
+from hw_proxy.tools.device_registry import RegistrySnapshot, device_registry
+from hw_proxy.tools.print_spooler import (
+    JobPriority,
+    JobQueue,
+    JobStatus,
+    PrintJob,
+    PrintSpooler,
+    get_receipt_size
+)
+from hw_proxy.tools.printer_simulator import PrinterSimulator
+from hw_proxy.tools.spool_journal import SpoolJournal
+from hw_proxy.tools.status_poller import PrinterStatus
+
+
+def make_job(action: str, age: float = 0, priority=None) -> PrintJob:
+    """Get a job created age seconds ago."""
+    job = PrintJob("printer", action, priority=priority)
+    job.created_at = time() - age
+    return job
+
+
+def drain(jobs: JobQueue) -> list:
+    """Get queued jobs in serving order."""
+    return [jobs.get_nowait() for _ in range(jobs.qsize())]
+
+
+def test_job_priority_classes():
+    assert make_job("cashdrawer").priority == JobPriority.DRAWER
+    assert make_job("cut_receipt").priority == JobPriority.CONTROL
+    assert make_job("print_receipt").priority == JobPriority.RECEIPT
+    assert make_job("nv_store").priority == JobPriority.LOW
+    assert make_job("print_receipt", priority="low").priority\
+        == JobPriority.LOW
+    # Only cash drawer actions are in the drawer class
+    assert make_job("print_receipt", priority="drawer").priority\
+        == JobPriority.RECEIPT
+    assert make_job("cashbox", priority="low").priority == JobPriority.DRAWER
+
+
+def test_queue_serves_by_class_then_queue_order():
+    jobs = JobQueue()
+    queued = [
+        make_job("cut_receipt"),
+        make_job("print_receipt", priority="low"),
+        make_job("print_receipt"),
+        make_job("print_raw"),
+        make_job("cashdrawer")
+    ]
+    for job in queued:
+        jobs.put(job)
+    assert drain(jobs) == [queued[4], queued[0], queued[2], queued[3],
+                           queued[1]]
+
+
+def test_cut_follows_its_receipt():
+    jobs = JobQueue()
+    queued = [
+        make_job("print_receipt", priority="low"),
+        make_job("print_receipt"),
+        make_job("cashdrawer"),
+        make_job("cut_receipt"),
+        make_job("print_receipt"),
+        make_job("cut_receipt")
+    ]
+    for job in queued:
+        jobs.put(job)
+    # Each cut is served right after the receipt queued before it
+    assert drain(jobs) == [queued[2], queued[1], queued[3], queued[4],
+                           queued[5], queued[0]]
+
+
+def test_cut_follows_low_receipt():
+    jobs = JobQueue()
+    queued = [
+        make_job("print_receipt", priority="low"),
+        make_job("cut_receipt"),
+        make_job("print_receipt")
+    ]
+    for job in queued:
+        jobs.put(job)
+    assert drain(jobs) == [queued[2], queued[0], queued[1]]
+
+
+def test_queue_stop_sentinel_served_last():
+    jobs = JobQueue()
+    job = make_job("print_receipt", priority="low")
+    jobs.put(None)
+    jobs.put(job)
+    assert drain(jobs) == [job, None]
+
+
+def test_queue_aging():
+    jobs = JobQueue(aging=10)
+    low = make_job("print_receipt", age=25, priority="low")
+    receipt = make_job("print_receipt", age=5)
+    jobs.put(receipt)
+    jobs.put(low)
+    # Low job waited two aging periods, served as control class
+    assert jobs.get_rank(low, time()) == JobPriority.CONTROL
+    assert drain(jobs) == [low, receipt]
+
+
+def test_queue_aging_stops_at_control_class():
+    jobs = JobQueue(aging=10)
+    low = make_job("print_receipt", age=1000, priority="low")
+    drawer = make_job("cashdrawer")
+    jobs.put(low)
+    jobs.put(drawer)
+    assert jobs.get_rank(low, time()) == JobPriority.CONTROL
+    assert drain(jobs) == [drawer, low]
+
+
+def test_queue_without_aging():
+    jobs = JobQueue()
+    low = make_job("print_receipt", age=1000, priority="low")
+    assert jobs.get_rank(low, time()) == JobPriority.LOW
+
+
+class BlockingConnections:
+    """Connection manager holding printer actions until released."""
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def run(self, device_key: str, func, retry: bool = True):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return True
+
+
+@pytest.fixture
+def connections():
+    conf = PrinterSimulator("TEST_SPOOLER").get_device_conf()
+    conf["queue_limits"] = {"max_jobs": 2, "max_bytes": 100}
+    device_registry.register_device(conf)
+    connections = BlockingConnections()
+    yield connections
+    connections.release.set()
+    device_registry.unregister_device("TEST_SPOOLER")
+
+
+@pytest.fixture
+def spooler(connections):
+    spooler = PrintSpooler(connections=connections, dedup_window=60)
+    # First job is printing, it is not queued anymore
+    spooler.submit("TEST_SPOOLER", "print_raw", b"x")
+    assert connections.started.wait(timeout=5)
+    yield spooler
+    connections.release.set()
+    spooler.stop()
+
+
+def test_receipt_size():
+    assert get_receipt_size(None) == 0
+    assert get_receipt_size(b"\x1b@") == 2
+    assert get_receipt_size("text") == 4
+    assert get_receipt_size({"lines": []}) == 0
+    assert get_receipt_size([
+        {"action": "print_raw", "receipt": b"abc"},
+        {"action": "cut_receipt"},
+        {"action": "print_markup", "receipt": "ab"}
+    ]) == 5
+
+
+def test_admission_max_jobs(spooler):
+    spooler.submit("TEST_SPOOLER", "print_raw", b"x")
+    spooler.submit("TEST_SPOOLER", "print_raw", b"x")
+    spooler.get_worker("TEST_SPOOLER").job_seconds = 3
+    with pytest.raises(HwQueueFullError) as error:
+        spooler.submit("TEST_SPOOLER", "print_raw", b"x")
+    assert error.value.retry_after == 3
+    # Cash drawer and control actions are never rejected
+    spooler.submit("TEST_SPOOLER", "cashdrawer")
+    spooler.submit("TEST_SPOOLER", "cut_receipt")
+    assert spooler.get_worker("TEST_SPOOLER").rejected == {"jobs": 1}
+
+
+def test_admission_max_bytes(spooler):
+    spooler.submit("TEST_SPOOLER", "print_raw", b"x" * 60)
+    with pytest.raises(HwQueueFullError) as error:
+        spooler.submit("TEST_SPOOLER", "print_raw", b"x" * 60)
+    assert error.value.retry_after == 1
+    spooler.submit("TEST_SPOOLER", "print_raw", b"x" * 40)
+    assert spooler.get_worker("TEST_SPOOLER").rejected == {"bytes": 1}
+
+
+def test_queue_full_response():
+    response = get_queue_full_exception(
+        HwQueueFullError("Print queue is full", retry_after=4)
+    )
+    assert response.status_code == 429
+    assert response.headers == {"Retry-After": "4"}
+
+
+def test_retry_attached_to_job(spooler):
+    job = spooler.submit("TEST_SPOOLER", "print_raw", b"ab", request_id=7)
+    retry = spooler.submit("TEST_SPOOLER", "print_raw", b"ab", request_id=7)
+    assert retry is job
+    assert job.duplicates == 1
+    # Same request id with another payload is a new request
+    other = spooler.submit("TEST_SPOOLER", "print_raw", b"ac", request_id=7)
+    assert other is not job
+
+
+def test_replayed_job_attached_to_retry(connections, tmp_path):
+    job = PrintJob("TEST_SPOOLER", "print_raw", b"ab", request_id=7)
+    journal = SpoolJournal(directory=str(tmp_path))
+    assert journal.append(job).result(timeout=5)
+    journal.stop()
+    spooler = PrintSpooler(
+        connections=connections,
+        journal=SpoolJournal(directory=str(tmp_path)),
+        dedup_window=60
+    )
+    try:
+        assert spooler.replay() == 1
+        retry = spooler.submit(
+            "TEST_SPOOLER", "print_raw", b"ab", request_id=7
+        )
+        assert retry.job_id == job.job_id
+    finally:
+        connections.release.set()
+        spooler.stop()
+
+
+class FakeHelper:
+    """EscPosHelper running each printer action with the same result."""
+    def __init__(self, result: bool):
+        self.result = result
+        self.print_stats = {}
+        self.timings = {}
+        self.bytes_written = 0
+        self.batch_results = []
+        self.on_chunk = None
+
+    def default_printer_action(self, action: str, receipt=None,
+                               cut: bool = True, cashdrawer: bool = False):
+        return self.result
+
+    def run_batch(self, actions: list) -> bool:
+        self.batch_results = [
+            {"done": self.result, "bytes": 0, "error": None}
+            for _ in actions
+        ]
+        return self.result
+
+
+class RecordingConnections:
+    """Connection manager returning a result per device, True by default."""
+    def __init__(self, results: dict = None):
+        self.results = results or {}
+        self.runs = []
+        self.started = threading.Event()
+        # Events holding device actions until set
+        self.blocked = {}
+
+    def run(self, device_key: str, func, retry: bool = True):
+        self.runs.append(device_key)
+        self.started.set()
+        if device_key in self.blocked:
+            self.blocked[device_key].wait(timeout=5)
+        result = self.results.get(device_key, True)
+        if isinstance(result, Exception):
+            raise result
+        return func(FakeHelper(result))
+
+
+@pytest.fixture
+def devices():
+    """Register TEST_A and TEST_B printers, in the TEST_GROUP group."""
+    snapshot = device_registry.snapshot
+    device_registry.swap(RegistrySnapshot(
+        [
+            dict(PrinterSimulator(key).get_device_conf(), name=key)
+            for key in ("TEST_A", "TEST_B")
+        ],
+        [{
+            "key": "TEST_GROUP",
+            "name": "Receipt printers",
+            "members": ["TEST_A", "TEST_B"],
+            "odoo_printer_ids": [5]
+        }]
+    ))
+    yield
+    device_registry.swap(snapshot)
+
+
+def test_job_status(devices):
+    connections = RecordingConnections({"TEST_B": False})
+    spooler = PrintSpooler(connections=connections, history_size=2)
+    try:
+        job = spooler.submit("TEST_A", "print_raw", b"ab")
+        assert job.future.result(timeout=5) is True
+        data = job.to_dict()
+        assert data["status"] == "done"
+        assert data["result"] is True
+        assert {"queued", "total"} <= set(data["timings"])
+        # Payload is released once printed
+        assert job.receipt is None
+        failed = spooler.submit("TEST_B", "print_raw", b"ab")
+        assert failed.future.result(timeout=5) is False
+        assert failed.status == JobStatus.FAILED
+        assert failed.error == "Unable to run printer action"
+        assert spooler.get_job(job.job_id) is job
+        assert spooler.get_jobs(device_key="TEST_B") == [failed]
+    finally:
+        spooler.stop()
+
+
+def test_job_error(devices):
+    connections = RecordingConnections({
+        "TEST_A": HwDeviceError("Printer not available")
+    })
+    spooler = PrintSpooler(connections=connections, history_size=1)
+    try:
+        job = spooler.submit("TEST_A", "print_raw", b"ab")
+        assert str(job.future.exception(timeout=5)) == "Printer not available"
+        assert job.to_dict()["status"] == "failed"
+        other = spooler.submit("TEST_A", "cut_receipt")
+        other.future.exception(timeout=5)
+        # Oldest finished jobs are forgotten
+        assert spooler.get_job(job.job_id) is None
+        assert spooler.get_jobs() == [other]
+    finally:
+        spooler.stop()
+
+
+def test_printer_routing(devices):
+    assert get_printer_key("TEST_B") == "TEST_B"
+    assert get_printer_key(" test_b ") == "TEST_B"
+    # Groups are found by key, name or Odoo printer id
+    assert get_printer_key("receipt printers") == "TEST_GROUP"
+    assert get_printer_key(5) == "TEST_GROUP"
+    with pytest.raises(HwDeviceError):
+        get_printer_key("TEST_C")
+
+
+def test_devices_print_in_parallel(devices):
+    connections = RecordingConnections()
+    connections.blocked["TEST_A"] = threading.Event()
+    spooler = PrintSpooler(connections=connections)
+    try:
+        printing = spooler.submit("TEST_A", "print_raw", b"a")
+        # Not coalesced with the printing job
+        assert connections.started.wait(timeout=5)
+        queued = spooler.submit("TEST_A", "print_raw", b"a")
+        # A blocked printer does not hold the others
+        job = spooler.submit("TEST_B", "print_raw", b"b")
+        assert job.future.result(timeout=5) is True
+        assert printing.status == JobStatus.PRINTING
+        assert queued.status == JobStatus.QUEUED
+        connections.blocked["TEST_A"].set()
+        assert queued.future.result(timeout=5) is True
+        assert connections.runs.count("TEST_A") == 2
+        assert sorted(stats["device_key"] for stats in spooler.get_stats())\
+            == ["TEST_A", "TEST_B"]
+    finally:
+        connections.blocked["TEST_A"].set()
+        spooler.stop()
+
+
+class FakeStatuses:
+    """Status poller with cached statuses of ready devices only."""
+    def __init__(self, ready: list):
+        self.ready = ready
+
+    def get_status(self, device_key: str) -> PrinterStatus:
+        if device_key in self.ready:
+            return PrinterStatus({"is_online": True, "paper_status": "ok"})
+        return PrinterStatus()
+
+    def request_refresh(self, device_key: str):
+        pass
+
+
+def test_group_job_on_ready_member(devices):
+    connections = RecordingConnections()
+    spooler = PrintSpooler(
+        connections=connections,
+        statuses=FakeStatuses(["TEST_B"])
+    )
+    try:
+        job = spooler.submit("TEST_GROUP", "print_raw", b"ab")
+        assert job.future.result(timeout=5) is True
+        assert job.device_key == "TEST_B"
+        assert job.group == "TEST_GROUP"
+        assert job.failover == []
+        assert spooler.get_jobs(device_key="TEST_GROUP") == [job]
+    finally:
+        spooler.stop()
+
+
+def test_group_job_failover(devices):
+    connections = RecordingConnections({"TEST_A": False})
+    spooler = PrintSpooler(
+        connections=connections,
+        statuses=FakeStatuses(["TEST_A", "TEST_B"])
+    )
+    try:
+        job = spooler.submit("TEST_GROUP", "print_raw", b"ab")
+        assert job.future.result(timeout=5) is True
+        assert connections.runs == ["TEST_A", "TEST_B"]
+        assert job.tried == ["TEST_A"]
+        failover, = job.failover
+        assert (failover["from"], failover["to"], failover["reason"])\
+            == ("TEST_A", "TEST_B", "Printer not ready")
+    finally:
+        spooler.stop()
+
+
+def test_group_queued_jobs_follow_failover(devices):
+    connections = RecordingConnections({"TEST_A": False})
+    connections.blocked["TEST_A"] = threading.Event()
+    spooler = PrintSpooler(
+        connections=connections,
+        statuses=FakeStatuses(["TEST_A", "TEST_B"])
+    )
+    try:
+        job = spooler.submit("TEST_GROUP", "print_raw", b"a")
+        assert connections.started.wait(timeout=5)
+        queued = spooler.submit("TEST_GROUP", "print_raw", b"b")
+        connections.blocked["TEST_A"].set()
+        assert job.future.result(timeout=5) is True
+        assert queued.future.result(timeout=5) is True
+        # The queued job is moved without being tried on TEST_A
+        assert connections.runs.count("TEST_A") == 1
+        assert queued.device_key == "TEST_B"
+        assert queued.failover[0]["reason"]\
+            == f"Printer TEST_A failed on job {job.job_id}"
+    finally:
+        connections.blocked["TEST_A"].set()
+        spooler.stop()
+
+
+def test_group_job_failed_on_all_members(devices):
+    connections = RecordingConnections({
+        "TEST_A": False,
+        "TEST_B": HwDeviceError("Printer not available")
+    })
+    spooler = PrintSpooler(connections=connections)
+    try:
+        job = spooler.submit("TEST_GROUP", "print_raw", b"ab")
+        assert str(job.future.exception(timeout=5)) == "Printer not available"
+        assert connections.runs == ["TEST_A", "TEST_B"]
+        assert job.status == JobStatus.FAILED
+    finally:
+        spooler.stop()
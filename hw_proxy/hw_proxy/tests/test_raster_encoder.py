@@ -0,0 +1,77 @@
+"""
+RasterEncoder tests for hw_proxy module
+"""
+import pytest
+from PIL import Image, ImageDraw
+from hw_proxy.benchmarks.corpus import make_receipt
+from hw_proxy.benchmarks.raster_encoder import IMPLS, escpos_encode
+from hw_proxy.tools.raster_encoder import (
+    RasterEncoder,
+    feed_dots,
+    set_left_margin,
+    set_motion_units
+)
+
+
+def make_sparse_image() -> Image.Image:
+    """Get an image with a narrow band, a blank run and a full band."""
+    img = Image.new("L", (512, 300), 255)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((200, 10, 300, 40), fill=0)
+    draw.rectangle((0, 250, 511, 270), fill=0)
+    return img
+
+
+@pytest.mark.parametrize("impl", IMPLS)
+@pytest.mark.parametrize("fragment_height", (960, 64))
+def test_encode_matches_escpos(impl, fragment_height):
+    img = make_receipt(12)
+    encoder = RasterEncoder(impl=impl, fragment_height=fragment_height)
+    assert encoder.encode(img)\
+        == escpos_encode(img, impl, fragment_height)
+
+
+@pytest.mark.parametrize("impl", IMPLS)
+def test_encoded_size(impl):
+    img = make_receipt(4)
+    encoder = RasterEncoder(impl=impl)
+    output = encoder.encode(img)
+    assert encoder.get_encoded_size(img.height, img.width) == len(output)
+    assert encoder.stats["saved_bytes"] == 0
+
+
+def test_feed_dots_splits_long_runs():
+    assert feed_dots(0) == b""
+    assert feed_dots(10) == b"\x1bJ\x0a"
+    assert feed_dots(300) == b"\x1bJ\xff\x1bJ\x2d"
+
+
+def test_motion_unit_commands():
+    assert set_motion_units(180) == b"\x1dP\xb4\xb4"
+    assert set_motion_units(0) == b"\x1dP\x00\x00"
+    assert set_left_margin(264) == b"\x1dL\x08\x01"
+
+
+def test_trimmed_image_sets_dot_motion_units():
+    img = make_sparse_image()
+    encoder = RasterEncoder(
+        impl="bitImageRaster",
+        trim_blank=True,
+        dpi=203
+    )
+    output = encoder.encode(img)
+    assert output.startswith(set_motion_units(203))
+    assert output.endswith(set_motion_units(0))
+    assert output.count(b"\x1dP") == 2
+    assert b"\x1bJ" in output
+    assert encoder.stats["bytes"] == len(output)
+    assert encoder.stats["blank_rows"] > 200
+    assert encoder.stats["saved_bytes"]\
+        == encoder.stats["image_bytes"] - len(output)
+
+
+def test_trimmed_image_requires_dpi():
+    with pytest.raises(ValueError):
+        RasterEncoder(trim_blank=True)
+    with pytest.raises(ValueError):
+        RasterEncoder(trim_blank=True, dpi=300)
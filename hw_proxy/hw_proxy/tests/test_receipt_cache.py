@@ -0,0 +1,87 @@
+"""
+Encoded receipts cache tests for hw_proxy module
+"""
+import pytest
+from hw_proxy.core.schemas import PrinteImageConfSchemas
+from hw_proxy.tools.receipt_cache import ReceiptCache
+
+
+@pytest.fixture
+def cache():
+    return ReceiptCache(max_bytes=10)
+
+
+def test_cache_key():
+    key = ReceiptCache.make_key("receipt")
+    assert key == ReceiptCache.make_key(b"receipt")
+    assert key == ReceiptCache.make_key(memoryview(b"receipt"))
+    assert key != ReceiptCache.make_key("receipt 2")
+    # Same payload encoded with other settings
+    conf = PrinteImageConfSchemas(impl="bitImageRaster")
+    assert key != ReceiptCache.make_key("receipt", conf)
+    other = PrinteImageConfSchemas(impl="bitImageRaster", dither=False)
+    assert ReceiptCache.make_key("receipt", conf)\
+        != ReceiptCache.make_key("receipt", other)
+
+
+def test_cache_disabled():
+    cache = ReceiptCache(max_bytes=0)
+    assert cache.is_enabled() is False
+    assert cache.put("A", b"A") is False
+    assert cache.get("A") is None
+
+
+def test_cache_lookups(cache):
+    assert cache.is_enabled() is True
+    assert cache.get("A") is None
+    assert cache.put("A", b"AAAA") is True
+    assert cache.get("A") == b"AAAA"
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_cache_evicts_least_recently_used(cache):
+    cache.put("A", b"AAAA")
+    cache.put("B", b"BBBB")
+    cache.get("A")
+    cache.put("C", b"CCCC")
+    assert cache.get("B") is None
+    assert cache.get("A") == b"AAAA"
+    assert cache.get("C") == b"CCCC"
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["size"] == 8
+    assert stats["evictions"] == 1
+
+
+def test_cache_size_limit(cache):
+    cache.put("A", b"AAAA")
+    # Entries larger than the cache are not stored
+    assert cache.put("B", b"B" * 11) is False
+    assert cache.get("A") == b"AAAA"
+    # Replaced entries are not counted twice
+    cache.put("A", b"AAAAAA")
+    cache.put("B", b"BBBB")
+    assert cache.get_stats()["size"] == 10
+    assert cache.put("C", b"C" * 10) is True
+    assert cache.get_stats()["entries"] == 1
+    assert cache.get_stats()["evictions"] == 2
+
+
+def test_cache_bounds(cache):
+    assert cache.get_bounds("A") == ()
+    cache.put("A", b"AAAA")
+    assert cache.get_bounds("A") == (4,)
+    cache.put("B", b"BBBBBB", bounds=(2, 6))
+    assert cache.get_bounds("B") == (2, 6)
+    cache.put("B", b"BBBB")
+    assert cache.get_bounds("B") == (4,)
+    cache.put("B", b"BBBB", bounds=(2, 4))
+    cache.put("C", b"CCCCCCCC")
+    # Evicted entries bounds are dropped
+    assert cache.get_bounds("B") == ()
+    cache.clear()
+    assert cache.get_bounds("C") == ()
+    assert cache.get_stats()["size"] == 0
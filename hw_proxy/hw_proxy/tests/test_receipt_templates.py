@@ -0,0 +1,67 @@
+"""
+Receipt templates tests for hw_proxy module
+"""
+import pytest
+from hw_proxy.core.exceptions import HwTemplateError
+from hw_proxy.tools.receipt_templates import (
+    ReceiptTemplates,
+    format_money,
+    receipt_templates
+)
+from hw_proxy.tools.text_receipt import parse_markup
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "order.j2").write_text(
+        "{% if company %}<b>{{ company.name }}</b>\n{% endif %}"
+        "{{ row(name, total | money(2, currency)) }}\n"
+    )
+    (tmp_path / "broken.j2").write_text("{{ name ")
+    return ReceiptTemplates(str(tmp_path))
+
+
+def test_load_reports_invalid_templates(templates):
+    assert sorted(templates.get_names()) == ["broken", "order"]
+    assert templates.load() == 1
+    assert list(templates.errors) == ["broken"]
+
+
+def test_render_escapes_order_data(templates):
+    markup = templates.render(
+        "order",
+        {"company": {"name": "<cut/>"}, "name": "A", "total": 2},
+        columns=10
+    )
+    assert markup == "<b>&lt;cut/&gt;</b>\nA     2.00\n"
+    parse_markup(markup)
+
+
+def test_render_minimal_data(templates):
+    assert templates.render("order", {"name": "A"}, columns=10)\
+        == "A         \n"
+
+
+def test_shipped_order_template_minimal_data():
+    markup = receipt_templates.render(
+        "order",
+        {"name": "Order 1", "lines": [], "total": 1}
+    )
+    assert markup.startswith("Order 1\n")
+    parse_markup(markup)
+
+
+def test_render_errors(templates):
+    with pytest.raises(HwTemplateError):
+        templates.render("missing", {})
+    with pytest.raises(HwTemplateError):
+        templates.render("../order", {})
+    with pytest.raises(HwTemplateError):
+        templates.render("broken", {})
+
+
+def test_format_money():
+    assert format_money(3) == "3.00"
+    assert format_money(2.5, 1, "EUR") == "2.5 EUR"
+    assert format_money(None) == ""
+    assert format_money("free") == "free"
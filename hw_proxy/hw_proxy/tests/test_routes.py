@@ -0,0 +1,94 @@
+"""
+Api routes tests for hw_proxy module
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from hw_proxy.app.routes.hw_proxy import router
+from hw_proxy.core.exceptions import HwQueueFullError
+from hw_proxy.tools.print_spooler import print_spooler
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = FastAPI()
+    app.include_router(router)
+    submitted = []
+    def _submit(*args, **kwargs):
+        # Rejected once recorded, so no job is run
+        submitted.append((args, kwargs))
+        raise HwQueueFullError("Print queue is full", retry_after=2)
+    monkeypatch.setattr(print_spooler, "submit", _submit)
+    monkeypatch.setattr(
+        print_spooler,
+        "get_queue_limits",
+        lambda device_key: {"max_jobs": 0, "max_bytes": 8, "max_wait": 0}
+    )
+    client = TestClient(app)
+    client.submitted = submitted
+    return client
+
+
+def default_printer_action(client, action: str, receipt=None):
+    """Post an Odoo default_printer_action call."""
+    return client.post("/default_printer_action", json={
+        "jsonrpc": "2.0",
+        "id": 1,
+        "params": {"data": {"action": action, "receipt": receipt}}
+    })
+
+
+@pytest.mark.parametrize("action, endpoint", [
+    ("nv_store", "/nv_graphics/{key}"),
+    ("nv_delete", "/nv_graphics/{key}"),
+    ("print_raw", "/binary_printer_action"),
+    # Batch actions are validated by BatchRequest
+    ("batch", "/batch_printer_action"),
+    ("unknown", None)
+])
+def test_default_action_rejected(client, action, endpoint):
+    response = default_printer_action(client, action, "AB")
+    assert response.status_code == 400
+    message = response.json()["detail"]["error"]["message"]
+    assert message.startswith(f"Unsupported printer action: {action}")
+    if endpoint is not None:
+        assert message.endswith(f"use {endpoint}")
+    assert client.submitted == []
+
+
+def test_batch_actions_validated(client):
+    response = client.post("/batch_printer_action", json={
+        "actions": [{"action": "nv_delete", "receipt": "AB"}]
+    })
+    assert response.status_code == 422
+    assert client.submitted == []
+
+
+def test_binary_body_streamed(client):
+    def _body():
+        yield b"\x1b@"
+        yield b"\x1bd\x02"
+    response = client.post(
+        "/binary_printer_action?action=print_raw&cut=false",
+        content=_body()
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    (_, kwargs), = client.submitted
+    assert kwargs["action"] == "print_raw"
+    assert kwargs["receipt"] == b"\x1b@\x1bd\x02"
+    assert kwargs["cut"] is False
+
+
+def test_binary_body_too_large(client):
+    def _body():
+        yield b"\x1b@" * 4
+        yield b"\x1b@"
+    # Streamed body, without content-length
+    response = client.post("/binary_printer_action", content=_body())
+    assert response.status_code == 413
+    response = client.post("/binary_printer_action", content=b"\x00" * 9)
+    assert response.status_code == 413
+    response = client.post("/binary_printer_action", content=b"")
+    assert response.status_code == 400
+    assert client.submitted == []
@@ -0,0 +1,22 @@
+"""
+Pydantic schemas tests for hw_proxy module
+"""
+import pytest
+from pydantic import ValidationError
+from hw_proxy.core.schemas import PrinteImageConfSchemas
+
+
+@pytest.mark.parametrize("impl, expected", [
+    ("bitImageColumn", "bitImageColumn"),
+    ("bitImageRaster", "bitImageRaster"),
+    ("graphics", "graphics"),
+    # Former configurations
+    ("Image", "bitImageRaster")
+])
+def test_image_conf_impl(impl, expected):
+    assert PrinteImageConfSchemas(impl=impl).impl == expected
+
+
+def test_image_conf_invalid_impl():
+    with pytest.raises(ValidationError):
+        PrinteImageConfSchemas(impl="image")
@@ -0,0 +1,72 @@
+"""
+Spool journal tests for hw_proxy module
+"""
+import pytest
+from hw_proxy.core.schemas import BinaryPrintRequest
+from hw_proxy.tools.print_spooler import PrintJob
+from hw_proxy.tools.spool_journal import (
+    SpoolJournal,
+    dump_receipt,
+    load_receipt
+)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = SpoolJournal(directory=str(tmp_path))
+    yield journal
+    journal.stop()
+
+
+@pytest.mark.parametrize("receipt, expected", [
+    (None, None),
+    (b"\x1b@\x00", b"\x1b@\x00"),
+    ("line\n<b>bold</b>", "line\n<b>bold</b>"),
+    ({"lines": [{"text": "a"}]}, {"lines": [{"text": "a"}]}),
+    # Batch raw bytes are stored as base64, as print_raw accepts them
+    ([{"action": "print_raw", "receipt": b"\x1b@"}],
+     [{"action": "print_raw", "receipt": "G0A="}])
+])
+def test_receipt_round_trip(receipt, expected):
+    assert load_receipt(*dump_receipt(receipt)) == expected
+
+
+def test_model_receipt_stored_as_dict():
+    receipt = BinaryPrintRequest(printer_name="printer")
+    assert load_receipt(*dump_receipt(receipt)) == receipt.model_dump()
+
+
+def test_disabled_journal():
+    journal = SpoolJournal()
+    assert not journal.enabled
+    assert journal.append(PrintJob("printer", "print_raw")).result() is False
+    assert journal.get_pending() == []
+
+
+def test_pending_jobs_replayed_in_order(journal):
+    jobs = [
+        PrintJob("printer", "print_raw", b"\x1b@", request_id=1),
+        PrintJob("printer", "print_markup", "a", cut=False),
+        PrintJob("printer", "cashdrawer", cashdrawer=True)
+    ]
+    for job in jobs:
+        journal.append(job)
+    assert journal.finish(jobs[1].job_id, "done").result(timeout=5)
+    pending = journal.get_pending()
+    assert [item["job_id"] for item in pending]\
+        == [jobs[0].job_id, jobs[2].job_id]
+    assert pending[0]["receipt"] == b"\x1b@"
+    assert pending[0]["request_id"] == 1
+    assert pending[0]["cut"] is True
+    assert pending[1]["cashdrawer"] is True
+    assert pending[1]["created_at"] == jobs[2].created_at
+
+
+def test_journal_survives_restart(journal, tmp_path):
+    job = PrintJob("printer", "print_raw", b"\x1b@")
+    assert journal.append(job).result(timeout=5)
+    journal.stop()
+    assert journal.commits >= 1
+    restarted = SpoolJournal(directory=str(tmp_path))
+    assert [item["job_id"] for item in restarted.get_pending()]\
+        == [job.job_id]
@@ -0,0 +1,99 @@
+"""
+Printer status poller tests for hw_proxy module
+"""
+from contextlib import contextmanager
+from time import monotonic, sleep
+import pytest
+from hw_proxy.core.exceptions import HwPrinterError
+from hw_proxy.tools.status_poller import DeviceStatusPoller, PrinterStatus
+
+
+class FakePrinter:
+    """Printer answering status queries, and recording their time."""
+    def __init__(self, error: bool = False):
+        self.error = error
+        self.queries = []
+
+    def get_full_printer_status(self) -> dict:
+        self.queries.append(monotonic())
+        return {"is_online": True, "paper_status": "ok"}
+
+
+class FakeConnections:
+    """Connection manager lending a FakePrinter."""
+    def __init__(self, printer: FakePrinter):
+        self.printer = printer
+
+    @contextmanager
+    def borrow(self, device_key: str):
+        if self.printer.error:
+            raise HwPrinterError("Printer not available")
+        yield self.printer
+
+
+def wait_for(predicate, timeout: float = 2) -> bool:
+    """Wait for predicate to be true."""
+    deadline = monotonic() + timeout
+    while not predicate():
+        if monotonic() > deadline:
+            return False
+        sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def printer():
+    return FakePrinter()
+
+
+@pytest.fixture
+def poller(printer):
+    poller = DeviceStatusPoller(
+        "printer",
+        FakeConnections(printer),
+        interval=60,
+        min_interval=0.3
+    )
+    yield poller
+    poller.stop()
+    if poller.is_alive():
+        poller.join(timeout=2)
+
+
+def test_printer_status():
+    assert PrinterStatus().is_ready() is False
+    assert PrinterStatus().get_age() is None
+    status = PrinterStatus({"is_online": True, "paper_status": "ok"}, 0)
+    assert status.get_str_status() == "connected"
+    status = PrinterStatus({"is_online": True, "paper_status": "near_end"})
+    assert status.get_str_status() == "disconnected"
+
+
+def test_wait_time(poller):
+    assert poller._get_wait_time(False) == 0
+    poller.refresh()
+    assert 0.2 < poller._get_wait_time(True) <= 0.3
+    assert 59 < poller._get_wait_time(False) <= 60
+    assert poller.status.is_ready() is True
+
+
+def test_refresh_requests_limited(poller, printer):
+    poller.start()
+    assert wait_for(lambda: len(printer.queries) == 1)
+    for _ in range(20):
+        poller.request_refresh()
+    sleep(0.1)
+    # Requests within min_interval share a single query
+    assert len(printer.queries) == 1
+    assert wait_for(lambda: len(printer.queries) == 2)
+    assert printer.queries[1] - printer.queries[0] >= 0.3
+    sleep(0.4)
+    assert len(printer.queries) == 2
+
+
+def test_unavailable_printer(poller, printer):
+    printer.error = True
+    poller.refresh()
+    assert poller.status.is_ready() is False
+    assert poller.status.status["error"] == "Printer not available"
+    assert poller.status.get_age() is not None
@@ -0,0 +1,136 @@
+"""
+Receipt markup tests for hw_proxy module
+"""
+import pytest
+from hw_proxy.core.schemas import TextReceiptSchemas
+from hw_proxy.tools.text_receipt import (
+    MarkupTag,
+    TextReceiptRenderer,
+    get_feed_lines,
+    parse_markup
+)
+
+
+RECEIPT = {
+    "header": [{"text": "Shop", "align": "center", "bold": True}],
+    "lines": [
+        {"name": "Tea", "qty": 2, "unit_price": 1.5, "price": 3.0},
+        {"name": "Cake", "price": "free", "note": "no sugar"}
+    ],
+    "totals": [{"label": "Total", "amount": 3, "bold": True}],
+    "currency": "EUR"
+}
+
+
+def encode_image(img):
+    """Image encoder stub, yielding image size."""
+    yield b"<image %dx%d>" % img.size
+
+
+def get_tokens(line):
+    """Get markup line tokens as text or (name, closing, attributes)."""
+    return [
+        token if isinstance(token, str)
+        else (token.name, token.closing, token.attributes)
+        for token in line
+    ]
+
+
+def test_parse_markup_lines_and_tags():
+    lines = parse_markup(
+        '<center><b>Shop</b></center>\nTea &lt;x&gt;\n<feed n="3"/><cut/>'
+    )
+    assert [get_tokens(line) for line in lines] == [
+        [
+            ("center", False, {}),
+            ("b", False, {}),
+            "Shop",
+            ("b", True, {}),
+            ("center", True, {})
+        ],
+        ["Tea <x>"],
+        [("feed", False, {"n": "3"}), ("cut", False, {})]
+    ]
+
+
+def test_parse_markup_keeps_blank_lines():
+    assert parse_markup("a\n\nb") == [["a"], [], ["b"]]
+    assert parse_markup("") == []
+
+
+@pytest.mark.parametrize("markup", (
+    "<bogus>x</bogus>",
+    '<feed n="x"/>',
+    '<feed n="1.5"/>'
+))
+def test_parse_markup_rejects_invalid_tags(markup):
+    with pytest.raises(ValueError):
+        parse_markup(markup)
+
+
+@pytest.mark.parametrize("value, lines", (
+    (None, 1),
+    ("0", 0),
+    ("4", 4),
+    ("-2", 0),
+    ("5000", 255)
+))
+def test_feed_lines_are_bounded(value, lines):
+    attributes = {"n": value} if value is not None else {}
+    assert get_feed_lines(MarkupTag("feed", attributes=attributes)) == lines
+
+
+def test_feed_is_one_command():
+    output = TextReceiptRenderer().render_markup('a<feed n="5000"/>b')
+    assert b"\x1bd\xff" in output
+    assert b"\n" * 10 not in output
+    assert len(output) < 100
+
+
+def test_text_receipt_lines():
+    renderer = TextReceiptRenderer(columns=20)
+    lines = renderer.get_lines(TextReceiptSchemas(**RECEIPT))
+    assert [line.text for line in lines] == [
+        "Shop",
+        "-" * 20,
+        "Tea         3.00 EUR",
+        "  2 x 1.50 EUR",
+        "Cake            free",
+        "  no sugar",
+        "-" * 20,
+        "Total       3.00 EUR"
+    ]
+    assert (lines[0].align, lines[0].bold) == ("center", True)
+    assert lines[-1].bold is True
+
+
+def test_text_receipt_justify():
+    lines = TextReceiptRenderer(columns=20).justify(
+        "Green tea with lemon", "9.99", 20
+    )
+    # Left text is wrapped before the right aligned amount
+    assert lines == ["Green tea with  9.99", "lemon"]
+
+
+def test_text_receipt_styles_sent_on_change():
+    renderer = TextReceiptRenderer(columns=20)
+    output = renderer.render(TextReceiptSchemas(**RECEIPT))
+    assert output.startswith(b"\x1b@")
+    # Item lines share the style set by the rule line
+    assert b"-" * 20 + b"\nTea         3.00 EUR\n  2 x 1.50 EUR\n" in output
+    assert output.count(b"\x1bE\x01") == 2
+    assert renderer.stats == {"text_lines": 8, "image_lines": 0}
+
+
+def test_text_receipt_image_lines():
+    renderer = TextReceiptRenderer(columns=20, encode_image=encode_image)
+    receipt = dict(RECEIPT, footer=[{"text": "\u6f22\u5b57"}])
+    output = renderer.render(TextReceiptSchemas(**receipt))
+    # Text no code page can print is sent as an image, after the text
+    assert output.index(b"Total") < output.index(b"<image ")
+    # Footer is separated by a rule
+    assert renderer.stats == {"text_lines": 9, "image_lines": 1}
+    # Without image encoder, text is sent as is
+    renderer = TextReceiptRenderer(columns=20)
+    assert b"<image " not in renderer.render(TextReceiptSchemas(**receipt))
+    assert renderer.stats["image_lines"] == 0
@@ -0,0 +1,93 @@
+"""
+Span timing hooks tests for hw_proxy module
+"""
+import pytest
+from escpos.printer import Dummy
+from hw_proxy.tools.pos_helper import EscPosHelper
+from hw_proxy.tools.tracing import SpanHook, Tracer
+
+
+class RecordingHook(SpanHook):
+    """Hook recording started and ended span names."""
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, span):
+        self.events.append(("start", span.name))
+
+    def on_end(self, span):
+        self.events.append(("end", span.name))
+
+
+class FailingHook(SpanHook):
+    """Hook raising on each call."""
+    def on_start(self, span):
+        raise RuntimeError("Hook error")
+
+    on_end = on_start
+
+
+@pytest.fixture
+def tracer():
+    return Tracer()
+
+
+def test_nested_spans(tracer):
+    hook = tracer.add_hook(RecordingHook())
+    ended = []
+    tracer.add_hook(ended.append)
+    with tracer.span("job", device="A") as job:
+        assert tracer.get_current_span() is job
+        with tracer.span("encode") as encode:
+            assert encode.parent is job
+    assert tracer.get_current_span() is None
+    assert hook.events == [
+        ("start", "job"), ("start", "encode"),
+        ("end", "encode"), ("end", "job")
+    ]
+    # Plain callables are called with ended spans
+    assert ended == [encode, job]
+    assert job.duration >= encode.duration
+    assert job.to_dict()["device"] == "A"
+    assert encode.to_dict()["parent"] == "job"
+
+
+def test_span_error(tracer):
+    ended = tracer.add_hook(RecordingHook())
+    tracer.add_hook(FailingHook())
+    with pytest.raises(ValueError):
+        with tracer.span("encode") as span:
+            raise ValueError("Bad image")
+    # Hook errors are not raised, and other hooks still run
+    assert ended.events == [("start", "encode"), ("end", "encode")]
+    assert span.error == "Bad image"
+    assert span.end is not None
+
+
+def test_remove_and_load_hooks(tracer):
+    hook = tracer.add_hook(RecordingHook())
+    tracer.remove_hook(hook)
+    tracer.load_hooks([
+        "hw_proxy.tools.tracing:LoggingSpanHook",
+        "hw_proxy.tools.tracing:MissingHook"
+    ])
+    with tracer.span("job"):
+        pass
+    assert hook.events == []
+    assert len(tracer._hooks) == 1
+
+
+def test_helper_stage_timings(monkeypatch):
+    helper = EscPosHelper("TEST_PRINTER", keep_open=True)
+    helper.printer = Dummy()
+    monkeypatch.setattr(
+        helper, "is_printer_ready", lambda initialized=False: True
+    )
+    with helper.trace("encode"):
+        pass
+    with helper.trace("encode"):
+        pass
+    assert list(helper.timings) == ["encode"]
+    helper.timings = {}
+    assert helper.print_raw(b"\x1b@" * 8) is True
+    assert helper.timings["transmit"] > 0
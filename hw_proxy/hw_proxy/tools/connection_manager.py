@@ -0,0 +1,309 @@
+"""
+Printer connection manager for hw_proxy module
+
+Keeps one open escpos printer connection per device key,
+so requests don't reopen the port on every ticket.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+from escpos.exceptions import DeviceNotFoundError
+from hw_proxy.tools.pos_helper import EscPosHelper
+from hw_proxy.tools.receipt_cache import ReceiptCache, receipt_cache
+from hw_proxy.tools.metrics import PRINTER_ERRORS, RECONNECTS
+from hw_proxy.tools.device_registry import RegistrySnapshot, device_registry
+from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import HwImageError, HwPrinterError
+
+
+logger = logging.getLogger("hw_proxy")
+
+T = TypeVar("T")
+
+# Exceptions meaning the connection itself is broken
+CONNECTION_ERRORS = (OSError, DeviceNotFoundError)
+
+
+class PrinterConnection:
+    """
+    Open printer connection of a device.
+    """
+    def __init__(self, device_key: str):
+        self.device_key = device_key
+        self.lock = threading.RLock()
+        self.helper: Optional[EscPosHelper] = None
+        self.last_used = monotonic()
+        self.connects = 0
+        self.reconnects = 0
+        self.errors = 0
+
+    def is_open(self) -> bool:
+        """Test if connection has an open printer."""
+        return self.helper is not None\
+            and self.helper.has_printer()
+
+    def get_stats(self) -> dict:
+        """Get connection stats."""
+        return {
+            "device_key": self.device_key,
+            "is_open": self.is_open(),
+            "idle_time": round(monotonic() - self.last_used, 3),
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "errors": self.errors
+        }
+
+
+class PrinterConnectionManager:
+    """
+    Process-wide printer connection manager.
+
+    Each device key owns a single open escpos printer object,
+    borrowed under a lock, health checked before use,
+    reopened after errors and closed when idle.
+    """
+    def __init__(self,
+                 idle_timeout: float = 60,
+                 receipt_cache: Optional[ReceiptCache] = None
+                 ):
+        self.idle_timeout = idle_timeout
+        self.receipt_cache = receipt_cache
+        self._connections: Dict[str, PrinterConnection] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def get_connection(self, device_key: str) -> PrinterConnection:
+        """Get or create connection holder of device."""
+        with self._lock:
+            conn = self._connections.get(device_key)
+            if conn is None:
+                conn = PrinterConnection(device_key)
+                self._connections[device_key] = conn
+            return conn
+
+    def _connect(self, conn: PrinterConnection) -> EscPosHelper:
+        """Open printer connection of device if missing or unhealthy."""
+        helper = conn.helper
+        if helper is not None and helper.is_connection_alive():
+            return helper
+        if helper is not None:
+            logger.warning(
+                "[PrinterConnectionManager] Connection to "
+                f"{conn.device_key} is not healthy, reconnecting..."
+            )
+            self._disconnect(conn)
+            conn.reconnects += 1
+            RECONNECTS.inc(device=conn.device_key)
+        helper = EscPosHelper(
+            conn.device_key,
+            keep_open=True,
+            receipt_cache=self.receipt_cache
+        )
+        helper.open_printer()
+        conn.helper = helper
+        conn.connects += 1
+        logger.debug(
+            f"[PrinterConnectionManager] Connection to {conn.device_key} opened."
+        )
+        return helper
+
+    @staticmethod
+    def _disconnect(conn: PrinterConnection):
+        """Close printer connection of device, ignoring close errors."""
+        helper = conn.helper
+        conn.helper = None
+        if helper is None:
+            return
+        try:
+            helper.close_printer(force=True)
+        except HwPrinterError as e:
+            logger.debug(
+                "[PrinterConnectionManager] Error closing connection to "
+                f"{conn.device_key}: {e}"
+            )
+
+    @contextmanager
+    def borrow(self, device_key: str) -> Iterator[EscPosHelper]:
+        """
+        Borrow the open printer helper of a device.
+
+        The connection is locked for the caller until the block ends.
+        Any exception raised inside the block drops the connection,
+        so the next borrow opens a new one.
+        """
+        conn = self.get_connection(device_key)
+        with conn.lock:
+            try:
+                helper = self._connect(conn)
+            except Exception as e:
+                self._count_error(conn, e)
+                self._disconnect(conn)
+                raise
+            try:
+                yield helper
+            except Exception as e:
+                self._count_error(conn, e)
+                self._disconnect(conn)
+                raise
+            finally:
+                conn.last_used = monotonic()
+
+    def _count_error(self, conn: PrinterConnection, error: Exception):
+        """Count a connection error in stats and metrics."""
+        conn.errors += 1
+        PRINTER_ERRORS.inc(
+            device=conn.device_key,
+            kind="connection" if self.is_connection_error(error) else "printer"
+        )
+
+    def run(
+        self,
+        device_key: str,
+        func: Callable[[EscPosHelper], T],
+        retry: bool = True
+    ) -> T:
+        """
+        Run func with the borrowed printer helper of a device.
+
+        If the connection turns out to be broken before func wrote
+        any byte, reconnect and run func once again.
+        Bytes already written are never sent again: a half printed
+        receipt fails instead of printing twice.
+        """
+        written = 0
+        try:
+            with self.borrow(device_key) as helper:
+                helper.bytes_written = 0
+                try:
+                    return func(helper)
+                finally:
+                    written = helper.bytes_written
+        except HwPrinterError as e:
+            if retry is not True or not self.is_connection_error(e):
+                raise
+            if written > 0:
+                logger.error(
+                    f"[PrinterConnectionManager] Connection error on "
+                    f"{device_key} after {written} bytes written, "
+                    f"not retrying. error: {e}"
+                )
+                raise
+            logger.warning(
+                f"[PrinterConnectionManager] Connection error on {device_key}, "
+                f"retrying with a new connection. error: {e}"
+            )
+        with self.borrow(device_key) as helper:
+            return func(helper)
+
+    @staticmethod
+    def is_connection_error(error: BaseException) -> bool:
+        """Test if error, or any error causing it, is a connection error."""
+        while error is not None:
+            # Pillow raises OSError on bad images
+            if isinstance(error, HwImageError):
+                return False
+            if isinstance(error, CONNECTION_ERRORS):
+                return True
+            error = error.__cause__
+        return False
+
+    def close(self, device_key: str) -> bool:
+        """Close connection of a device."""
+        conn = self._connections.get(device_key)
+        if conn is None:
+            return False
+        with conn.lock:
+            self._disconnect(conn)
+        return True
+
+    def on_registry_update(self, old: RegistrySnapshot, new: RegistrySnapshot):
+        """
+        Close connections of devices changed or removed by a registry reload,
+        once their running job is done. Next jobs reconnect with new settings.
+        """
+        with self._lock:
+            device_keys = list(self._connections)
+        for device_key in device_keys:
+            if old.devices.get(device_key) != new.devices.get(device_key):
+                logger.info(
+                    "[PrinterConnectionManager] Device configuration of "
+                    f"{device_key} changed, closing its connection."
+                )
+                self.close(device_key)
+
+    def close_idle(self) -> int:
+        """Close connections unused for more than idle_timeout seconds."""
+        closed = 0
+        with self._lock:
+            connections = list(self._connections.values())
+        for conn in connections:
+            # Never wait on a connection in use, it is not idle.
+            if not conn.lock.acquire(blocking=False):
+                continue
+            try:
+                idle_time = monotonic() - conn.last_used
+                if conn.is_open() and idle_time >= self.idle_timeout:
+                    logger.debug(
+                        "[PrinterConnectionManager] Closing idle connection "
+                        f"to {conn.device_key} ({idle_time:.1f}s idle)."
+                    )
+                    self._disconnect(conn)
+                    closed += 1
+            finally:
+                conn.lock.release()
+        return closed
+
+    def close_all(self):
+        """Close all connections."""
+        with self._lock:
+            connections = list(self._connections.values())
+        for conn in connections:
+            with conn.lock:
+                self._disconnect(conn)
+
+    def get_stats(self) -> list:
+        """Get stats of all connections."""
+        with self._lock:
+            connections = list(self._connections.values())
+        return [conn.get_stats() for conn in connections]
+
+    def _reap_idle(self):
+        """Idle connections reaper loop."""
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._stop_event.wait(interval):
+            try:
+                self.close_idle()
+            except Exception as e:
+                logger.error(
+                    f"[PrinterConnectionManager] Idle reaper error: {e}"
+                )
+
+    def start(self):
+        """Start idle connections reaper."""
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        self._stop_event.clear()
+        self._reaper = threading.Thread(
+            target=self._reap_idle,
+            name="hw_proxy-connection-reaper",
+            daemon=True
+        )
+        self._reaper.start()
+
+    def stop(self):
+        """Stop idle connections reaper and close all connections."""
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+        self.close_all()
+
+
+connection_manager = PrinterConnectionManager(
+    idle_timeout=settings.PRINTER_IDLE_TIMEOUT,
+    receipt_cache=receipt_cache
+)
+device_registry.add_listener(connection_manager.on_registry_update)
@@ -1,9 +1,10 @@
 """
 Device helper for hw_proxy module
 """
-from typing import Optional
-from hw_proxy.core.schemas import DeviceConfigSchemas, PrinteImageConfSchemas
-from hw_proxy.core.supported_devices import device_list
+from typing import List, Optional, Union
+from hw_proxy.core.schemas import DeviceConfigSchemas, PrinterGroupSchemas
+from hw_proxy.core.supported_devices import DeviceType
+from hw_proxy.tools.device_registry import device_registry
 
 
 class DeviceHelper:
@@ -11,32 +12,39 @@ class DeviceHelper:
     Device helper for hw_proxy module
     """
     def __init__(self, device_key: str):
-        self.device_key = None
+        self.device_key = device_key
         self.device = self.select_device(device_key)
     
-    def select_device(self, device_key: str):
-        """Select device in device_list"""
-        for device in device_list:
-            key = device.get("key", None)
-            if key == device_key:
-                image_conf = None
-                if device.get('image_conf') is not None:
-                    image_conf = PrinteImageConfSchemas(
-                        **device.get('image_conf')
-                    )
-                return DeviceConfigSchemas(
-                    vendor=device.get('vendor'),
-                    product=device.get('product'),
-                    name=device.get('name'),
-                    key=device.get('key'),
-                    type=device.get('type'),
-                    port_type=device.get('port_type'),
-                    conf=self.set_device_port_schema(
-                        port_type=device.get('port_type'),
-                        config=device.get('conf')),
-                    image_conf=image_conf
-                )
-        return None
+    def select_device(self, device_key: str) -> Optional[DeviceConfigSchemas]:
+        """Select device in device registry"""
+        return device_registry.get_device(device_key)
+
+    @staticmethod
+    def get_device_keys(
+        device_type: Optional[DeviceType] = None
+    ) -> List[str]:
+        """Get keys of registered devices, optionally of a type only."""
+        return device_registry.get_device_keys(device_type)
+
+    @staticmethod
+    def find_device_key(printer_name: Union[str, int]) -> Optional[str]:
+        """
+        Find device key from a printer name.
+
+        printer_name may be a device key, a device name
+        or one of the device Odoo printer ids.
+        """
+        return device_registry.find_device_key(printer_name)
+
+    @staticmethod
+    def select_group(group_key: str) -> Optional[PrinterGroupSchemas]:
+        """Select printer group in device registry"""
+        return device_registry.get_group(group_key)
+
+    @staticmethod
+    def find_group_key(group_name: Union[str, int]) -> Optional[str]:
+        """Find printer group key from its key, name or Odoo printer ids."""
+        return device_registry.find_group_key(group_name)
     
     def set_device_conf(self, device_key: Optional[str]=None):
         """Set printer configuration."""
@@ -0,0 +1,341 @@
+"""
+Device registry for hw_proxy module
+
+Devices and printer groups are validated once into pydantic models,
+indexed by key, name and Odoo printer id in an immutable snapshot.
+
+They are loaded from the DEVICES_CONFIG_FILE JSON or YAML file if set,
+else from supported_devices device_list and printer_groups.
+The file is watched, and a new validated snapshot replaces the current one
+in a single assignment: requests and queued jobs keep working during reloads,
+and an invalid file keeps the previous snapshot.
+
+Config file format (YAML needs PyYAML):
+    {
+        "devices": [{"key": "PP6800", "type": "printer", ...}],
+        "printer_groups": [{"key": "RECEIPT", "members": ["PP6800"], ...}]
+    }
+"""
+import json
+import logging
+import os
+import threading
+from time import time
+from typing import Callable, Dict, List, Optional, Union
+from pydantic import ValidationError
+from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import HwDeviceError
+from hw_proxy.core.schemas import (
+    DeviceConfigSchemas,
+    NetworkDeviceSchemas,
+    PrinteImageConfSchemas,
+    PrinterGroupSchemas,
+    QueueLimitsSchemas,
+    SerialDeviceSchemas,
+    UsbDeviceSchemas
+)
+from hw_proxy.core.supported_devices import (
+    DevicePortType,
+    DeviceType,
+    device_list,
+    printer_groups
+)
+
+
+logger = logging.getLogger("hw_proxy")
+
+PORT_SCHEMAS = {
+    DevicePortType.USB: UsbDeviceSchemas,
+    DevicePortType.NETWORK: NetworkDeviceSchemas,
+    DevicePortType.SERIAL: SerialDeviceSchemas
+}
+
+
+def build_device(device: dict) -> DeviceConfigSchemas:
+    """Validate a device entry, with the conf schema of its port type."""
+    data = dict(device)
+    port_type = DevicePortType(data.get("port_type"))
+    data["port_type"] = port_type
+    data["conf"] = PORT_SCHEMAS[port_type](**(data.get("conf") or {}))
+    if data.get("image_conf") is not None:
+        data["image_conf"] = PrinteImageConfSchemas(**data["image_conf"])
+    if data.get("queue_limits") is not None:
+        data["queue_limits"] = QueueLimitsSchemas(**data["queue_limits"])
+    data["odoo_printer_ids"] = data.get("odoo_printer_ids") or []
+    return DeviceConfigSchemas(**data)
+
+
+class RegistrySnapshot:
+    """
+    Validated devices and printer groups, never modified once built.
+    """
+    def __init__(self,
+                 devices: List[dict],
+                 groups: Optional[List[dict]] = None,
+                 source: str = "supported_devices",
+                 mtime: Optional[float] = None
+                 ):
+        self.source = source
+        self.mtime = mtime
+        self.loaded_at = time()
+        self.devices: Dict[str, DeviceConfigSchemas] = {}
+        self.groups: Dict[str, PrinterGroupSchemas] = {}
+        # Lower case names and Odoo printer ids to device or group keys
+        self.device_names: Dict[str, str] = {}
+        self.group_names: Dict[str, str] = {}
+        errors = []
+        for index, device in enumerate(devices):
+            try:
+                conf = build_device(device)
+            except (ValidationError, ValueError, TypeError, KeyError) as e:
+                errors.append(f"device #{index} ({device.get('key')}): {e}")
+                continue
+            if conf.key in self.devices:
+                errors.append(f"device #{index}: duplicate key {conf.key}")
+                continue
+            self.devices[conf.key] = conf
+            self._index(self.device_names, conf.key, conf.name,
+                        conf.odoo_printer_ids)
+        for index, group in enumerate(groups or []):
+            try:
+                conf = PrinterGroupSchemas(**group)
+            except ValidationError as e:
+                errors.append(f"group #{index} ({group.get('key')}): {e}")
+                continue
+            unknown = [key for key in conf.members if key not in self.devices]
+            if unknown:
+                errors.append(
+                    f"group {conf.key}: unknown members {unknown}"
+                )
+                continue
+            self.groups[conf.key] = conf
+            self._index(self.group_names, conf.key, conf.name,
+                        conf.odoo_printer_ids)
+        if errors:
+            raise HwDeviceError(
+                f"Invalid devices configuration ({source}): "
+                + "; ".join(errors)
+            )
+
+    @staticmethod
+    def _index(names: Dict[str, str], key: str, name: str, odoo_ids: list):
+        """Index name and Odoo printer ids, first entry wins."""
+        names.setdefault(name.strip().lower(), key)
+        for odoo_id in odoo_ids:
+            names.setdefault(str(odoo_id).strip().lower(), key)
+
+
+def load_config_file(path: str) -> dict:
+    """Read a JSON or YAML devices config file."""
+    with open(path, encoding="utf-8") as file:
+        content = file.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as e:
+            raise HwDeviceError(
+                "PyYAML is required for YAML devices config files."
+            ) from e
+        config = yaml.safe_load(content) or {}
+    else:
+        config = json.loads(content)
+    if not isinstance(config, dict):
+        raise HwDeviceError(f"Invalid devices config file: {path}")
+    return config
+
+
+RegistryListener = Callable[[RegistrySnapshot, RegistrySnapshot], None]
+
+
+class DeviceRegistry:
+    """
+    Process-wide devices registry.
+
+    Readers take the current snapshot reference and never lock,
+    writers build a whole new snapshot and swap it.
+    Listeners are called with old and new snapshots after each swap.
+    """
+    def __init__(self,
+                 path: Optional[str] = None,
+                 watch_interval: float = 2
+                 ):
+        self.path = path
+        self.watch_interval = watch_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+        # Config file mtime of last load attempt, valid or not
+        self._checked_mtime: Optional[float] = None
+        self._listeners: List[RegistryListener] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.snapshot = self.load()
+
+    def load(self) -> RegistrySnapshot:
+        """Build a snapshot from config file, or supported_devices."""
+        if self.path is None:
+            return RegistrySnapshot(device_list, printer_groups)
+        mtime = os.path.getmtime(self.path)
+        self._checked_mtime = mtime
+        config = load_config_file(self.path)
+        return RegistrySnapshot(
+            config.get("devices") or [],
+            config.get("printer_groups") or [],
+            source=self.path,
+            mtime=mtime
+        )
+
+    def swap(self, snapshot: RegistrySnapshot):
+        """Replace current snapshot and notify listeners."""
+        with self._lock:
+            old, self.snapshot = self.snapshot, snapshot
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(old, snapshot)
+            except Exception as e:
+                logger.error(f"[DeviceRegistry] Listener error: {e}")
+
+    def reload(self) -> bool:
+        """Reload config, keeping current snapshot if invalid."""
+        try:
+            snapshot = self.load()
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = str(e)
+            logger.error(
+                f"[DeviceRegistry] Unable to reload devices config, "
+                f"keeping previous one. error: {e}"
+            )
+            return False
+        self.swap(snapshot)
+        self.reloads += 1
+        self.last_error = None
+        logger.info(
+            f"[DeviceRegistry] Devices config reloaded from {snapshot.source}: "
+            f"{len(snapshot.devices)} devices, {len(snapshot.groups)} groups."
+        )
+        return True
+
+    def register_device(self, device: dict):
+        """Add or replace a device at runtime, e.g. a simulator."""
+        snapshot = self.snapshot
+        devices = [
+            conf.model_dump() for key, conf in snapshot.devices.items()
+            if key != device.get("key")
+        ]
+        self.swap(RegistrySnapshot(
+            devices + [device],
+            [group.model_dump() for group in snapshot.groups.values()],
+            source=snapshot.source,
+            mtime=snapshot.mtime
+        ))
+
+    def unregister_device(self, device_key: str):
+        """Remove a device added at runtime, and groups using it."""
+        snapshot = self.snapshot
+        self.swap(RegistrySnapshot(
+            [
+                conf.model_dump() for key, conf in snapshot.devices.items()
+                if key != device_key
+            ],
+            [
+                group.model_dump() for group in snapshot.groups.values()
+                if device_key not in group.members
+            ],
+            source=snapshot.source,
+            mtime=snapshot.mtime
+        ))
+
+    def add_listener(self, listener: RegistryListener):
+        """Call listener(old, new) after each snapshot swap."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get_device(self, device_key: Optional[str]) -> Optional[DeviceConfigSchemas]:
+        """Get device configuration."""
+        return self.snapshot.devices.get(device_key)
+
+    def get_group(self, group_key: Optional[str]) -> Optional[PrinterGroupSchemas]:
+        """Get printer group configuration."""
+        return self.snapshot.groups.get(group_key)
+
+    def get_device_keys(
+        self,
+        device_type: Optional[DeviceType] = None
+    ) -> List[str]:
+        """Get device keys, optionally of a type only."""
+        return [
+            key for key, device in self.snapshot.devices.items()
+            if device_type is None or device.type == device_type
+        ]
+
+    def find_device_key(self, name: Union[str, int]) -> Optional[str]:
+        """Find device key from a key, name or Odoo printer id."""
+        snapshot = self.snapshot
+        name = str(name).strip()
+        if name in snapshot.devices:
+            return name
+        return snapshot.device_names.get(name.lower())
+
+    def find_group_key(self, name: Union[str, int]) -> Optional[str]:
+        """Find printer group key from a key, name or Odoo printer id."""
+        snapshot = self.snapshot
+        name = str(name).strip()
+        if name in snapshot.groups:
+            return name
+        return snapshot.group_names.get(name.lower())
+
+    def has_changed(self) -> bool:
+        """Test if config file was modified since last load attempt."""
+        if self.path is None:
+            return False
+        try:
+            return os.path.getmtime(self.path) != self._checked_mtime
+        except OSError:
+            return False
+
+    def _watch(self):
+        """Config file watcher loop."""
+        while not self._stop_event.wait(self.watch_interval):
+            if self.has_changed():
+                self.reload()
+
+    def start(self):
+        """Start config file watcher."""
+        if self.path is None or self._watcher is not None:
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            name="hw_proxy-device-registry",
+            daemon=True
+        )
+        self._watcher.start()
+
+    def stop(self):
+        """Stop config file watcher."""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def get_stats(self) -> dict:
+        """Get registry state."""
+        snapshot = self.snapshot
+        return {
+            "source": snapshot.source,
+            "loaded_at": snapshot.loaded_at,
+            "devices": list(snapshot.devices),
+            "printer_groups": list(snapshot.groups),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error
+        }
+
+
+device_registry = DeviceRegistry(
+    path=settings.DEVICES_CONFIG_FILE,
+    watch_interval=settings.DEVICES_CONFIG_WATCH_INTERVAL
+)
@@ -0,0 +1,161 @@
+"""
+Glyph atlas for hw_proxy module
+
+Text the printer code pages can not print is rasterized server side
+from a TrueType font, one cached 1-bit glyph per font, size and character,
+so a line is composed from glyphs with numpy instead of drawn with Pillow.
+Lines are stacked in raster bands sent as one image.
+"""
+import threading
+from collections import OrderedDict
+from math import ceil
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from hw_proxy.core.config import settings
+
+GlyphKey = Tuple[str, int, str]
+
+
+class Glyph:
+    """
+    1-bit glyph bitmap, True for each printed dot.
+    """
+    __slots__ = ("bits", "advance")
+
+    def __init__(self, bits: np.ndarray, advance: int):
+        self.bits = bits
+        self.advance = advance
+
+
+class GlyphAtlas:
+    """
+    Process-wide LRU cache of rasterized glyphs.
+
+    Glyph bitmaps are the font line height tall,
+    so glyphs of a line are simply placed side by side.
+    """
+    def __init__(self,
+                 font_path: Optional[str] = None,
+                 max_glyphs: int = 4096
+                 ):
+        # TrueType font, Pillow default font when not set
+        self.font_path = font_path
+        self.max_glyphs = max_glyphs
+        self.hits = 0
+        self.misses = 0
+        self._glyphs: "OrderedDict[GlyphKey, Glyph]" = OrderedDict()
+        self._fonts: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+        self._lock = threading.Lock()
+
+    def get_font_key(self, font_path: Optional[str] = None) -> str:
+        """Get font cache key, "default" for the Pillow default font."""
+        return font_path or self.font_path or "default"
+
+    def get_font(self, font_key: str, size: int) -> ImageFont.FreeTypeFont:
+        """Get a loaded font of size."""
+        font = self._fonts.get((font_key, size))
+        if font is None:
+            if font_key == "default":
+                font = ImageFont.load_default(size=size)
+            else:
+                font = ImageFont.truetype(font_key, size)
+            self._fonts[(font_key, size)] = font
+        return font
+
+    def get_glyph(self, char: str, size: int, font_key: str) -> Glyph:
+        """Get glyph of char, rasterized on first use."""
+        key = (font_key, size, char)
+        with self._lock:
+            glyph = self._glyphs.get(key)
+            if glyph is not None:
+                self._glyphs.move_to_end(key)
+                self.hits += 1
+                return glyph
+        glyph = self.rasterize(char, size, font_key)
+        with self._lock:
+            self.misses += 1
+            self._glyphs[key] = glyph
+            while len(self._glyphs) > self.max_glyphs:
+                self._glyphs.popitem(last=False)
+        return glyph
+
+    def rasterize(self, char: str, size: int, font_key: str) -> Glyph:
+        """Draw char on a font line height canvas."""
+        font = self.get_font(font_key, size)
+        ascent, descent = font.getmetrics()
+        advance = max(int(ceil(font.getlength(char))), 1)
+        img = Image.new("L", (advance, ascent + descent), 0)
+        ImageDraw.Draw(img).text((0, 0), char, font=font, fill=255)
+        return Glyph(np.asarray(img) >= 128, advance)
+
+    def render_line(
+        self,
+        text: str,
+        width: int,
+        height: int,
+        align: str = "left",
+        bold: bool = False,
+        underline: bool = False,
+        double_width: bool = False,
+        double_height: bool = False,
+        font_path: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Compose a text line of height rows and width dots from glyphs.
+
+        Font size is derived from height, text exceeding width is cut.
+        Double sizes scale the composed line, as printer fonts do,
+        so they reuse the same glyphs.
+        """
+        font_key = self.get_font_key(font_path)
+        size = max(height - 4, 1)
+        glyphs = [self.get_glyph(char, size, font_key) for char in text]
+        text_width = sum(glyph.advance for glyph in glyphs)
+        line = np.zeros((height, max(text_width, 1)), dtype=bool)
+        x = 0
+        for glyph in glyphs:
+            rows = min(glyph.bits.shape[0], height)
+            line[:rows, x:x + glyph.advance] |= glyph.bits[:rows]
+            x += glyph.advance
+        if bold:
+            line[:, 1:] |= line[:, :-1].copy()
+        if underline:
+            line[-1, :] = True
+        if double_width:
+            line = np.repeat(line, 2, axis=1)
+        if double_height:
+            line = np.repeat(line, 2, axis=0)
+        line = line[:, :width]
+        offset = 0
+        if align == "center":
+            offset = (width - line.shape[1]) // 2
+        elif align == "right":
+            offset = width - line.shape[1]
+        bits = np.zeros((line.shape[0], width), dtype=bool)
+        bits[:, offset:offset + line.shape[1]] = line
+        return bits
+
+    @staticmethod
+    def compose_band(lines: Iterable[np.ndarray]) -> Image.Image:
+        """Stack line bitmaps in a band image, black dots on white."""
+        bits = np.vstack(list(lines))
+        return Image.fromarray(~bits)
+
+    def clear(self):
+        """Drop all cached glyphs."""
+        with self._lock:
+            self._glyphs.clear()
+
+    def get_stats(self) -> dict:
+        """Get atlas usage stats."""
+        return {
+            "font": self.get_font_key(),
+            "glyphs": len(self._glyphs),
+            "max_glyphs": self.max_glyphs,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+glyph_atlas = GlyphAtlas(font_path=settings.TEXT_RECEIPT_FONT)
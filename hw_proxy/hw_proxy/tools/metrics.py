@@ -0,0 +1,327 @@
+"""
+Prometheus metrics for hw_proxy module
+
+Minimal in-process counters, gauges and histograms,
+rendered in Prometheus text exposition format by the /metrics route.
+Updates only take a lock and a dict lookup,
+so they can be recorded on the print path.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from hw_proxy.tools.tracing import Span, SpanHook, tracer
+
+LabelValues = Tuple[str, ...]
+
+# Seconds, from a fast status query to a long receipt on a slow printer
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+BYTES_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+
+def format_value(value: float) -> str:
+    """Format a sample value as Prometheus does."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    """Format label pairs, escaping values."""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\")\
+            .replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Metric family with optional labels.
+    """
+    type_name = "untyped"
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Iterable[str] = ()
+                 ):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def get_label_values(self, labels: Dict[str, object]) -> LabelValues:
+        """Get label values in label_names order."""
+        if len(labels) != len(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} labels must be: {self.label_names}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        """Get (suffix, labels, value) samples."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Get metric family in text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for suffix, labels, value in self.get_samples():
+            lines.append(f"{self.name}{suffix}{labels} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    Monotonic counter.
+    """
+    type_name = "counter"
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Iterable[str] = ()
+                 ):
+        Metric.__init__(self, name, description, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """Increment counter of labels by amount."""
+        key = self.get_label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            ("", format_labels(self.label_names, key), value)
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down.
+    """
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        """Set gauge value of labels."""
+        key = self.get_label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        """Remove all label values, e.g. before a collector refresh."""
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    """
+    Cumulative histogram of observed values.
+    """
+    type_name = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS
+                 ):
+        Metric.__init__(self, name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per labels: bucket counts (last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        """Record an observed value."""
+        key = self.get_label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            ]
+        samples = []
+        for key, counts, total in values:
+            cumulated = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulated += count
+                labels = format_labels(
+                    self.label_names + ("le",),
+                    key + (format_value(bound),)
+                )
+                samples.append(("_bucket", labels, cumulated))
+            labels = format_labels(self.label_names, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulated))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Registry of hw_proxy metrics.
+
+    Collectors are called before rendering,
+    to refresh gauges read from other components, as queue depths.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Register metric, returns the registered one of same name."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str,
+                label_names: Iterable[str] = ()) -> Counter:
+        """Get or register a counter."""
+        return self.register(Counter(name, description, label_names))
+
+    def gauge(self, name: str, description: str,
+              label_names: Iterable[str] = ()) -> Gauge:
+        """Get or register a gauge."""
+        return self.register(Gauge(name, description, label_names))
+
+    def histogram(self, name: str, description: str,
+                  label_names: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or register a histogram."""
+        return self.register(
+            Histogram(name, description, label_names, buckets=buckets)
+        )
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Add a function called before each render."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get(self, name: str) -> Optional[Metric]:
+        """Get a registered metric."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Get all metrics in Prometheus text exposition format."""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class MetricsSpanHook(SpanHook):
+    """
+    Feed printer connection and status spans to metrics.
+    """
+    def on_end(self, span: Span):
+        device = span.attributes.get("device")
+        if device is None:
+            return
+        if span.name in ("init", "open", "close"):
+            CONNECTION_SECONDS.observe(
+                span.duration,
+                device=device,
+                operation=span.name
+            )
+        elif span.name == "status":
+            STATUS_SECONDS.observe(span.duration, device=device)
+
+
+metrics = MetricsRegistry()
+
+JOBS = metrics.counter(
+    "hw_proxy_jobs_total",
+    "Print jobs run, by result status.",
+    ("device", "action", "status")
+)
+JOB_WAIT_SECONDS = metrics.histogram(
+    "hw_proxy_job_wait_seconds",
+    "Time print jobs spent queued before running.",
+    ("device",)
+)
+JOB_SECONDS = metrics.histogram(
+    "hw_proxy_job_duration_seconds",
+    "Time spent running print jobs.",
+    ("device", "action")
+)
+JOB_STAGE_SECONDS = metrics.histogram(
+    "hw_proxy_job_stage_seconds",
+    "Time spent in each print job stage: decode, encode, transmit.",
+    ("device", "stage")
+)
+JOB_BYTES = metrics.histogram(
+    "hw_proxy_job_bytes",
+    "ESC/POS bytes written per print job.",
+    ("device",),
+    buckets=BYTES_BUCKETS
+)
+BYTES_WRITTEN = metrics.counter(
+    "hw_proxy_bytes_written_total",
+    "ESC/POS bytes written to printers.",
+    ("device",)
+)
+STATUS_SECONDS = metrics.histogram(
+    "hw_proxy_status_query_seconds",
+    "Printer status queries round-trip time.",
+    ("device",)
+)
+CONNECTION_SECONDS = metrics.histogram(
+    "hw_proxy_printer_connection_seconds",
+    "Time spent in printer init, open and close.",
+    ("device", "operation")
+)
+PRINTER_ERRORS = metrics.counter(
+    "hw_proxy_printer_errors_total",
+    "Printer errors, connection kind errors drop the connection.",
+    ("device", "kind")
+)
+RECONNECTS = metrics.counter(
+    "hw_proxy_printer_reconnects_total",
+    "Printer connections reopened after a failed health check.",
+    ("device",)
+)
+CACHE_LOOKUPS = metrics.counter(
+    "hw_proxy_receipt_cache_lookups_total",
+    "Encoded receipts cache lookups, by hit or miss result.",
+    ("result",)
+)
+DUPLICATE_JOBS = metrics.counter(
+    "hw_proxy_duplicate_jobs_total",
+    "Retried print requests attached to a job instead of printed again.",
+    ("device",)
+)
+REJECTED_JOBS = metrics.counter(
+    "hw_proxy_rejected_jobs_total",
+    "Print requests rejected by queue admission limits, by limit.",
+    ("device", "reason")
+)
+QUEUE_DEPTH = metrics.gauge(
+    "hw_proxy_queue_depth",
+    "Print jobs queued per device.",
+    ("device",)
+)
+tracer.add_hook(MetricsSpanHook())
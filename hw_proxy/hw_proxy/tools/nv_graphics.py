@@ -0,0 +1,359 @@
+"""
+NV graphics for hw_proxy module
+
+Logos and recurring receipt header bands are stored once
+in the printer non-volatile memory, then printed with a short command
+instead of being sent as raster data on every ticket.
+
+Two command sets are supported, see image_conf nv_impl:
+    * `graphics`: `GS ( L` fn 67 define, fn 69 print, fn 66 delete,
+      graphics keyed by two printable characters
+    * `bitImage`: `FS q` define, `FS p` print, for older printers,
+      FS q replaces all images at once so every image is sent again
+
+Stored graphics are tracked per device in NV_GRAPHICS_FILE JSON file.
+NV memory supports a limited number of writes,
+so graphics are only written on upload, never on print.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from time import time
+from typing import Dict, List, Optional
+import numpy as np
+from PIL import Image
+from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import HwImageError
+from hw_proxy.tools.raster_encoder import (
+    GS,
+    image_to_bits,
+    int_low_high,
+    pack_raster
+)
+
+
+logger = logging.getLogger("hw_proxy")
+
+FS = b"\x1c"
+# GS ( L key codes are two printable characters
+NV_KEY_REGEX = re.compile(r"^[\x20-\x7e]{2}$")
+# Rate of differing dots still matching a header band
+HEADER_TOLERANCE = 0.002
+
+
+def graphics_nv_command(fn: int, data: bytes) -> bytes:
+    """Get `GS ( L` m=48 command, `GS 8 L` when data is too long."""
+    params = b"0" + bytes((fn,)) + data
+    if len(params) <= 0xFFFF:
+        return GS + b"(L" + int_low_high(len(params), 2) + params
+    return GS + b"8L" + int_low_high(len(params), 4) + params
+
+
+def define_graphics(key: str, bits: np.ndarray) -> bytes:
+    """Get `GS ( L` fn 67 command, storing raster graphics as key."""
+    height, width = bits.shape
+    data = (
+        b"0" + key.encode("ascii") + b"\x01"
+        + int_low_high(width, 2)
+        + int_low_high(height, 2)
+        + b"1" + pack_raster(bits)
+    )
+    return graphics_nv_command(67, data)
+
+
+def print_graphics(key: str, scale_x: int = 1, scale_y: int = 1) -> bytes:
+    """Get `GS ( L` fn 69 command, printing graphics stored as key."""
+    return graphics_nv_command(
+        69,
+        key.encode("ascii") + bytes((scale_x, scale_y))
+    )
+
+
+def delete_graphics(key: str) -> bytes:
+    """Get `GS ( L` fn 66 command, deleting graphics stored as key."""
+    return graphics_nv_command(66, key.encode("ascii"))
+
+
+def define_bit_images(images: List[np.ndarray]) -> bytes:
+    """
+    Get `FS q` command, replacing all NV bit images.
+
+    Images are padded to multiples of 8 dots,
+    and sent as columns of bytes, top dot first.
+    """
+    output = [FS + b"q" + bytes((len(images),))]
+    for bits in images:
+        height, width = bits.shape
+        padded = np.zeros(
+            (-(-height // 8) * 8, -(-width // 8) * 8),
+            dtype=bool
+        )
+        padded[:height, :width] = bits
+        rows, columns = padded.shape
+        data = np.packbits(padded.reshape(rows // 8, 8, columns), axis=1)
+        output.append(
+            int_low_high(columns // 8, 2)
+            + int_low_high(rows // 8, 2)
+            + data[:, 0, :].T.tobytes()
+        )
+    return b"".join(output)
+
+
+def print_bit_image(index: int, mode: int = 0) -> bytes:
+    """Get `FS p` command, printing NV bit image index (from 1)."""
+    return FS + b"p" + bytes((index, mode))
+
+
+class NvGraphic:
+    """
+    Graphic stored in a printer NV memory.
+    """
+    def __init__(self,
+                 device_key: str,
+                 key: str,
+                 bits: np.ndarray,
+                 header: bool = False,
+                 stored_at: Optional[float] = None
+                 ):
+        self.device_key = device_key
+        self.key = key
+        self.bits = bits
+        # Replace this band at the top of receipt images
+        self.header = header
+        # Last successful write to the printer
+        self.stored_at = stored_at
+        self.digest = hashlib.sha256(
+            np.packbits(bits).tobytes()
+            + int_low_high(bits.shape[1], 2)
+        ).hexdigest()
+
+    @property
+    def height(self) -> int:
+        return self.bits.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.bits.shape[1]
+
+    def to_dict(self, with_data: bool = False) -> dict:
+        """Get graphic as dict, with its dots for storage."""
+        result = {
+            "device_key": self.device_key,
+            "key": self.key,
+            "width": self.width,
+            "height": self.height,
+            "header": self.header,
+            "digest": self.digest,
+            "stored_at": self.stored_at
+        }
+        if with_data:
+            result["data"] = base64.b64encode(pack_raster(self.bits))\
+                .decode("ascii")
+        return result
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NvGraphic":
+        """Get graphic from a stored dict."""
+        packed = np.frombuffer(base64.b64decode(data["data"]), dtype=np.uint8)
+        bits = np.unpackbits(
+            packed.reshape(data["height"], -1),
+            axis=1
+        )[:, :data["width"]].astype(bool)
+        return cls(
+            data["device_key"],
+            data["key"],
+            bits,
+            header=data.get("header", False),
+            stored_at=data.get("stored_at")
+        )
+
+
+class NvGraphicsRegistry:
+    """
+    NV graphics stored in each device, by key.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.header_matches = 0
+        self._graphics: Dict[str, Dict[str, NvGraphic]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load tracked graphics from the registry file."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                entries = json.load(file)
+            graphics = {}
+            for entry in entries:
+                graphic = NvGraphic.from_dict(entry)
+                graphics.setdefault(graphic.device_key, {})[graphic.key] = graphic
+            with self._lock:
+                self._graphics = graphics
+        except Exception as e:
+            logger.error(
+                f"[NvGraphicsRegistry] Unable to load {self.path}, error: {e}"
+            )
+
+    def save(self):
+        """Write tracked graphics to the registry file."""
+        if self.path is None:
+            return
+        with self._lock:
+            entries = [
+                graphic.to_dict(with_data=True)
+                for graphics in self._graphics.values()
+                for graphic in graphics.values()
+            ]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entries, file)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def check_key(key: str):
+        """Raise ValueError if key is not two printable characters."""
+        if not NV_KEY_REGEX.match(key):
+            raise ValueError(
+                f"Invalid NV graphics key: {key!r}, "
+                "must be two printable ASCII characters."
+            )
+
+    def add(self,
+            device_key: str,
+            key: str,
+            img: Image.Image,
+            header: bool = False,
+            dither: bool = True
+            ) -> NvGraphic:
+        """Track a graphic, to be stored with a nv_store job."""
+        self.check_key(key)
+        try:
+            bits = image_to_bits(img, dither=dither)
+        except Exception as e:
+            raise HwImageError(f"Unable to convert NV graphic: {e}") from e
+        graphic = NvGraphic(device_key, key, bits, header=header)
+        with self._lock:
+            self._graphics.setdefault(device_key, {})[key] = graphic
+        self.save()
+        return graphic
+
+    def remove(self, device_key: str, key: str) -> Optional[NvGraphic]:
+        """Stop tracking a graphic."""
+        with self._lock:
+            graphic = self._graphics.get(device_key, {}).pop(key, None)
+        if graphic is not None:
+            self.save()
+        return graphic
+
+    def restore(self, graphic: NvGraphic):
+        """Track a graphic again, undoing add() or remove()."""
+        with self._lock:
+            self._graphics.setdefault(graphic.device_key, {})[graphic.key] = graphic
+        self.save()
+
+    def set_stored(self, device_key: str, key: str):
+        """Mark a graphic as written to the printer."""
+        graphic = self.get(device_key, key)
+        if graphic is not None:
+            graphic.stored_at = time()
+            self.save()
+
+    def get(self, device_key: str, key: str) -> Optional[NvGraphic]:
+        """Get a tracked graphic."""
+        return self._graphics.get(device_key, {}).get(key)
+
+    def get_graphics(self, device_key: Optional[str] = None) -> List[NvGraphic]:
+        """Get tracked graphics, in upload order."""
+        with self._lock:
+            return [
+                graphic
+                for key, graphics in self._graphics.items()
+                if device_key is None or key == device_key
+                for graphic in graphics.values()
+            ]
+
+    def get_index(self, device_key: str, key: str) -> int:
+        """Get FS p index (from 1) of a graphic."""
+        keys = [graphic.key for graphic in self.get_graphics(device_key)]
+        return keys.index(key) + 1
+
+    def get_version(self, device_key: str) -> str:
+        """Get a digest of stored header graphics, for cache keys."""
+        digest = hashlib.sha256()
+        for graphic in self.get_graphics(device_key):
+            if graphic.header and graphic.stored_at is not None:
+                digest.update(f"{graphic.key}:{graphic.digest};".encode())
+        return digest.hexdigest()[:16]
+
+    def get_define_command(self, device_key: str, key: str, impl: str) -> bytes:
+        """Get command writing a graphic, or all of them for bitImage."""
+        if impl == "bitImage":
+            return define_bit_images([
+                graphic.bits for graphic in self.get_graphics(device_key)
+            ])
+        graphic = self.get(device_key, key)
+        if graphic is None:
+            raise ValueError(f"Unknown NV graphic {key} for {device_key}")
+        return define_graphics(key, graphic.bits)
+
+    def get_print_command(self, graphic: NvGraphic, impl: str) -> bytes:
+        """Get command printing a stored graphic."""
+        if impl == "bitImage":
+            return print_bit_image(
+                self.get_index(graphic.device_key, graphic.key)
+            )
+        return print_graphics(graphic.key)
+
+    def match_header(
+        self,
+        device_key: str,
+        img: Image.Image,
+        dither: bool = True
+    ) -> Optional[NvGraphic]:
+        """
+        Find a stored header graphic matching the top band of an image.
+
+        Dithering only spreads errors right and down,
+        so the top rows dots do not depend on the rest of the image.
+        """
+        headers = sorted(
+            (
+                graphic for graphic in self.get_graphics(device_key)
+                if graphic.header and graphic.stored_at is not None
+                and graphic.width == img.width
+                and graphic.height <= img.height
+            ),
+            key=lambda graphic: graphic.height,
+            reverse=True
+        )
+        if not headers:
+            return None
+        top = image_to_bits(
+            img.crop((0, 0, img.width, headers[0].height)),
+            dither=dither
+        )
+        for graphic in headers:
+            band = top[:graphic.height]
+            diff = np.count_nonzero(band != graphic.bits)
+            if diff <= HEADER_TOLERANCE * graphic.bits.size:
+                self.header_matches += 1
+                return graphic
+        return None
+
+    def get_stats(self) -> dict:
+        """Get tracked graphics."""
+        return {
+            "path": self.path,
+            "graphics": [graphic.to_dict() for graphic in self.get_graphics()],
+            "header_matches": self.header_matches
+        }
+
+
+nv_graphics = NvGraphicsRegistry(path=settings.NV_GRAPHICS_FILE)
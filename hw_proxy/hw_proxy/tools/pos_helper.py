@@ -3,14 +3,23 @@ escpos helper for hw_proxy module
 """
 import logging
 import base64
-from typing import Literal, Optional, Union
+import itertools
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Union
 from escpos.printer import Usb, Network, Serial, Dummy
 from io import BytesIO
 from PIL import Image
 from hw_proxy.tools.device_helper import DeviceHelper
-from hw_proxy.core.exceptions import HwDeviceError, HwPrinterError
-from hw_proxy.core.schemas import DeviceConfigSchemas, NetworkDeviceSchemas, PrinteImageConfSchemas, SerialDeviceSchemas, UsbDeviceSchemas
-from hw_proxy.core.supported_devices import DevicePortType, DeviceType, device_list
+from hw_proxy.tools.nv_graphics import define_bit_images, delete_graphics, nv_graphics
+from hw_proxy.tools.raster_encoder import RasterEncoder
+from hw_proxy.tools.text_receipt import TextReceiptRenderer, get_profile_columns, get_profile_dpi
+from hw_proxy.tools.tracing import Span, tracer
+from hw_proxy.core.exceptions import HwDeviceError, HwImageError, HwPrinterError
+from hw_proxy.core.schemas import DeviceConfigSchemas, ItemTicketsSchemas, NetworkDeviceSchemas, PrinteImageConfSchemas, SerialDeviceSchemas, TextReceiptSchemas, UsbDeviceSchemas
+from hw_proxy.core.supported_devices import DevicePortType, DeviceType
 
 
 logger = logging.getLogger("hw_proxy")
@@ -20,18 +29,149 @@ CMD_CUT = b"\x1D\x56\x01"        # Corte completo
 CMD_CASHDRAWER = b"\x1B\x70\x00\x19\xFA"  # Apertura de cajón
 
 
+def iter_prefetch(chunks: Iterable[bytes], size: int = 2) -> Iterator[bytes]:
+    """
+    Iterate over chunks produced in a background thread.
+
+    Up to size chunks are produced ahead of the consumer,
+    so producing the next chunk overlaps with consuming the current one.
+    Producer errors are raised in the consumer.
+    """
+    items: queue.Queue = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for chunk in chunks:
+                if not _put((True, chunk)):
+                    return
+            _put((False, None))
+        except Exception as e:
+            _put((False, e))
+
+    producer = threading.Thread(
+        target=_produce,
+        name="hw_proxy-prefetch",
+        daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            has_chunk, item = items.get()
+            if not has_chunk:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def get_raw_data(data: Union[str, bytes]) -> bytes:
+    """
+    Get raw ESC/POS bytes of a print_raw receipt,
+    base64 strings from JSON requests are decoded.
+    """
+    if isinstance(data, str):
+        return base64.b64decode(data)
+    return data
+
+
+# Actions runnable in one printer session, see EscPosHelper.run_batch
+BATCH_ACTIONS = (
+    "print_receipt", "print_raw", "print_text", "print_markup",
+    "print_tickets", "cut_receipt", "cashbox", "cashdrawer"
+)
+
+
+class StatusSerial(Serial):
+    """
+    escpos Serial printer returning status answers as soon as received.
+
+    escpos reads 16 bytes, so a one byte DLE EOT answer
+    always waited for the whole serial timeout.
+    """
+    def _read(self) -> bytes:
+        """Read first byte, then any other byte already received."""
+        assert self.device
+        data = self.device.read(1)
+        if data and self.device.in_waiting:
+            data += self.device.read(self.device.in_waiting)
+        return data
+
+
 class EscPosHelper(DeviceHelper):
     """
     escpos helper for hw_proxy module
     """
-    def __init__(self, device_key: str):
+    def __init__(self,
+                 device_key: str,
+                 keep_open: bool = False,
+                 receipt_cache=None
+                 ):
         DeviceHelper.__init__(self, device_key)
-        self.device = self.select_device(device_key)
         self.printer = None
+        # When True the printer connection is owned by the
+        # PrinterConnectionManager and survives close_printer() calls.
+        self.keep_open = keep_open
+        # Optional ReceiptCache of encoded receipts
+        self.receipt_cache = receipt_cache
+        # Bytes stats of the last printed receipt
+        self.print_stats = {}
+        # Seconds spent per stage since last reset: decode, encode...
+        self.timings: Dict[str, float] = {}
+        # Print data bytes sent since last reset, see write_stream()
+        self.bytes_written = 0
+        # Results of last run_batch() actions, see set_batch_results()
+        self.batch_results: List[dict] = []
+        # Stream offsets of last batch actions, end is None until
+        # rendered, and of chunk ends
+        self._batch_ranges: List[Tuple[int, Optional[int]]] = []
+        self._batch_chunks: List[int] = []
+        # Called with the printer write function after each chunk
+        # of a stream, to send urgent commands between bands
+        self.on_chunk: Optional[Callable[[Callable[[bytes], None]], None]] = None
+
+    def get_device_key(self) -> str:
+        """Get configured device key, for logs and metrics labels."""
+        if self.has_printer_conf():
+            return self.device.key
+        return str(self.device_key)
+
+    def add_timing(self, stage: str, seconds: float):
+        """Add seconds spent in a stage to timings."""
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def trace(self, stage: str, **attributes) -> Iterator[Span]:
+        """Run enclosed block in a tracer span, adding it to timings."""
+        span = None
+        try:
+            with tracer.span(
+                stage,
+                device=self.get_device_key(),
+                **attributes
+            ) as span:
+                yield span
+        finally:
+            if span is not None:
+                self.add_timing(stage, span.duration)
 
     def init_printer(self, printer_key: Optional[str] = None):
         """Get escpos printer object from printer configuration."""
-        self.select_device(printer_key)
+        if self.keep_open and self.has_printer():
+            return self.printer
+        self.set_device_conf(printer_key)
 
         if self.has_printer_conf() is False:
             raise HwDeviceError(
@@ -46,71 +186,123 @@ class EscPosHelper(DeviceHelper):
                 "Please choose a printer device."
             )
 
-        try:
-            ptype = self.device.port_type
-            if ptype == DevicePortType.USB:
-                self.printer = Usb(
-                    self.device.vendor,
-                    self.device.product,
-                    in_ep=self.device.conf.in_ep,
-                    out_ep=self.device.conf.out_ep
-                )
-            elif ptype == DevicePortType.NETWORK:
-                self.printer = Network(
-                    host=self.device.conf.host,
-                    port=self.device.conf.port
-                )
-            elif ptype == DevicePortType.SERIAL:
-                self.printer = Serial(
-                    devfile=self.device.conf.devfile,
-                    baudrate=self.device.conf.baudrate,
-                    bytesize=self.device.conf.bytesize,
-                    parity=self.device.conf.parity,
-                    stopbits=self.device.conf.stopbits,
-                    timeout=self.device.conf.timeout,
-                    dsrdtr=self.device.conf.dsrdtr,
-                    profile=self.device.conf.profile
-                )
-            else:
+        with self.trace("init"):
+            try:
+                ptype = self.device.port_type
+                if ptype == DevicePortType.USB:
+                    self.printer = Usb(
+                        self.device.vendor,
+                        self.device.product,
+                        in_ep=self.device.conf.in_ep,
+                        out_ep=self.device.conf.out_ep
+                    )
+                elif ptype == DevicePortType.NETWORK:
+                    self.printer = Network(
+                        host=self.device.conf.host,
+                        port=self.device.conf.port
+                    )
+                elif ptype == DevicePortType.SERIAL:
+                    self.printer = StatusSerial(
+                        devfile=self.device.conf.devfile,
+                        baudrate=self.device.conf.baudrate,
+                        bytesize=self.device.conf.bytesize,
+                        parity=self.device.conf.parity,
+                        stopbits=self.device.conf.stopbits,
+                        timeout=self.device.conf.timeout,
+                        dsrdtr=self.device.conf.dsrdtr,
+                        profile=self.device.conf.profile
+                    )
+                else:
+                    raise HwPrinterError(
+                        f"Unsupported printer port type: {ptype.value}"
+                    )
+            except Exception as e:
                 raise HwPrinterError(
-                    f"Unsupported printer port type: {ptype.value}"
-                )
-        except Exception as e:
-            raise HwPrinterError(
-                f"Fatal Error: Printer connection error: {e}"
-            ) from e
+                    f"Fatal Error: Printer connection error: {e}"
+                ) from e
+        return self.printer
+
+    def open_printer(self):
+        """Initialize escpos printer and open its device connection."""
+        self.init_printer()
+        with self.trace("open"):
+            try:
+                # escpos opens the connection lazily on first device access
+                if not isinstance(self.printer, Dummy)\
+                        and self.printer.device is None:
+                    raise HwPrinterError(
+                        "Fatal Error: Printer device not available."
+                    )
+            except HwPrinterError:
+                raise
+            except Exception as e:
+                raise HwPrinterError(
+                    f"Fatal Error: Printer connection error: {e}"
+                ) from e
         return self.printer
 
     def has_printer(self):
         """Test if escpos printer is initialized."""
         return isinstance(self.printer, (Usb, Network, Serial, Dummy))
+
+    def is_connection_alive(self) -> bool:
+        """Test if escpos printer device connection is still usable."""
+        if isinstance(self.printer, Dummy):
+            return True
+        if not self.has_printer():
+            return False
+        device = getattr(self.printer, "_device", False)
+        if not device:
+            return False
+        if isinstance(self.printer, Serial):
+            return device.is_open is True\
+                and os.path.exists(self.printer.devfile)
+        if isinstance(self.printer, Network):
+            return device.fileno() != -1
+        return True
     
     def is_printer_ready(self, initialized: bool = False):
         """Test if escpos printer is initialized."""
         return self.has_printer()\
             and self.get_bool_full_printer_status(initialized=initialized)
 
-    def close_printer(self):
-        """Close escpos printer."""
+    def close_printer(self, force: bool = False):
+        """
+        Close escpos printer.
+
+        Managed connections (keep_open) are only closed when force is True.
+        """
         result = False
-        if isinstance(self.printer, Dummy):
+        if self.keep_open and force is not True:
+            result = True
+        elif isinstance(self.printer, Dummy):
             logger.debug(
                 "[close_printer] Printer is a Dummy instance, "
                 "no close action needed."
             )
             result = True
         elif self.has_printer():
-            try:
-                self.printer.close()
-                self.printer = None
-                result = True
-            except Exception as e:
-                logger.error(f"[close_printer] Error closing printer: {e}")
-                raise HwPrinterError(
-                    f"Fatal Error: Unable to close printer, error: {e}"
-                ) from e
+            with self.trace("close"):
+                try:
+                    self.printer.close()
+                    self.printer = None
+                    result = True
+                except Exception as e:
+                    logger.error(f"[close_printer] Error closing printer: {e}")
+                    raise HwPrinterError(
+                        f"Fatal Error: Unable to close printer, error: {e}"
+                    ) from e
         return result       
 
+    def reset_connection(self):
+        """Drop a managed printer connection after a device error."""
+        if self.keep_open and self.has_printer():
+            try:
+                self.close_printer(force=True)
+            except HwPrinterError as e:
+                logger.debug(f"[reset_connection] {e}")
+            self.printer = None
+
     def get_printer_status(self, initialized: bool = False):
         """Get escpos printer status."""
         result = None
@@ -118,7 +310,11 @@ class EscPosHelper(DeviceHelper):
             if initialized is not True:
                 self.init_printer()
             if self.has_printer():
-                is_online = self.printer.is_online()
+                with self.trace("status"):
+                    is_online = self.printer.is_online()
+                result = {
+                    "is_online": is_online
+                }
             else:
                 result = {
                     "is_online": False
@@ -128,13 +324,14 @@ class EscPosHelper(DeviceHelper):
                 "[get_printer_status] Fatal Error: Unable to get printer status, "
                 f"error: {e} "
             )
+            self.reset_connection()
             result = {
                 "is_online": False,
                 "error": str(e)
             }
         finally:
             logger.debug(
-                f"[get_printer_status] Printer status: {is_online}, "
+                f"[get_printer_status] Printer status: {result}"
             )
             if initialized is not True:
                 self.close_printer()
@@ -147,7 +344,8 @@ class EscPosHelper(DeviceHelper):
             if initialized is not True:
                 self.init_printer()
             if self.has_printer():
-                paper_status_code = self.printer.paper_status()
+                with self.trace("status"):
+                    paper_status_code = self.printer.paper_status()
                 paper_status_map = {
                     2: "ok",
                     1: "near_end",
@@ -166,13 +364,14 @@ class EscPosHelper(DeviceHelper):
                 "[get_paper_printer_status] Fatal Error: Unable to get printer status, "
                 f"error: {e} "
             )
+            self.reset_connection()
             result = {
                 "paper_status": "unknown",
                 "error": str(e)
             }
         finally:
             logger.debug(
-                f"[get_paper_printer_status] Printer paper status: {paper_status}, "
+                f"[get_paper_printer_status] Printer paper status: {result}"
             )
             if initialized is not True:
                 self.close_printer()
@@ -185,8 +384,9 @@ class EscPosHelper(DeviceHelper):
             if initialized is not True:
                 self.init_printer()
             if self.has_printer():
-                is_online = self.printer.is_online()
-                paper_status_code = self.printer.paper_status()
+                with self.trace("status"):
+                    is_online = self.printer.is_online()
+                    paper_status_code = self.printer.paper_status()
                 paper_status_map = {
                     2: "ok",
                     1: "near_end",
@@ -207,6 +407,7 @@ class EscPosHelper(DeviceHelper):
                 "[get_full_printer_status] Fatal Error: Unable to get printer status, "
                 f"error: {e} "
             )
+            self.reset_connection()
             result = {
                 "is_online": False,
                 "paper_status": "unknown",
@@ -214,8 +415,7 @@ class EscPosHelper(DeviceHelper):
             }
         finally:
             logger.debug(
-                f"[get_full_printer_status] Printer status: {is_online}, "
-                f"Paper status: {paper_status} "
+                f"[get_full_printer_status] Printer status: {result}"
             )
             if initialized is not True:
                 self.close_printer()
@@ -268,105 +468,434 @@ class EscPosHelper(DeviceHelper):
             result = "connected"
         return result
 
-    def print_receipt(self, receipt: str):
-        """Print receipt using escpos printer."""
+    def print_receipt(
+        self,
+        receipt: Union[str, bytes],
+        cut: bool = True,
+        cashdrawer: bool = False
+    ):
+        """
+        Print receipt using escpos printer.
+
+        receipt is a base64 image string, or raw image file bytes.
+        """
+        def _print():
+            self.write_stream(self.iter_receipt_data(receipt))
+            self.write_stream(
+                [self.get_end_data(cut=cut, cashdrawer=cashdrawer)],
+                prefetch=0
+            )
+            logger.debug("[print_receipt] Ticket Impress with success...")
+        return self.run_printer_action(
+            "print_receipt",
+            "print receipt",
+            _print
+        )
+
+    def print_raw(
+        self,
+        data: Union[str, bytes],
+        cut: bool = False,
+        cashdrawer: bool = False,
+        chunk_size: int = 4096
+    ):
+        """
+        Print raw ESC/POS data using escpos printer.
+
+        Raw bytes are sent without copies, base64 strings are decoded.
+        """
+        def _print():
+            view = memoryview(get_raw_data(data))
+            self.write_stream(
+                (
+                    view[i:i + chunk_size]
+                    for i in range(0, len(view), chunk_size)
+                ),
+                prefetch=0,
+                # Raw data slices may split a command
+                interruptible=False
+            )
+            self.write_stream(
+                [self.get_end_data(cut=cut, cashdrawer=cashdrawer)],
+                prefetch=0
+            )
+            self.print_stats = {"bytes": len(view)}
+            logger.debug("[print_raw] Raw data printed with success...")
+        return self.run_printer_action(
+            "print_raw",
+            "print raw data",
+            _print
+        )
+
+    def run_printer_action(
+        self,
+        name: str,
+        task: str,
+        action: Callable[[], None],
+        check_status: bool = True
+    ) -> bool:
+        """
+        Run action once the printer is ready, then close the printer.
+
+        Without check_status, action only needs an initialized printer.
+        Returns False if the printer is not ready, errors are logged
+        and raised as HwPrinterError, prefixed with name.
+        """
         result = False
         try:
             self.init_printer()
-            if self.is_printer_ready(initialized=True):
-                logger.debug("[print_receipt] Convert receipt to Image...")
-                img = self.format_base64_to_image(receipt)
-                d = Dummy()
-                d.image(img, impl="bitImageColumn")
-                d.cut(feed=True)
-                self.printer._raw(d.output)
+            ready = self.is_printer_ready(initialized=True)\
+                if check_status else self.has_printer()
+            if ready:
+                action()
                 result = True
-                logger.debug("[print_receipt] Ticket Impress with success...")
             else:
                 logger.error(
-                    "[print_receipt] Printer not initialized or not available."
+                    f"[{name}] Printer not initialized or not available."
                 )
         except Exception as e:
             logger.error(
-                "[print_receipt] Fatal Error: Unable to print receipt, "
+                f"[{name}] Fatal Error: Unable to {task}, "
                 f"error: {e} "
             )
             self.close_printer()
             raise HwPrinterError(
-                "[print_receipt] Fatal Error: Unable to print receipt, "
+                f"[{name}] Fatal Error: Unable to {task}, "
                 f"error: {e} "
             ) from e
         finally:
             self.close_printer()
         return result
 
-    def cut_receipt(self):
-        """Cut receipt using escpos printer."""
-        result = False
+    def print_rendered(
+        self,
+        name: str,
+        task: str,
+        render: Callable[[], Tuple[TextReceiptRenderer, Iterator[bytes]]],
+        cut: bool = True,
+        cashdrawer: bool = False
+    ) -> bool:
+        """
+        Print text renderer output, then cut and cash drawer bytes.
+
+        render gets the renderer and its output once the printer is ready.
+        """
+        def _print():
+            renderer, chunks = render()
+            size = self.write_stream(chunks, prefetch=0)
+            self.write_stream(
+                [self.get_end_data(cut=cut, cashdrawer=cashdrawer)],
+                prefetch=0
+            )
+            self.print_stats = {"bytes": size, **renderer.stats}
+            logger.debug(f"[{name}] Printed: {self.print_stats}")
+        return self.run_printer_action(name, task, _print)
+
+    def print_text(
+        self,
+        receipt: Union[TextReceiptSchemas, dict],
+        cut: bool = True,
+        cashdrawer: bool = False
+    ):
+        """
+        Print a structured text receipt with printer fonts.
+
+        Lines the printer code pages can not encode are printed as images.
+        """
+        def _render():
+            text_receipt = TextReceiptSchemas(**receipt)\
+                if isinstance(receipt, dict) else receipt
+            renderer = self.get_text_renderer(columns=text_receipt.columns)
+            return renderer, renderer.iter_render(text_receipt)
+        return self.print_rendered(
+            "print_text",
+            "print text receipt",
+            _render,
+            cut=cut,
+            cashdrawer=cashdrawer
+        )
+
+    def print_markup(
+        self,
+        markup: str,
+        cut: bool = True,
+        cashdrawer: bool = False
+    ):
+        """
+        Print receipt markup with printer fonts, see parse_markup().
+
+        Lines the printer code pages can not encode are printed as images.
+        """
+        def _render():
+            renderer = self.get_text_renderer()
+            return renderer, renderer.iter_render_markup(markup)
+        return self.print_rendered(
+            "print_markup",
+            "print receipt markup",
+            _render,
+            cut=cut,
+            cashdrawer=cashdrawer
+        )
+
+    def print_tickets(
+        self,
+        receipt: Union[ItemTicketsSchemas, dict],
+        cut: bool = True,
+        cashdrawer: bool = False
+    ):
+        """
+        Print one ticket per item, or per unit, in one printer session.
+
+        Shared header and footer are encoded once for all tickets.
+        """
+        def _render():
+            tickets = ItemTicketsSchemas(**receipt)\
+                if isinstance(receipt, dict) else receipt
+            renderer = self.get_text_renderer(columns=tickets.columns)
+            return renderer, renderer.iter_render_tickets(tickets)
+        return self.print_rendered(
+            "print_tickets",
+            "print item tickets",
+            _render,
+            cut=cut,
+            cashdrawer=cashdrawer
+        )
+
+    def get_text_columns(self) -> int:
+        """Get device characters per line, from its escpos profile."""
+        profile = None
+        if self.has_printer_conf():
+            profile = getattr(self.device.conf, "profile", None)
+        return get_profile_columns(profile)
+
+    def get_printer_dpi(self) -> Optional[int]:
+        """Get device resolution, from image configuration or escpos profile."""
+        conf = self.get_image_conf()
+        if conf.dpi is not None:
+            return conf.dpi
+        profile = None
+        if self.has_printer_conf():
+            profile = getattr(self.device.conf, "profile", None)
+        return get_profile_dpi(profile)
+
+    def get_text_renderer(
+        self,
+        columns: Optional[int] = None
+    ) -> TextReceiptRenderer:
+        """Get text receipt renderer with device profile and image encoder."""
+        profile = None
+        if self.has_printer_conf():
+            profile = getattr(self.device.conf, "profile", None)
+        return TextReceiptRenderer(
+            profile=profile,
+            columns=columns,
+            encode_image=self.iter_encode_image
+        )
+
+    def run_batch(self, actions: List[dict]):
+        """
+        Run actions in one printer session, with a single status check.
+
+        actions are dicts of action, receipt, cut and cashdrawer,
+        see BATCH_ACTIONS. Cut and cash drawer bytes are written
+        in the same buffer as the receipt before them.
+        An action failing to render does not stop the following ones,
+        each action result is set in batch_results.
+        """
+        self.batch_results = [
+            {"done": False, "bytes": 0, "error": None} for _ in actions
+        ]
+        self._batch_ranges = []
+        self._batch_chunks = []
+        start = self.bytes_written
+        complete = False
+        def _print():
+            nonlocal complete
+            size = self.write_stream(self.iter_batch_data(actions))
+            complete = True
+            self.print_stats = {"bytes": size, "actions": len(actions)}
+            logger.debug(f"[run_batch] Batch printed: {self.print_stats}")
         try:
-            self.init_printer()
-            if self.is_printer_ready(initialized=True):
-                logger.debug("[cut_receipt] Cut Receipt...")
-                self.printer.cut(feed=True)
-                result = True
-            else:
-                logger.error(
-                    "[cut_receipt] Printer not initialized or not available."
-                )
-        except Exception as e:
-            logger.error(
-                "[cut_receipt] Fatal Error: Unable to cut receipt, "
-                f"error: {e} "
+            result = self.run_printer_action(
+                "run_batch",
+                "run printer actions",
+                _print
             )
-            self.close_printer()
-            raise HwPrinterError(
-                "[cut_receipt] Fatal Error: Unable to cut receipt, "
-                f"error: {e} "
-            ) from e
         finally:
-            self.close_printer()
-        return result
+            self.set_batch_results(self.bytes_written - start, complete)
+        return result and all(
+            item["error"] is None for item in self.batch_results
+        )
 
-    def open_cashdrawer(self):
-        """Open cash drawer using escpos printer."""
-        result = False
-        try:
-            self.init_printer()
-            if self.has_printer():
-                logger.debug("[open_cashdrawer] Open Cash Drawer...")
-                # Assuming CMD_CASHDRAWER is defined in escpos library
-                self.printer._raw(CMD_CASHDRAWER)
-                result = True
+    def set_batch_results(self, sent: int, complete: bool):
+        """
+        Set done and bytes of batch_results from stream offsets.
+
+        sent bytes were handed to the printer, the last chunk of them
+        may be partially written unless the stream is complete.
+        An action is done once all its bytes were written.
+        """
+        written = sent
+        if not complete:
+            written = max(
+                (end for end in self._batch_chunks if end < sent),
+                default=0
+            )
+        for item, (first, last) in zip(self.batch_results, self._batch_ranges):
+            end = sent if last is None else min(last, sent)
+            item["bytes"] = max(0, end - first)
+            item["done"] = item["error"] is None\
+                and last is not None and last <= written
+
+    def iter_batch_data(self, actions: List[dict]) -> Iterator[bytes]:
+        """
+        Get ESC/POS bytes of batch actions.
+
+        The last chunk of each receipt is held back,
+        to append following cut and cash drawer bytes to it.
+        A cut right after another one is skipped.
+        Stream offsets of actions and chunks are recorded,
+        for set_batch_results().
+        """
+        pending = b""
+        sent = 0
+        is_cut = False
+        for index, item in enumerate(actions):
+            first = sent + len(pending)
+            self._batch_ranges.append((first, None))
+            action = item.get("action")
+            cut = item.get("cut", True)
+            cashdrawer = item.get("cashdrawer", False)
+            if action == "cut_receipt":
+                cut, cashdrawer = True, False
+            elif action in ("cashbox", "cashdrawer"):
+                cut, cashdrawer = False, True
+            elif action in BATCH_ACTIONS:
+                try:
+                    for chunk in self.iter_action_data(
+                            action, item.get("receipt")):
+                        if pending:
+                            yield pending
+                            sent += len(pending)
+                            self._batch_chunks.append(sent)
+                        pending = chunk
+                        is_cut = False
+                except Exception as e:
+                    logger.error(
+                        f"[iter_batch_data] Unable to render batch action "
+                        f"{index} ({action}), error: {e}"
+                    )
+                    self.batch_results[index]["error"] = e
+                    # Only cut what was already rendered
+                    cut = cut and sent + len(pending) > first
+                    cashdrawer = False
             else:
-                logger.error(
-                    "[open_cashdrawer] Printer not initialized or not available."
+                self.batch_results[index]["error"] = HwPrinterError(
+                    f"Unsupported batch action: {action}"
                 )
-        except Exception as e:
-            logger.error(
-                "[open_cashdrawer] Fatal Error: Unable to open cash drawer, "
-                f"error: {e} "
+                cut, cashdrawer = False, False
+            end = self.get_end_data(
+                cut=cut and not is_cut,
+                cashdrawer=cashdrawer
             )
-            self.close_printer()
-            raise HwPrinterError(
-                "[open_cashdrawer] Fatal Error: Unable to open cash drawer, "
-                f"error: {e} "
-            ) from e
-        finally:
-            self.close_printer()
-        return result
+            if end:
+                pending = bytes(pending) + end
+            is_cut = is_cut or cut
+            self._batch_ranges[index] = (first, sent + len(pending))
+        if pending:
+            yield pending
+            self._batch_chunks.append(sent + len(pending))
+
+    def iter_action_data(
+        self,
+        action: str,
+        receipt: Optional[Union[str, bytes, dict, TextReceiptSchemas]]
+    ) -> Iterator[bytes]:
+        """Get ESC/POS bytes of a print action, without ending bytes."""
+        if action == "print_receipt":
+            yield from self.iter_receipt_data(receipt)
+        elif action == "print_raw":
+            yield get_raw_data(receipt)
+        elif action == "print_text":
+            if isinstance(receipt, dict):
+                receipt = TextReceiptSchemas(**receipt)
+            renderer = self.get_text_renderer(columns=receipt.columns)
+            yield from renderer.iter_render(receipt)
+        elif action == "print_markup":
+            yield from self.get_text_renderer().iter_render_markup(receipt)
+        elif action == "print_tickets":
+            if isinstance(receipt, dict):
+                receipt = ItemTicketsSchemas(**receipt)
+            renderer = self.get_text_renderer(columns=receipt.columns)
+            yield from renderer.iter_render_tickets(receipt)
+
+    def cut_receipt(self):
+        """Cut receipt using escpos printer."""
+        def _cut():
+            logger.debug("[cut_receipt] Cut Receipt...")
+            self.printer.cut(feed=True)
+        return self.run_printer_action("cut_receipt", "cut receipt", _cut)
+
+    def open_cashdrawer(self):
+        """Open cash drawer using escpos printer."""
+        def _open():
+            logger.debug("[open_cashdrawer] Open Cash Drawer...")
+            # Assuming CMD_CASHDRAWER is defined in escpos library
+            self.printer._raw(CMD_CASHDRAWER)
+        # The drawer opens without paper
+        return self.run_printer_action(
+            "open_cashdrawer",
+            "open cash drawer",
+            _open,
+            check_status=False
+        )
 
     def default_printer_action(
         self,
         action: str,
-        receipt: Optional[str] = None
+        receipt: Optional[Union[str, bytes, TextReceiptSchemas]] = None,
+        cut: bool = True,
+        cashdrawer: bool = False
     ):
         """Run default printer action."""
         result = False
         try:
             if action == "print_receipt":
                 result = self.print_receipt(
-                    receipt=receipt
+                    receipt=receipt,
+                    cut=cut,
+                    cashdrawer=cashdrawer
+                )
+            elif action == "print_raw":
+                result = self.print_raw(
+                    data=receipt,
+                    cut=cut,
+                    cashdrawer=cashdrawer
                 )
+            elif action == "print_text":
+                result = self.print_text(
+                    receipt=receipt,
+                    cut=cut,
+                    cashdrawer=cashdrawer
+                )
+            elif action == "print_markup":
+                result = self.print_markup(
+                    markup=receipt,
+                    cut=cut,
+                    cashdrawer=cashdrawer
+                )
+            elif action == "print_tickets":
+                result = self.print_tickets(
+                    receipt=receipt,
+                    cut=cut,
+                    cashdrawer=cashdrawer
+                )
+            elif action == "batch":
+                result = self.run_batch(actions=receipt)
+            elif action == "nv_store":
+                result = self.store_nv_graphic(key=receipt)
+            elif action == "nv_delete":
+                result = self.delete_nv_graphic(key=receipt)
             elif action == "cut_receipt":
                 result = self.cut_receipt()
             elif action in ("cashbox", "cashdrawer"):
@@ -391,6 +920,239 @@ class EscPosHelper(DeviceHelper):
         return result
 
 
+    def iter_receipt_data(
+        self,
+        receipt: Union[str, bytes]
+    ) -> Iterator[bytes]:
+        """
+        Get ESC/POS bytes of a receipt image, band by band.
+
+        receipt is a base64 image string, or raw image file bytes.
+        Encoded receipts are reused from receipt_cache if any,
+        and stored in it if they fit.
+        """
+        key = None
+        cached = None
+        conf = self.get_image_conf()
+        if self.receipt_cache is not None and self.receipt_cache.is_enabled():
+            key = self.receipt_cache.make_key(receipt, conf)
+            if conf.nv_headers:
+                # Cached bytes print the NV headers stored at that time
+                key = f"{key}:{nv_graphics.get_version(self.get_device_key())}"
+            data = self.receipt_cache.get(key)
+            if data is not None:
+                logger.debug("[iter_receipt_data] Receipt found in cache.")
+                self.print_stats = {"bytes": len(data), "cache_hit": True}
+                # Same chunks as when encoded, see write_stream()
+                view = memoryview(data)
+                start = 0
+                for end in self.receipt_cache.get_bounds(key):
+                    yield view[start:end]
+                    start = end
+                return
+            cached = []
+        logger.debug("[iter_receipt_data] Convert receipt to Image...")
+        with self.trace("decode"):
+            if isinstance(receipt, str):
+                img = self.format_base64_to_image(receipt, mode=None)
+            else:
+                img = self.format_bytes_to_image(receipt, mode=None)
+        size = 0
+        header = b""
+        if conf.nv_headers:
+            with self.trace("detect"):
+                header, img = self.split_nv_header(img)
+        chunks = self.iter_encode_image(img)
+        if header:
+            chunks = itertools.chain([header], chunks)
+        while True:
+            # One span per band, encoded while the previous one is sent
+            with self.trace("encode"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            size += len(chunk)
+            if cached is not None:
+                # Never hold more than the cache could keep
+                if size > self.receipt_cache.max_bytes:
+                    cached = None
+                else:
+                    cached.append(chunk)
+            yield chunk
+        if cached is not None:
+            self.receipt_cache.put(
+                key,
+                b"".join(cached),
+                bounds=tuple(itertools.accumulate(len(chunk) for chunk in cached))
+            )
+        self.print_stats["bytes"] = size
+        self.print_stats["cache_hit"] = False
+        if conf.nv_headers:
+            self.print_stats["nv_header"] = bool(header)
+        logger.debug(f"[iter_receipt_data] Receipt stats: {self.print_stats}")
+
+    def split_nv_header(self, img: Image.Image) -> Tuple[bytes, Image.Image]:
+        """
+        Split a stored NV header band from the top of a receipt image.
+
+        Returns the NV graphics print command and the rest of the image,
+        or no command and the image when no stored header matches.
+        """
+        conf = self.get_image_conf()
+        graphic = nv_graphics.match_header(
+            self.get_device_key(),
+            img,
+            dither=conf.dither
+        )
+        if graphic is None:
+            return b"", img
+        logger.debug(
+            f"[split_nv_header] Receipt header printed from NV graphic "
+            f"{graphic.key}"
+        )
+        return (
+            nv_graphics.get_print_command(graphic, conf.nv_impl),
+            img.crop((0, graphic.height, img.width, img.height))
+        )
+
+    def store_nv_graphic(self, key: str):
+        """Write a tracked graphic to printer NV memory."""
+        def _store():
+            impl = self.get_image_conf().nv_impl
+            device_key = self.get_device_key()
+            data = nv_graphics.get_define_command(device_key, key, impl)
+            size = self.write_stream([data], prefetch=0)
+            if impl == "bitImage":
+                # FS q stored every tracked graphic again
+                for graphic in nv_graphics.get_graphics(device_key):
+                    nv_graphics.set_stored(device_key, graphic.key)
+            else:
+                nv_graphics.set_stored(device_key, key)
+            self.print_stats = {"bytes": size}
+            logger.debug(f"[store_nv_graphic] NV graphic {key} stored.")
+        return self.run_printer_action(
+            "store_nv_graphic",
+            "store NV graphic",
+            _store
+        )
+
+    def delete_nv_graphic(self, key: str):
+        """
+        Delete an untracked graphic from printer NV memory.
+
+        FS q can not delete a single image, remaining ones are stored again.
+        """
+        def _delete():
+            impl = self.get_image_conf().nv_impl
+            device_key = self.get_device_key()
+            if impl == "bitImage":
+                # FS q 0 clears NV memory once no graphic remains
+                data = define_bit_images([
+                    graphic.bits
+                    for graphic in nv_graphics.get_graphics(device_key)
+                ])
+            else:
+                data = delete_graphics(key)
+            self.write_stream([data], prefetch=0)
+            logger.debug(f"[delete_nv_graphic] NV graphic {key} deleted.")
+        return self.run_printer_action(
+            "delete_nv_graphic",
+            "delete NV graphic",
+            _delete
+        )
+
+    @staticmethod
+    def get_end_data(cut: bool = True, cashdrawer: bool = False) -> bytes:
+        """Get ESC/POS bytes ending a receipt: feed and cut, cash drawer."""
+        d = Dummy()
+        if cut:
+            d.cut(feed=True)
+        if cashdrawer:
+            d._raw(CMD_CASHDRAWER)
+        return d.output
+
+    def write_stream(
+        self,
+        chunks: Iterable[bytes],
+        prefetch: int = 2,
+        interruptible: bool = True
+    ) -> int:
+        """
+        Write chunks to the printer as soon as they are produced.
+
+        Next chunks are produced in background while the printer
+        receives the current one, unless prefetch is 0.
+        Chunks end on command boundaries (image bands, text runs)
+        unless interruptible is False, so on_chunk may send commands
+        between them.
+        """
+        written = 0
+        if prefetch > 0:
+            chunks = iter_prefetch(chunks, size=prefetch)
+        for chunk in chunks:
+            # Counted before writing, a failed write may be partial
+            self.bytes_written += len(chunk)
+            with self.trace("transmit", size=len(chunk)):
+                self.printer._raw(chunk)
+            written += len(chunk)
+            if interruptible and self.on_chunk is not None:
+                self.on_chunk(self.printer._raw)
+        return written
+
+    def get_image_conf(self) -> PrinteImageConfSchemas:
+        """Get device image configuration, or defaults."""
+        if self.has_printer_conf() and self.device.image_conf is not None:
+            return self.device.image_conf
+        return PrinteImageConfSchemas(impl="bitImageColumn")
+
+    def encode_image(self, img: Image.Image) -> bytes:
+        """Encode image to ESC/POS bytes using device image configuration."""
+        return b"".join(self.iter_encode_image(img))
+
+    def iter_encode_image(self, img: Image.Image) -> Iterator[bytes]:
+        """
+        Encode image to ESC/POS bytes using device image configuration,
+        fragment_height rows at a time with the numpy encoder.
+
+        Only the encoded output is chunked: img is decoded whole,
+        as Pillow decodes PNG files at once, so peak memory is the
+        decoded image plus a few bands, not a single band.
+        """
+        conf = self.get_image_conf()
+        if conf.encoder == "escpos":
+            d = Dummy()
+            d.image(
+                img,
+                impl=conf.impl,
+                fragment_height=conf.fragment_height
+            )
+            self.print_stats = {"image_bytes": len(d.output)}
+            yield d.output
+            return
+        trim_blank = conf.trim_blank
+        dpi = self.get_printer_dpi() if trim_blank else None
+        if trim_blank and dpi is None:
+            # Blank feeds and margins are set in dots, with GS P units
+            logger.warning(
+                "[iter_encode_image] Printer dpi unknown, "
+                "set image_conf dpi to enable trim_blank."
+            )
+            trim_blank = False
+        encoder = RasterEncoder(
+            impl=conf.impl,
+            fragment_height=conf.fragment_height,
+            dither=conf.dither,
+            trim_blank=trim_blank,
+            min_blank_rows=conf.min_blank_rows,
+            dpi=dpi
+        )
+        yield from encoder.iter_encode(img)
+        self.print_stats = {
+            "image_bytes": encoder.stats["image_bytes"],
+            "saved_bytes": encoder.stats["saved_bytes"],
+            "blank_rows": encoder.stats["blank_rows"]
+        }
+
     @staticmethod
     def set_device_port_schema(
         port_type: DevicePortType,
@@ -410,7 +1172,8 @@ class EscPosHelper(DeviceHelper):
 
     @staticmethod
     def format_base64_to_image(
-        b64string: str
+        b64string: str,
+        mode: Optional[str] = "RGB"
     ) -> Image:
         """
         Transform base64 string in Pillow Image object.
@@ -418,6 +1181,7 @@ class EscPosHelper(DeviceHelper):
         2. Abre con Pillow -> Image
         3. printer.image() usa internamente Pillow para ESC/POS
         4. Opcional: corte y apertura de cajón
+        Con mode=None la imagen no se convierte (sin copia RGB).
         """
         try:
             # 1. Quitar prefijos si existen y decodificar
@@ -426,14 +1190,41 @@ class EscPosHelper(DeviceHelper):
             raw = base64.b64decode(b64string)
 
             # 2. Abrir imagen en memoria
-            return Image.open(BytesIO(raw)).convert("RGB")
+            img = Image.open(BytesIO(raw))
+            # Pillow decodes lazily, decoding errors are raised here
+            img.load()
+            if mode is not None:
+                img = img.convert(mode)
+            return img
         except Exception as e:
-            raise HwPrinterError(
+            raise HwImageError(
                 "Error: Unable to convert "
                 "base64 string to Pilow Image Object. \n"
                 f"error: {e}"
             ) from e
     
+    @staticmethod
+    def format_bytes_to_image(
+        data: bytes,
+        mode: Optional[str] = "RGB"
+    ) -> Image:
+        """
+        Transform raw image file bytes (PNG, JPEG...) in Pillow Image object.
+        BytesIO comparte el buffer de bytes sin copiarlo.
+        """
+        try:
+            img = Image.open(BytesIO(data))
+            img.load()
+            if mode is not None:
+                img = img.convert(mode)
+            return img
+        except Exception as e:
+            raise HwImageError(
+                "Error: Unable to convert "
+                "image bytes to Pilow Image Object. \n"
+                f"error: {e}"
+            ) from e
+
     @staticmethod
     def save_image(
         img: Image.Image,
@@ -0,0 +1,1059 @@
+"""
+Print spooler for hw_proxy module
+
+Printer actions are queued as jobs and run in order
+by a dedicated worker thread per device,
+so blocking printer I/O never runs on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import queue
+from math import ceil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from enum import Enum, IntEnum
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Union
+from uuid import uuid4
+from hw_proxy.tools.connection_manager import (
+    PrinterConnectionManager,
+    connection_manager
+)
+from hw_proxy.tools.status_poller import StatusPoller, status_poller
+from hw_proxy.tools.device_helper import DeviceHelper
+from hw_proxy.tools.pos_helper import BATCH_ACTIONS, EscPosHelper
+from hw_proxy.tools.spool_journal import (
+    SpoolJournal,
+    dump_receipt,
+    spool_journal
+)
+from hw_proxy.tools.tracing import tracer
+from hw_proxy.tools.metrics import (
+    BYTES_WRITTEN,
+    DUPLICATE_JOBS,
+    JOB_BYTES,
+    JOB_SECONDS,
+    JOB_STAGE_SECONDS,
+    JOB_WAIT_SECONDS,
+    JOBS,
+    QUEUE_DEPTH,
+    REJECTED_JOBS,
+    metrics
+)
+from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import HwDeviceError, HwQueueFullError
+from hw_proxy.core.schemas import TextReceiptSchemas
+
+
+logger = logging.getLogger("hw_proxy")
+
+PrintJobReceipt = Union[str, bytes, bytearray, TextReceiptSchemas, List[dict]]
+# Short actions never rejected by admission limits
+ADMISSION_EXEMPT_ACTIONS = (
+    "cut_receipt", "cashbox", "cashdrawer", "nv_store", "nv_delete"
+)
+# Weight of the last job in the average job seconds
+JOB_SECONDS_SMOOTHING = 0.2
+
+
+def get_receipt_size(receipt: Optional[PrintJobReceipt]) -> int:
+    """
+    Get receipt size for queue limits, without copying it:
+    bytes of raw data, characters of base64 images and markup,
+    sum of batch action receipts. Structured receipts, rendered
+    to a few kilobytes, only count for jobs and wait limits.
+    """
+    if isinstance(receipt, (str, bytes, bytearray)):
+        return len(receipt)
+    if isinstance(receipt, list):
+        return sum(
+            get_receipt_size(item.get("receipt"))
+            for item in receipt if isinstance(item, dict)
+        )
+    return 0
+
+
+class JobStatus(Enum):
+    """Print job status"""
+    QUEUED="queued"
+    PRINTING="printing"
+    DONE="done"
+    FAILED="failed"
+
+
+class JobPriority(IntEnum):
+    """Print job priority class, lower classes are served first"""
+    DRAWER=0
+    CONTROL=1
+    RECEIPT=2
+    LOW=3
+
+
+# Actions priority class, RECEIPT for other actions
+ACTION_PRIORITIES = {
+    "cashbox": JobPriority.DRAWER,
+    "cashdrawer": JobPriority.DRAWER,
+    "cut_receipt": JobPriority.CONTROL,
+    "nv_store": JobPriority.LOW,
+    "nv_delete": JobPriority.LOW
+}
+# Actions applied to the receipt printed before them,
+# served right after the last printing job queued earlier
+FOLLOWING_ACTIONS = ("cut_receipt",)
+
+
+def get_job_priority(
+    action: str,
+    priority: Optional[Union[str, JobPriority]] = None
+) -> JobPriority:
+    """
+    Get job priority class, from a class name as "low"
+    for reprints and reports, else from its action.
+    Only cash drawer actions are in the drawer class.
+    """
+    if priority is not None and action not in ACTION_PRIORITIES:
+        if not isinstance(priority, JobPriority):
+            priority = JobPriority.__members__.get(str(priority).upper())
+        if priority is None:
+            logger.warning(
+                f"[get_job_priority] Unknown priority of {action} job."
+            )
+        elif priority != JobPriority.DRAWER:
+            return priority
+    return ACTION_PRIORITIES.get(action, JobPriority.RECEIPT)
+
+
+class PrintJob:
+    """
+    Printer action queued on a device.
+    """
+    def __init__(self,
+                 device_key: str,
+                 action: str,
+                 receipt: Optional[PrintJobReceipt] = None,
+                 request_id: Optional[Any] = None,
+                 cut: bool = True,
+                 cashdrawer: bool = False,
+                 group: Optional[str] = None,
+                 members: Optional[List[str]] = None,
+                 job_id: Optional[str] = None,
+                 priority: Optional[Union[str, JobPriority]] = None
+                 ):
+        self.job_id = job_id or uuid4().hex
+        self.device_key = device_key
+        self.action = action
+        self.priority = get_job_priority(action, priority)
+        # base64 image string, raw image, raw ESC/POS bytes, text receipt
+        # or batch actions
+        self.receipt = receipt
+        self.request_id = request_id
+        self.cut = cut
+        self.cashdrawer = cashdrawer
+        # Printer group key and its device keys, in failover order
+        self.group = group
+        self.members = members or []
+        # Members which failed to print the job
+        self.tried: List[str] = []
+        # Failover decisions, from a member to another
+        self.failover: List[dict] = []
+        self.status = JobStatus.QUEUED
+        self.result: Optional[bool] = None
+        self.error: Optional[str] = None
+        # Printed bytes stats, see EscPosHelper.print_stats
+        self.stats: dict = {}
+        # Seconds spent per stage, see EscPosHelper.timings
+        self.timings: Dict[str, float] = {}
+        self.created_at = time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Future = Future()
+        # Set once job is committed to the spool journal
+        self.journaled: Optional[Future] = None
+        # Request id and payload digest, see PrintSpooler.get_dedup_key
+        self.dedup_key: Optional[tuple] = None
+        # Retried requests attached to this job
+        self.duplicates = 0
+        # Receipt payload bytes, for queue admission limits
+        self.size = 0
+        # Printing job queued before a cut, see JobQueue
+        self.follows: Optional["PrintJob"] = None
+
+    def is_batchable(self) -> bool:
+        """Test if job can run in a printer session with other jobs."""
+        if self.priority == JobPriority.DRAWER:
+            return False
+        return self.action == "batch" or self.action in BATCH_ACTIONS
+
+    def get_actions(self) -> List[dict]:
+        """Get job actions, as EscPosHelper.run_batch items."""
+        if self.action == "batch":
+            return list(self.receipt or [])
+        return [{
+            "action": self.action,
+            "receipt": self.receipt,
+            "cut": self.cut,
+            "cashdrawer": self.cashdrawer
+        }]
+
+    def is_finished(self) -> bool:
+        """Test if job is done or failed."""
+        return self.status in (JobStatus.DONE, JobStatus.FAILED)
+
+    def set_printing(self):
+        """Set job as being printed."""
+        self.status = JobStatus.PRINTING
+        self.started_at = time()
+
+    def set_result(self, result: bool):
+        """Set job result."""
+        self.status = JobStatus.DONE if result else JobStatus.FAILED
+        self.result = result
+        if not result:
+            self.error = "Unable to run printer action"
+        self._finish()
+        self.future.set_result(result)
+
+    def add_failover(self, device_key: str, reason: str):
+        """Move job from its failed member to device_key."""
+        self.tried.append(self.device_key)
+        self.failover.append({
+            "from": self.device_key,
+            "to": device_key,
+            "reason": reason,
+            "at": time()
+        })
+        self.device_key = device_key
+        self.status = JobStatus.QUEUED
+
+    def set_error(self, error: Exception):
+        """Set job as failed with error."""
+        self.status = JobStatus.FAILED
+        self.result = False
+        self.error = str(error)
+        self._finish()
+        self.future.set_exception(error)
+
+    def _finish(self):
+        """Set finish time and release receipt payload."""
+        self.finished_at = time()
+        self.receipt = None
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for job result from the event loop.
+
+        Raises the job error if the printer action failed
+        and asyncio.TimeoutError if timeout is reached first.
+        """
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(self.future)),
+            timeout=timeout
+        )
+
+    async def wait_journaled(self):
+        """Wait for job to be committed to the spool journal."""
+        if self.journaled is not None:
+            await asyncio.wrap_future(self.journaled)
+
+    def get_timings(self) -> dict:
+        """
+        Get seconds spent in each stage of the last run,
+        queued before it and running it in total.
+        """
+        timings = {
+            stage: round(seconds, 6)
+            for stage, seconds in self.timings.items()
+        }
+        if self.started_at is not None:
+            timings["queued"] = round(self.started_at - self.created_at, 6)
+        if self.started_at is not None and self.finished_at is not None:
+            timings["total"] = round(self.finished_at - self.started_at, 6)
+        return timings
+
+    def to_dict(self) -> dict:
+        """Get job as dict."""
+        return {
+            "job_id": self.job_id,
+            "device_key": self.device_key,
+            "action": self.action,
+            "priority": self.priority.name.lower(),
+            "status": self.status.value,
+            "result": self.result,
+            "error": self.error,
+            "stats": self.stats,
+            "timings": self.get_timings(),
+            "group": self.group,
+            "failover": self.failover,
+            "request_id": self.request_id,
+            "duplicates": self.duplicates,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue(queue.Queue):
+    """
+    Job queue served by priority class, in queue order within a class.
+
+    A job waiting for aging seconds is served as if of the next higher
+    class, and so on up to the control class, so low classes are never
+    starved. While the printing job queued last before a cut is still
+    queued, the cut is served with its class right after it, so it
+    never cuts another receipt, see FOLLOWING_ACTIONS. The None stop
+    sentinel is served once no job is left.
+    """
+    def __init__(self, aging: float = 0):
+        self.aging = aging
+        queue.Queue.__init__(self)
+
+    def _init(self, maxsize: int):
+        self.queue: List[Optional[PrintJob]] = []
+        # Last printing job queued, followed by the next cut
+        self._printing: Optional[PrintJob] = None
+
+    def _put(self, item: Optional[PrintJob]):
+        if item is not None:
+            if item.action in FOLLOWING_ACTIONS:
+                item.follows = self._printing
+            elif item.priority != JobPriority.DRAWER:
+                self._printing = item
+        self.queue.append(item)
+
+    def _get(self) -> Optional[PrintJob]:
+        now = time()
+        best, best_rank = None, None
+        ranks: Dict[str, int] = {}
+        for index, job in enumerate(self.queue):
+            if job is None:
+                continue
+            rank = self.get_rank(job, now)
+            if job.follows is not None and job.follows.job_id in ranks:
+                rank = max(rank, ranks[job.follows.job_id])
+            ranks[job.job_id] = rank
+            if best_rank is None or rank < best_rank:
+                best, best_rank = index, rank
+        job = self.queue.pop(best if best is not None else 0)
+        if job is not None:
+            job.follows = None
+        return job
+
+    def get_rank(self, job: PrintJob, now: float) -> int:
+        """Get job priority class, raised once per aging seconds waited."""
+        if self.aging <= 0 or job.priority <= JobPriority.CONTROL:
+            return job.priority
+        raised = int((now - job.created_at) / self.aging)
+        return max(job.priority - raised, JobPriority.CONTROL)
+
+
+class DeviceWorker(threading.Thread):
+    """
+    Worker thread draining the job queue of a device by priority class,
+    see JobQueue.
+
+    Cash drawer jobs queued while a job prints are sent between
+    two chunks of it, at the next image band or text run boundary.
+
+    Back-to-back printing and cut jobs queued within
+    coalesce_window seconds run in one printer session,
+    with a single status check. Cash drawer jobs are never
+    coalesced, so they do not wait for other jobs.
+    Printer group jobs which fail are handed to the failover callback,
+    which returns True once the job is queued on another member.
+    """
+    def __init__(self,
+                 device_key: str,
+                 connections: PrinterConnectionManager,
+                 statuses: Optional[StatusPoller] = None,
+                 failover: Optional[Callable[[PrintJob, str], bool]] = None,
+                 coalesce_window: float = 0,
+                 max_coalesced: int = 32,
+                 priority_aging: float = 0
+                 ):
+        threading.Thread.__init__(
+            self,
+            name=f"hw_proxy-worker-{device_key}",
+            daemon=True
+        )
+        self.device_key = device_key
+        self.connections = connections
+        self.statuses = statuses
+        self.failover = failover
+        self.coalesce_window = coalesce_window
+        self.max_coalesced = max_coalesced
+        self.jobs = JobQueue(aging=priority_aging)
+        # Average seconds to run a job, None until a job is done
+        self.job_seconds: Optional[float] = None
+        # Rejected jobs count, by admission limit
+        self.rejected: Dict[str, int] = {}
+        # Job taken from queue while coalescing, run next
+        self._next_job: Optional[PrintJob] = None
+        self._stopping = False
+
+    def put(self, job: Optional[PrintJob]):
+        """Queue a job, None stops the worker."""
+        self.jobs.put(job)
+
+    def get_queue_size(self) -> int:
+        """Get number of queued jobs."""
+        return self.jobs.qsize()
+
+    def get_queued_bytes(self) -> int:
+        """Get payload bytes of queued jobs."""
+        with self.jobs.mutex:
+            return sum(job.size for job in self.jobs.queue if job is not None)
+
+    def get_estimated_wait(self) -> Optional[float]:
+        """Get seconds a new job is expected to wait, from drain rate."""
+        if self.job_seconds is None:
+            return None
+        return (self.get_queue_size() + 1) * self.job_seconds
+
+    def add_job_seconds(self, seconds: float):
+        """Update the average seconds to run a job."""
+        if self.job_seconds is None:
+            self.job_seconds = seconds
+        else:
+            self.job_seconds += JOB_SECONDS_SMOOTHING\
+                * (seconds - self.job_seconds)
+
+    def take_jobs(self, predicate: Callable[[PrintJob], bool]) -> List[PrintJob]:
+        """Remove queued jobs matching predicate, in queue order."""
+        with self.jobs.mutex:
+            taken = [
+                job for job in self.jobs.queue
+                if job is not None and predicate(job)
+            ]
+            for job in taken:
+                self.jobs.queue.remove(job)
+        return taken
+
+    def reroute(self, job: PrintJob, reason: str) -> bool:
+        """Hand a failed printer group job to failover."""
+        if job.group is None or self.failover is None:
+            return False
+        return self.failover(job, reason)
+
+    def run_drawer_jobs(self, write: Callable[[bytes], None]):
+        """
+        Send cash drawer kicks of queued jobs with write,
+        called between chunks of the running job.
+        """
+        jobs = self.take_jobs(
+            lambda job: job.priority == JobPriority.DRAWER
+        )
+        if not jobs:
+            return
+        for job in jobs:
+            job.set_printing()
+        logger.debug(
+            f"[DeviceWorker] Send {len(jobs)} cash drawer jobs "
+            f"between chunks on {self.device_key}"
+        )
+        try:
+            write(EscPosHelper.get_end_data(cut=False, cashdrawer=True))
+        except Exception as e:
+            for job in jobs:
+                job.set_error(e)
+                self.observe_job(job)
+            raise
+        for job in jobs:
+            job.set_result(True)
+            self.observe_job(job)
+
+    def run_job(self, job: PrintJob):
+        """Run printer action of job."""
+        job.set_printing()
+        logger.debug(
+            f"[DeviceWorker] Run job {job.job_id} ({job.action}) "
+            f"on {self.device_key}"
+        )
+        written = []
+        def _run_action(pos) -> bool:
+            pos.print_stats = {}
+            pos.timings = {}
+            pos.on_chunk = self.run_drawer_jobs
+            try:
+                return pos.default_printer_action(
+                    action=job.action,
+                    receipt=job.receipt,
+                    cut=job.cut,
+                    cashdrawer=job.cashdrawer
+                )
+            finally:
+                pos.on_chunk = None
+                job.stats = dict(pos.print_stats)
+                job.timings = dict(pos.timings)
+                written.append(pos.bytes_written)
+
+        try:
+            with tracer.span(
+                "job",
+                device=self.device_key,
+                job_id=job.job_id,
+                action=job.action
+            ):
+                result = self.connections.run(self.device_key, _run_action)
+            if result is not True\
+                    and self.reroute(job, "Printer not ready"):
+                return
+            job.set_result(result is True)
+        except Exception as e:
+            logger.error(
+                f"[DeviceWorker] Job {job.job_id} ({job.action}) failed "
+                f"on {self.device_key}, error: {e}"
+            )
+            # Printed bytes would be printed again on another member
+            if not any(written) and self.reroute(job, str(e)):
+                return
+            job.set_error(e)
+        finally:
+            if self.statuses is not None:
+                self.statuses.request_refresh(self.device_key)
+            self.observe_job(job)
+
+    def observe_job(self, job: PrintJob):
+        """Record metrics and structured log of a job run."""
+        device = self.device_key
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DeviceWorker] Job run: " + json.dumps({
+                "job_id": job.job_id,
+                "device_key": device,
+                "action": job.action,
+                "status": job.status.value,
+                "bytes": job.stats.get("bytes"),
+                "timings": job.get_timings()
+            }))
+        if job.is_finished():
+            # Coalesced jobs share their session time
+            self.add_job_seconds(
+                (job.finished_at - job.started_at)
+                / job.stats.get("coalesced", 1)
+            )
+            JOBS.inc(device=device, action=job.action, status=job.status.value)
+            JOB_WAIT_SECONDS.observe(
+                job.started_at - job.created_at,
+                device=device
+            )
+            JOB_SECONDS.observe(
+                job.finished_at - job.started_at,
+                device=device,
+                action=job.action
+            )
+        for stage, seconds in job.timings.items():
+            JOB_STAGE_SECONDS.observe(seconds, device=device, stage=stage)
+        written = job.stats.get("bytes")
+        if written:
+            JOB_BYTES.observe(written, device=device)
+            BYTES_WRITTEN.inc(written, device=device)
+
+    def get_coalesced_jobs(self, job: PrintJob) -> List[PrintJob]:
+        """
+        Get job and the batchable jobs following it,
+        queued or arriving within coalesce_window seconds.
+        """
+        jobs = [job]
+        if not job.is_batchable():
+            return jobs
+        deadline = time() + self.coalesce_window
+        while len(jobs) < self.max_coalesced:
+            try:
+                other = self.jobs.get(
+                    timeout=max(deadline - time(), 0)
+                ) if self.coalesce_window > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if other is None:
+                self._stopping = True
+                break
+            if not other.is_batchable():
+                self._next_job = other
+                break
+            jobs.append(other)
+        return jobs
+
+    def run_batch_jobs(self, jobs: List[PrintJob]):
+        """
+        Run jobs actions in one printer session.
+
+        Each job gets the results of its own actions: a job failing
+        to render does not fail the others, and only jobs with no byte
+        written are handed to failover.
+        """
+        for job in jobs:
+            job.set_printing()
+        logger.debug(
+            f"[DeviceWorker] Run {len(jobs)} jobs in one session "
+            f"on {self.device_key}: {[job.job_id for job in jobs]}"
+        )
+        job_actions = [job.get_actions() for job in jobs]
+        actions = [action for items in job_actions for action in items]
+        stats, timings, results = {}, {}, []
+        def _run_batch(pos) -> bool:
+            pos.print_stats = {}
+            pos.timings = {}
+            pos.on_chunk = self.run_drawer_jobs
+            try:
+                return pos.run_batch(actions)
+            finally:
+                pos.on_chunk = None
+                stats.update(pos.print_stats)
+                timings.update(pos.timings)
+                results[:] = pos.batch_results
+
+        error = None
+        try:
+            with tracer.span(
+                "job",
+                device=self.device_key,
+                job_id=jobs[0].job_id,
+                action="batch",
+                jobs=len(jobs)
+            ):
+                self.connections.run(self.device_key, _run_batch)
+        except Exception as e:
+            logger.error(
+                f"[DeviceWorker] Batch of {len(jobs)} jobs failed "
+                f"on {self.device_key}, error: {e}"
+            )
+            error = e
+        offset = 0
+        for job, items in zip(jobs, job_actions):
+            job_results = results[offset:offset + len(items)]
+            offset += len(items)
+            written = sum(item["bytes"] for item in job_results)
+            job.stats = {
+                "bytes": written,
+                "coalesced": len(jobs),
+                "session": jobs[0].job_id
+            }
+            if job is jobs[0]:
+                job.stats["session_bytes"] = stats.get("bytes")
+            job.timings = dict(timings)
+            job_error = next(
+                (item["error"] for item in job_results
+                 if item["error"] is not None),
+                error
+            )
+            if len(job_results) == len(items)\
+                    and all(item["done"] for item in job_results):
+                job.set_result(True)
+            elif written == 0 and job_error is error\
+                    and self.reroute(job, str(error or "Printer not ready")):
+                continue
+            elif job_error is not None:
+                job.set_error(job_error)
+            else:
+                job.set_result(False)
+            self.observe_job(job)
+        if self.statuses is not None:
+            self.statuses.request_refresh(self.device_key)
+
+    def run(self):
+        while not self._stopping:
+            job, self._next_job = self._next_job, None
+            if job is None:
+                job = self.jobs.get()
+            if job is None:
+                break
+            jobs = self.get_coalesced_jobs(job)
+            if len(jobs) == 1:
+                self.run_job(job)
+            else:
+                self.run_batch_jobs(jobs)
+        if self._next_job is not None:
+            self.run_job(self._next_job)
+
+
+class PrintSpooler:
+    """
+    Process-wide print spooler with a worker per device.
+
+    Jobs sent to a printer group go to its first member
+    with a ready cached status, and fail over to the next members
+    when the printer is not ready or fails while printing.
+    With an enabled journal, jobs are journaled when submitted
+    and jobs left unfinished by the last run are replayed on startup.
+    A request with the request id and payload of a job still running,
+    or done less than dedup_window seconds ago, gets that job back
+    instead of printing it again.
+    """
+    def __init__(self,
+                 connections: PrinterConnectionManager,
+                 statuses: Optional[StatusPoller] = None,
+                 history_size: int = 200,
+                 coalesce_window: float = 0,
+                 journal: Optional[SpoolJournal] = None,
+                 dedup_window: float = 0,
+                 priority_aging: float = 0
+                 ):
+        self.connections = connections
+        self.statuses = statuses
+        self.journal = journal
+        self.dedup_window = dedup_window
+        self.priority_aging = priority_aging
+        self._dedup: Dict[tuple, PrintJob] = {}
+        self.history_size = history_size
+        self.coalesce_window = coalesce_window
+        self._workers: Dict[str, DeviceWorker] = {}
+        self._jobs: "OrderedDict[str, PrintJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_worker(self, device_key: str) -> DeviceWorker:
+        """Get or start worker of a device."""
+        with self._lock:
+            worker = self._workers.get(device_key)
+            if worker is None or not worker.is_alive():
+                worker = DeviceWorker(
+                    device_key,
+                    self.connections,
+                    statuses=self.statuses,
+                    failover=self.failover,
+                    coalesce_window=self.coalesce_window,
+                    priority_aging=self.priority_aging
+                )
+                worker.start()
+                self._workers[device_key] = worker
+            return worker
+
+    def submit(self,
+               device_key: str,
+               action: str,
+               receipt: Optional[PrintJobReceipt] = None,
+               request_id: Optional[Any] = None,
+               cut: bool = True,
+               cashdrawer: bool = False,
+               priority: Optional[Union[str, JobPriority]] = None
+               ) -> PrintJob:
+        """
+        Queue a printer action on a device or a printer group,
+        or get the job of the same request if it is a retry.
+        """
+        dedup_key = self.get_dedup_key(
+            device_key, action, receipt, request_id, cut, cashdrawer
+        )
+        duplicate = self.get_duplicate(dedup_key)
+        if duplicate is not None:
+            return duplicate
+        group = DeviceHelper.select_group(device_key)
+        job = PrintJob(
+            device_key=device_key,
+            action=action,
+            receipt=receipt,
+            request_id=request_id,
+            cut=cut,
+            cashdrawer=cashdrawer,
+            group=group.key if group is not None else None,
+            members=group.members if group is not None else None,
+            priority=priority
+        )
+        job.dedup_key = dedup_key
+        job.size = get_receipt_size(receipt)
+        if group is not None:
+            job.device_key = self.select_member(job)
+            device_key = job.device_key
+        self.check_admission(job)
+        self.journal_job(job)
+        self._add_job(job)
+        self.get_worker(device_key).put(job)
+        logger.debug(
+            f"[PrintSpooler] Job {job.job_id} ({action}) queued "
+            f"on {device_key}"
+        )
+        return job
+
+    def get_dedup_key(self,
+                      device_key: str,
+                      action: str,
+                      receipt: Optional[PrintJobReceipt],
+                      request_id: Optional[Any],
+                      cut: bool,
+                      cashdrawer: bool
+                      ) -> Optional[tuple]:
+        """
+        Get deduplication key of a request, None without request id.
+        The receipt is only serialized and hashed with a request id.
+        """
+        if request_id is None or self.dedup_window <= 0:
+            return None
+        receipt_type, data = dump_receipt(receipt)
+        digest = hashlib.sha256(
+            f"{action}:{receipt_type}:{int(cut)}:{int(cashdrawer)}:".encode()
+        )
+        if data is not None:
+            digest.update(data)
+        return (device_key, json.dumps(request_id, default=str),
+                digest.hexdigest())
+
+    def get_duplicate(self, dedup_key: Optional[tuple]) -> Optional[PrintJob]:
+        """
+        Get the job of a retried request: running,
+        or done less than dedup_window seconds ago.
+        Failed jobs are printed again.
+        """
+        if dedup_key is None:
+            return None
+        now = time()
+        with self._lock:
+            for key, job in list(self._dedup.items()):
+                if job.status == JobStatus.FAILED or (
+                    job.finished_at is not None
+                    and now - job.finished_at > self.dedup_window
+                ):
+                    del self._dedup[key]
+            job = self._dedup.get(dedup_key)
+            if job is not None:
+                job.duplicates += 1
+        if job is not None:
+            DUPLICATE_JOBS.inc(device=job.device_key)
+            logger.warning(
+                f"[PrintSpooler] Request {dedup_key[1]} ({job.action}) "
+                f"retried, attached to job {job.job_id} ({job.status.value})"
+            )
+        return job
+
+    @staticmethod
+    def get_queue_limits(device_key: str) -> Dict[str, float]:
+        """Get device queue limits, from its conf or settings."""
+        limits = {
+            "max_jobs": settings.PRINT_QUEUE_MAX_JOBS,
+            "max_bytes": settings.PRINT_QUEUE_MAX_BYTES,
+            "max_wait": settings.PRINT_QUEUE_MAX_WAIT
+        }
+        device = DeviceHelper(device_key).device
+        if device is not None and device.queue_limits is not None:
+            limits.update(
+                device.queue_limits.model_dump(exclude_none=True)
+            )
+        return limits
+
+    def check_admission(self, job: PrintJob):
+        """
+        Raise HwQueueFullError if job exceeds its device queue limits,
+        with the seconds to drain the excess as retry_after.
+        """
+        if job.action in ADMISSION_EXEMPT_ACTIONS:
+            return
+        worker = self.get_worker(job.device_key)
+        limits = self.get_queue_limits(job.device_key)
+        queue_size = worker.get_queue_size()
+        job_seconds = worker.job_seconds or 1
+        reason, excess = None, 0.0
+        if limits["max_jobs"] and queue_size >= limits["max_jobs"]:
+            reason, excess = "jobs", queue_size - limits["max_jobs"] + 1
+        elif limits["max_bytes"]:
+            queued_bytes = worker.get_queued_bytes()
+            if queued_bytes + job.size > limits["max_bytes"]:
+                reason = "bytes"
+                # Jobs to drain, at the average queued job size
+                excess = (queued_bytes + job.size - limits["max_bytes"])\
+                    / max(queued_bytes / max(queue_size, 1), 1)
+        if reason is None and limits["max_wait"]:
+            wait = worker.get_estimated_wait()
+            if wait is not None and wait > limits["max_wait"]:
+                reason = "wait"
+                excess = (wait - limits["max_wait"]) / job_seconds
+        if reason is None:
+            return
+        worker.rejected[reason] = worker.rejected.get(reason, 0) + 1
+        REJECTED_JOBS.inc(device=job.device_key, reason=reason)
+        retry_after = max(int(ceil(excess * job_seconds)), 1)
+        logger.warning(
+            f"[PrintSpooler] Job ({job.action}) rejected on {job.device_key}, "
+            f"queue {reason} limit reached, retry after {retry_after}s"
+        )
+        raise HwQueueFullError(
+            f"Print queue of {job.device_key} is full ({reason})",
+            retry_after=retry_after
+        )
+
+    def journal_job(self, job: PrintJob, replayed: bool = False):
+        """Journal job unless replayed, and mark it finished once done."""
+        journal = self.journal
+        if journal is None or not journal.enabled:
+            return
+        if not replayed:
+            job.journaled = journal.append(job)
+        job.future.add_done_callback(
+            lambda _: journal.finish(job.job_id, job.status.value)
+        )
+
+    def replay(self) -> int:
+        """Queue jobs left unfinished in journal, in acceptance order."""
+        if self.journal is None or not self.journal.enabled:
+            return 0
+        self.journal.start()
+        pending = self.journal.get_pending()
+        for entry in pending:
+            job = PrintJob(
+                device_key=entry["device_key"],
+                action=entry["action"],
+                receipt=entry["receipt"],
+                request_id=entry["request_id"],
+                cut=entry["cut"],
+                cashdrawer=entry["cashdrawer"],
+                group=entry["group"],
+                members=entry["members"],
+                job_id=entry["job_id"]
+            )
+            job.created_at = entry["created_at"]
+            job.dedup_key = self.get_dedup_key(
+                job.group or job.device_key,
+                job.action,
+                job.receipt,
+                job.request_id,
+                job.cut,
+                job.cashdrawer
+            )
+            self.journal_job(job, replayed=True)
+            if job.group is not None:
+                job.device_key = self.select_member(job) or job.device_key
+            self._add_job(job)
+            if job.device_key not in DeviceHelper.get_device_keys():
+                job.set_error(HwDeviceError(
+                    f"Unable to replay job, unknown device: {job.device_key}"
+                ))
+                continue
+            self.get_worker(job.device_key).put(job)
+        if pending:
+            self.journal.replayed += len(pending)
+            logger.warning(
+                f"[PrintSpooler] {len(pending)} unfinished jobs replayed "
+                f"from spool journal {self.journal.path}"
+            )
+        return len(pending)
+
+    def select_member(
+        self,
+        job: PrintJob,
+        exclude: Optional[List[str]] = None
+    ) -> Optional[str]:
+        """
+        Get the printer group member to print job,
+        the first untried one with a ready status if any.
+        """
+        exclude = set(job.tried + (exclude or []))
+        candidates = [key for key in job.members if key not in exclude]
+        if not candidates:
+            return None
+        if self.statuses is not None:
+            for device_key in candidates:
+                if self.statuses.get_status(device_key).is_ready():
+                    return device_key
+        return candidates[0]
+
+    def failover(self, job: PrintJob, reason: str) -> bool:
+        """
+        Move a failed printer group job to the next member.
+
+        Jobs of the same group queued on the failed member follow it.
+        Returns False if no other member is left.
+        """
+        failed_key = job.device_key
+        if not self._move_job(job, reason):
+            return False
+        worker = self._workers.get(failed_key)
+        if worker is not None:
+            queued = worker.take_jobs(
+                lambda other: other.group == job.group
+                and self.select_member(other, exclude=[failed_key]) is not None
+            )
+            for other in queued:
+                self._move_job(
+                    other,
+                    f"Printer {failed_key} failed on job {job.job_id}"
+                )
+        return True
+
+    def _move_job(self, job: PrintJob, reason: str) -> bool:
+        """Queue job on next printer group member."""
+        failed_key = job.device_key
+        device_key = self.select_member(job, exclude=[failed_key])
+        if device_key is None:
+            return False
+        job.add_failover(device_key, reason)
+        logger.warning(
+            f"[PrintSpooler] Job {job.job_id} ({job.action}) of group "
+            f"{job.group} moved from {failed_key} to {device_key}: {reason}"
+        )
+        self.get_worker(device_key).put(job)
+        return True
+
+    def _add_job(self, job: PrintJob):
+        """Track job, forgetting the oldest finished jobs."""
+        with self._lock:
+            self._jobs[job.job_id] = job
+            if job.dedup_key is not None:
+                self._dedup[job.dedup_key] = job
+            if len(self._jobs) > self.history_size:
+                for job_id in list(self._jobs):
+                    if len(self._jobs) <= self.history_size:
+                        break
+                    if self._jobs[job_id].is_finished():
+                        del self._jobs[job_id]
+
+    def get_job(self, job_id: str) -> Optional[PrintJob]:
+        """Get a tracked job."""
+        return self._jobs.get(job_id)
+
+    def get_jobs(self, device_key: Optional[str] = None) -> List[PrintJob]:
+        """Get tracked jobs, optionally of a device or group only."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if device_key is not None:
+            jobs = [
+                job for job in jobs
+                if device_key in (job.device_key, job.group)
+            ]
+        return jobs
+
+    def get_stats(self) -> list:
+        """Get queue state, limits and rejections of each device worker."""
+        with self._lock:
+            workers = list(self._workers.values())
+        return [
+            {
+                "device_key": worker.device_key,
+                "is_alive": worker.is_alive(),
+                "queue_size": worker.get_queue_size(),
+                "queued_bytes": worker.get_queued_bytes(),
+                "job_seconds": worker.job_seconds,
+                "estimated_wait": worker.get_estimated_wait(),
+                "limits": self.get_queue_limits(worker.device_key),
+                "rejected": dict(worker.rejected)
+            }
+            for worker in workers
+        ]
+
+    def collect_metrics(self):
+        """Refresh queue depth metrics."""
+        QUEUE_DEPTH.clear()
+        for worker in self.get_stats():
+            QUEUE_DEPTH.set(worker["queue_size"], device=worker["device_key"])
+
+    def stop(self, timeout: float = 5):
+        """Stop all workers once their queued jobs are done."""
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers = {}
+        for worker in workers:
+            worker.put(None)
+        for worker in workers:
+            worker.join(timeout=timeout)
+        if self.journal is not None:
+            self.journal.stop()
+
+
+print_spooler = PrintSpooler(
+    connections=connection_manager,
+    statuses=status_poller,
+    history_size=settings.PRINT_JOB_HISTORY,
+    coalesce_window=settings.PRINT_COALESCE_WINDOW,
+    journal=spool_journal,
+    dedup_window=settings.PRINT_DEDUP_WINDOW,
+    priority_aging=settings.PRINT_PRIORITY_AGING
+)
+metrics.add_collector(print_spooler.collect_metrics)
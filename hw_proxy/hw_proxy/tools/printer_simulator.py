@@ -0,0 +1,336 @@
+"""
+ESC/POS printer simulator for hw_proxy module
+
+Emulates a serial ESC/POS printer on a Linux pseudo-terminal,
+so the real escpos Serial code path can be tested
+and benchmarked without hardware.
+
+The simulator consumes printed bytes at a configurable throughput,
+answers `DLE EOT` real-time status requests after a configurable latency,
+and can inject paper out, offline and disconnect faults.
+
+Usage:
+    python -m hw_proxy.tools.printer_simulator [--baudrate 115200]
+        [--print-speed 76800] [--latency 0.005] [--link /tmp/escpos_sim]
+"""
+import argparse
+import logging
+import os
+import select
+import termios
+import threading
+import tty
+from enum import Enum
+from time import monotonic, sleep
+from typing import Optional
+from hw_proxy.core.supported_devices import DevicePortType, DeviceType
+from hw_proxy.tools.device_registry import device_registry
+
+
+logger = logging.getLogger("hw_proxy")
+
+
+DLE = 0x10
+EOT = 0x04
+# Fixed bits of DLE EOT status bytes
+STATUS_FIXED = 0x12
+STATUS_OFFLINE = 0x08
+PAPER_NEAR_END = 0x0C
+PAPER_OUT = 0x60
+
+
+class PrinterFault(Enum):
+    """Simulated printer fault"""
+    NONE="none"
+    PAPER_NEAR_END="paper_near_end"
+    PAPER_OUT="paper_out"
+    OFFLINE="offline"
+    DISCONNECT="disconnect"
+
+
+class PrinterSimulator:
+    """
+    Pseudo-terminal ESC/POS printer.
+
+    Printed bytes are consumed at the lowest of the serial line rate
+    (baudrate / 10 bytes/s for 8N1 frames) and of the print-head rate
+    (print_speed bytes/s), so writers get the back pressure
+    of a real printer once the pty buffer is full.
+
+    The pty slave is exposed through the link symlink,
+    which is kept across simulated disconnections.
+    """
+    def __init__(self,
+                 key: str = "SIMULATOR",
+                 link: Optional[str] = None,
+                 baudrate: int = 115200,
+                 print_speed: Optional[float] = None,
+                 latency: float = 0.0,
+                 chunk_size: int = 256,
+                 capture: bool = False
+                 ):
+        self.key = key
+        self.link = link or f"/tmp/hw_proxy_{key.lower()}"
+        self.baudrate = baudrate
+        # Print-head rate in bytes/s, None for the line rate only
+        self.print_speed = print_speed
+        # Seconds before answering a status request
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.capture = capture
+        self.fault = PrinterFault.NONE
+        self.received = bytearray()
+        self.bytes_received = 0
+        self.status_requests = 0
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._pending = b""
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def get_rate(self) -> float:
+        """Get bytes/s consumed by the simulated printer."""
+        rate = self.baudrate / 10
+        if self.print_speed:
+            rate = min(rate, self.print_speed)
+        return rate
+
+    def get_device_conf(self) -> dict:
+        """Get device_list entry of the simulated printer."""
+        return {
+            'vendor': "0x0000",
+            'product': "0x0000",
+            'name': 'ESC/POS Simulator',
+            'key': self.key,
+            'type': DeviceType.PRINTER,
+            'port_type': DevicePortType.SERIAL,
+            'conf': {
+                "devfile": self.link,
+                "baudrate": self.baudrate,
+                "bytesize": 8,
+                "parity": 'N',
+                "stopbits": 1,
+                "timeout": 2,
+                # A pty has no modem control lines
+                "dsrdtr": False,
+                "profile": "TM-T88II"
+            },
+            'image_conf': {
+                "impl": "bitImageRaster",
+                "encoder": "numpy",
+                "trim_blank": True,
+                "fragment_height": 256
+            }
+        }
+
+    def register(self):
+        """Add simulated printer to device registry, replacing same key."""
+        device_registry.register_device(self.get_device_conf())
+
+    def unregister(self):
+        """Remove simulated printer from device registry."""
+        if device_registry.get_device(self.key) is not None:
+            device_registry.unregister_device(self.key)
+
+    def is_running(self) -> bool:
+        """Test if simulator thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> str:
+        """Open the pty and start answering. Returns the device link."""
+        if self.is_running():
+            return self.link
+        self._open_pty()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"hw_proxy-simulator-{self.key}",
+            daemon=True
+        )
+        self._thread.start()
+        logger.debug(
+            f"[PrinterSimulator] {self.key} listening on {self.link}"
+        )
+        return self.link
+
+    def stop(self):
+        """Stop simulator and close the pty."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._close_pty()
+        self._remove_link()
+
+    def set_fault(self, fault: PrinterFault):
+        """
+        Inject a fault.
+
+        DISCONNECT closes the pty, as unplugging the printer would;
+        setting any other fault afterwards reconnects it.
+        """
+        with self._lock:
+            previous = self.fault
+            self.fault = fault
+        if fault == PrinterFault.DISCONNECT:
+            self._close_pty()
+            self._remove_link()
+        elif previous == PrinterFault.DISCONNECT:
+            self._open_pty()
+        logger.debug(f"[PrinterSimulator] {self.key} fault: {fault.value}")
+
+    def get_stats(self) -> dict:
+        """Get simulator counters."""
+        return {
+            "key": self.key,
+            "devfile": self.link,
+            "fault": self.fault.value,
+            "bytes_received": self.bytes_received,
+            "status_requests": self.status_requests
+        }
+
+    def get_status_byte(self, request: int) -> Optional[int]:
+        """Get answer to a `DLE EOT n` status request, None for no answer."""
+        fault = self.fault
+        if request == 1:
+            if fault == PrinterFault.OFFLINE:
+                return STATUS_FIXED | STATUS_OFFLINE
+            return STATUS_FIXED
+        if request == 4:
+            if fault == PrinterFault.PAPER_OUT:
+                return STATUS_FIXED | PAPER_NEAR_END | PAPER_OUT
+            if fault == PrinterFault.PAPER_NEAR_END:
+                return STATUS_FIXED | PAPER_NEAR_END
+            return STATUS_FIXED
+        if request in (2, 3):
+            return STATUS_FIXED
+        return None
+
+    def _open_pty(self):
+        """Open a raw pty pair and point link to its slave."""
+        with self._lock:
+            master, slave = os.openpty()
+            tty.setraw(slave, termios.TCSANOW)
+            self._master, self._slave = master, slave
+            self._pending = b""
+            self._remove_link()
+            os.symlink(os.ttyname(slave), self.link)
+
+    def _close_pty(self):
+        """Close pty pair, further writes on the slave fail."""
+        with self._lock:
+            for fd in (self._master, self._slave):
+                if fd is not None:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+            self._master = self._slave = None
+
+    def _remove_link(self):
+        """Remove device link if any."""
+        if os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def _handle(self, data: bytes):
+        """Process received bytes, answering status requests."""
+        self.bytes_received += len(data)
+        if self.capture:
+            self.received += data
+        # Keep the tail of last chunk, a request may span two reads
+        buffer = self._pending + data
+        start = 0
+        while True:
+            index = buffer.find(bytes((DLE, EOT)), start)
+            if index < 0 or index + 2 >= len(buffer):
+                break
+            self._answer(buffer[index + 2])
+            start = index + 3
+        self._pending = buffer[max(start, len(buffer) - 2):]
+
+    def _answer(self, request: int):
+        """Write answer to a status request."""
+        self.status_requests += 1
+        status = self.get_status_byte(request)
+        if status is None:
+            return
+        if self.latency > 0:
+            sleep(self.latency)
+        with self._lock:
+            if self._master is not None:
+                os.write(self._master, bytes((status,)))
+
+    def _run(self):
+        rate = self.get_rate()
+        next_read = monotonic()
+        while not self._stop_event.is_set():
+            master = self._master
+            if master is None:
+                self._stop_event.wait(0.05)
+                continue
+            try:
+                ready, _, _ = select.select([master], [], [], 0.05)
+                if not ready:
+                    continue
+                # Consume no faster than the printer would
+                delay = next_read - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                data = os.read(master, self.chunk_size)
+            except (OSError, ValueError):
+                # pty closed by a disconnect fault, or no reader yet
+                self._stop_event.wait(0.05)
+                continue
+            if not data:
+                continue
+            next_read = max(next_read, monotonic()) + len(data) / rate
+            self._handle(data)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--key", default="SIMULATOR")
+    parser.add_argument("--link", help="Device symlink path")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument(
+        "--print-speed", type=float,
+        help="Print-head rate in bytes/s"
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    simulator = PrinterSimulator(
+        key=args.key,
+        link=args.link,
+        baudrate=args.baudrate,
+        print_speed=args.print_speed,
+        latency=args.latency
+    )
+    print(f"ESC/POS simulator {args.key} on {simulator.start()}")
+    try:
+        while True:
+            command = input(
+                "fault [none|paper_near_end|paper_out|offline|disconnect]"
+                ", stats or quit: "
+            ).strip()
+            if command in ("quit", "exit"):
+                break
+            if command == "stats":
+                print(simulator.get_stats())
+                continue
+            try:
+                simulator.set_fault(PrinterFault(command))
+            except ValueError:
+                print(f"Unknown command: {command}")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+NumPy raster encoder for hw_proxy module
+
+Converts receipt images to 1-bit dot arrays
+and packs them to ESC/POS image commands,
+byte for byte as escpos Escpos.image() does.
+
+Optionally, white row runs are sent as paper feeds
+and white side margins are not sent at all. Feeds and margins
+are counted in motion units, so trimmed images are wrapped
+in `GS P` commands setting them to one dot, then to defaults.
+"""
+from typing import Iterator, Literal, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+
+GS = b"\x1d"
+ESC = b"\x1b"
+
+ImageImpl = Literal["bitImageColumn", "bitImageRaster", "graphics"]
+
+
+def int_low_high(value: int, length: int) -> bytes:
+    """Get value as little-endian bytes, ESC/POS nL nH style."""
+    return int(value).to_bytes(length, "little")
+
+
+def image_to_bits(
+    img: Image.Image,
+    dither: bool = True,
+    threshold: int = 128
+) -> np.ndarray:
+    """
+    Convert image to a 2D boolean array, True for each printed dot.
+
+    Transparent pixels are printed as white.
+    With dither, Pillow Floyd-Steinberg dithering is used,
+    as escpos does, else dark pixels under threshold are printed.
+    """
+    if img.mode in ("RGBA", "LA", "PA") \
+            or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+    gray = img.convert("L")
+    if dither:
+        dots = ImageOps.invert(gray).convert("1")
+        return np.asarray(dots, dtype=bool)
+    return np.asarray(gray) < threshold
+
+
+def pack_raster(bits: np.ndarray) -> bytes:
+    """Pack dots rows to raster format bytes, MSB first, rows 0-padded."""
+    return np.packbits(bits, axis=1).tobytes()
+
+
+def iter_row_segments(
+    bits: np.ndarray,
+    min_blank_rows: int
+) -> Iterator[Tuple[bool, int, int]]:
+    """
+    Split dots rows in (is_blank, start, end) segments.
+
+    Blank segments are runs of at least min_blank_rows white rows,
+    shorter white runs are part of the surrounding content segments.
+    """
+    height = bits.shape[0]
+    if height == 0:
+        return
+    blank = ~bits.any(axis=1)
+    changes = np.flatnonzero(blank[1:] != blank[:-1]) + 1
+    bounds = [0] + changes.tolist() + [height]
+    content_start = None
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if blank[start] and end - start >= min_blank_rows:
+            if content_start is not None:
+                yield False, content_start, start
+                content_start = None
+            yield True, start, end
+        elif content_start is None:
+            content_start = start
+    if content_start is not None:
+        yield False, content_start, height
+
+
+def get_content_columns(bits: np.ndarray) -> Tuple[int, int]:
+    """Get (left, right) columns bounds of printed dots, left byte aligned."""
+    columns = np.flatnonzero(bits.any(axis=0))
+    if columns.size == 0:
+        return 0, 0
+    return (int(columns[0]) >> 3) << 3, int(columns[-1]) + 1
+
+
+def feed_dots(rows: int) -> bytes:
+    """Get `ESC J` commands feeding paper by rows dots."""
+    output = []
+    while rows > 0:
+        step = min(rows, 255)
+        output.append(ESC + b"J" + bytes((step,)))
+        rows -= step
+    return b"".join(output)
+
+
+def set_motion_units(dpi: int) -> bytes:
+    """
+    Get `GS P` command setting motion units to 1 / dpi inch, one dot.
+    A dpi of 0 restores the printer default units.
+    """
+    return GS + b"P" + bytes((dpi, dpi))
+
+
+def set_left_margin(dots: int) -> bytes:
+    """Get `GS L` command setting left margin in dots."""
+    return GS + b"L" + int_low_high(dots, 2)
+
+
+def pack_columns(bits: np.ndarray, line_height: int = 24) -> np.ndarray:
+    """
+    Pack dots to column format bands.
+
+    Returns an array of shape (bands, width, line_height // 8),
+    each column of a band holding line_height vertical dots.
+    """
+    height, width = bits.shape
+    bands = -(-height // line_height)
+    padded = np.zeros((bands * line_height, width), dtype=bool)
+    padded[:height] = bits
+    columns = padded.reshape(bands, line_height, width).transpose(0, 2, 1)
+    return np.packbits(columns, axis=2)
+
+
+class RasterEncoder:
+    """
+    Encode images to ESC/POS image commands.
+
+    impl selects the ESC/POS command:
+        * `bitImageRaster`: `GS v 0` raster bit image
+        * `graphics`: `GS ( L` raster graphics
+        * `bitImageColumn`: `ESC *` column bit image
+    """
+    def __init__(self,
+                 impl: ImageImpl = "bitImageRaster",
+                 high_density_vertical: bool = True,
+                 high_density_horizontal: bool = True,
+                 fragment_height: int = 960,
+                 dither: bool = True,
+                 trim_blank: bool = False,
+                 min_blank_rows: int = 8,
+                 dpi: Optional[int] = None
+                 ):
+        self.impl = impl
+        self.high_density_vertical = high_density_vertical
+        self.high_density_horizontal = high_density_horizontal
+        self.fragment_height = fragment_height
+        self.dither = dither
+        self.trim_blank = trim_blank
+        self.min_blank_rows = max(1, min_blank_rows)
+        # Printer resolution, blank feeds and margins are in dots
+        if trim_blank and not 0 < (dpi or 0) < 256:
+            raise ValueError(f"Unsupported printer dpi: {dpi}")
+        self.dpi = dpi
+        # Bytes of last encoded image, with and without blank trimming
+        self.stats = {}
+
+    def iter_fragments(self, img: Image.Image) -> Iterator[np.ndarray]:
+        """Convert image to dots, fragment_height rows at a time."""
+        width, height = img.size
+        if height <= self.fragment_height:
+            yield image_to_bits(img, dither=self.dither)
+            return
+        for top in range(0, height, self.fragment_height):
+            bottom = min(top + self.fragment_height, height)
+            yield image_to_bits(
+                img.crop((0, top, width, bottom)),
+                dither=self.dither
+            )
+
+    def encode(self, img: Image.Image) -> bytes:
+        """Encode image to ESC/POS bytes."""
+        return b"".join(self.iter_encode(img))
+
+    def iter_encode(self, img: Image.Image) -> Iterator[bytes]:
+        """
+        Encode image to ESC/POS bytes, one band of fragment_height rows
+        at a time, so only one band of dots and ESC/POS bytes is held
+        in memory while printing, besides the decoded image itself.
+        """
+        image_bytes = 0
+        sent_bytes = 0
+        blank_rows = 0
+        for index, bits in enumerate(self.iter_fragments(img)):
+            image_bytes += self.get_encoded_size(*bits.shape)
+            if self.trim_blank:
+                data, blank = self.encode_trimmed(bits)
+                blank_rows += blank
+                if index == 0:
+                    data = set_motion_units(self.dpi) + data
+            else:
+                data = self.encode_bits(bits)
+            sent_bytes += len(data)
+            self.stats = {
+                "image_bytes": image_bytes,
+                "bytes": sent_bytes,
+                "saved_bytes": image_bytes - sent_bytes,
+                "blank_rows": blank_rows
+            }
+            yield data
+        if self.trim_blank:
+            # Restore default units, used by line spacing among others
+            data = set_motion_units(0)
+            sent_bytes += len(data)
+            self.stats.update(bytes=sent_bytes,
+                              saved_bytes=image_bytes - sent_bytes)
+            yield data
+
+    def encode_trimmed(self, bits: np.ndarray) -> Tuple[bytes, int]:
+        """
+        Encode dots, feeding paper over blank rows runs
+        and cropping white side margins of content bands.
+
+        Returns ESC/POS bytes and the number of rows sent as feeds.
+        """
+        output = []
+        blank_rows = 0
+        for is_blank, start, end in iter_row_segments(
+                bits, self.min_blank_rows):
+            if is_blank:
+                output.append(feed_dots(end - start))
+                blank_rows += end - start
+                continue
+            band = bits[start:end]
+            left, right = get_content_columns(band)
+            margin = set_left_margin(left) if left > 0 else b""
+            # Shifting the band only pays when it saves more than GS L costs
+            if len(margin) * 2 >= (left >> 3) * (end - start):
+                left, margin = 0, b""
+            output.append(margin + self.encode_bits(band[:, left:right]))
+            if margin:
+                output.append(set_left_margin(0))
+        return b"".join(output), blank_rows
+
+    def get_encoded_size(self, height: int, width: int) -> int:
+        """Get size of encode_bits() output for a dots array shape."""
+        width_bytes = (width + 7) >> 3
+        if self.impl == "bitImageRaster":
+            return 8 + width_bytes * height
+        if self.impl == "graphics":
+            return 15 + width_bytes * height + 7
+        line_height = 24 if self.high_density_vertical else 8
+        bands = -(-height // line_height)
+        return 3 + bands * (6 + width * line_height // 8) + 2
+
+    def encode_bits(self, bits: np.ndarray) -> bytes:
+        """Encode dots array to ESC/POS bytes, using impl command."""
+        if self.impl == "bitImageRaster":
+            return self.bit_image_raster(bits)
+        if self.impl == "graphics":
+            return self.graphics(bits)
+        if self.impl == "bitImageColumn":
+            return self.bit_image_column(bits)
+        raise ValueError(f"Unsupported image impl: {self.impl}")
+
+    def bit_image_raster(self, bits: np.ndarray) -> bytes:
+        """Encode dots with `GS v 0` command."""
+        height, width = bits.shape
+        density_byte = (0 if self.high_density_horizontal else 1) + (
+            0 if self.high_density_vertical else 2
+        )
+        header = (
+            GS
+            + b"v0"
+            + bytes((density_byte,))
+            + int_low_high((width + 7) >> 3, 2)
+            + int_low_high(height, 2)
+        )
+        return header + pack_raster(bits)
+
+    def graphics(self, bits: np.ndarray) -> bytes:
+        """Encode dots with `GS ( L` store and print commands."""
+        height, width = bits.shape
+        ym = b"\x01" if self.high_density_vertical else b"\x02"
+        xm = b"\x01" if self.high_density_horizontal else b"\x02"
+        data = (
+            b"0" + xm + ym + b"1"
+            + int_low_high(width, 2)
+            + int_low_high(height, 2)
+            + pack_raster(bits)
+        )
+        return self.graphics_command(b"0", b"p", data)\
+            + self.graphics_command(b"0", b"2", b"")
+
+    @staticmethod
+    def graphics_command(m: bytes, fn: bytes, data: bytes) -> bytes:
+        """Get `GS ( L` command with its data length."""
+        return GS + b"(L" + int_low_high(len(data) + 2, 2) + m + fn + data
+
+    def bit_image_column(self, bits: np.ndarray) -> bytes:
+        """Encode dots with `ESC *` command, 24 or 8 dots bands."""
+        height, width = bits.shape
+        line_height = 24 if self.high_density_vertical else 8
+        density_byte = (1 if self.high_density_horizontal else 0) + (
+            32 if self.high_density_vertical else 0
+        )
+        header = ESC + b"*" + bytes((density_byte,)) + int_low_high(width, 2)
+        output = [ESC + b"3" + bytes((16,))]  # Adjust line-feed size
+        for band in pack_columns(bits, line_height):
+            output.append(header + band.tobytes() + b"\n")
+        output.append(ESC + b"2")  # Reset line-feed size
+        return b"".join(output)
@@ -0,0 +1,122 @@
+"""
+Encoded receipts cache for hw_proxy module
+
+Keeps the final ESC/POS bytes of recent receipts,
+so reprints and retries are written to the printer without re-encoding.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+from pydantic import BaseModel
+from hw_proxy.tools.metrics import CACHE_LOOKUPS
+from hw_proxy.core.config import settings
+
+
+class ReceiptCache:
+    """
+    LRU cache of encoded receipts, limited in total bytes.
+
+    Keys are a hash of the receipt payload
+    and of the device settings used to encode it.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        # End offsets of the chunks entries were printed in
+        self._bounds: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        payload: Union[str, bytes, memoryview],
+        conf: Optional[BaseModel] = None
+    ) -> str:
+        """Get cache key of a receipt payload encoded with conf settings."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        digest = hashlib.sha256(payload)
+        if conf is not None:
+            digest.update(conf.model_dump_json().encode("utf-8"))
+        return digest.hexdigest()
+
+    def is_enabled(self) -> bool:
+        """Test if cache can store entries."""
+        return self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get encoded receipt, None if not cached."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        CACHE_LOOKUPS.inc(result="miss" if data is None else "hit")
+        return data
+
+    def get_bounds(self, key: str) -> Tuple[int, ...]:
+        """Get end offsets of an entry chunks, a single chunk if unknown."""
+        with self._lock:
+            bounds = self._bounds.get(key)
+            if bounds is None:
+                data = self._entries.get(key)
+                bounds = (len(data),) if data is not None else ()
+        return bounds
+
+    def put(self,
+            key: str,
+            data: bytes,
+            bounds: Optional[Tuple[int, ...]] = None
+            ) -> bool:
+        """
+        Store encoded receipt, evicting least recently used ones.
+        bounds are the end offsets of the chunks, e.g. image bands.
+        """
+        size = len(data)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            while self._entries and self.size + size > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bounds.pop(evicted_key, None)
+                self.size -= len(evicted)
+                self.evictions += 1
+            self._entries[key] = data
+            self._bounds.pop(key, None)
+            if bounds is not None:
+                self._bounds[key] = bounds
+            self.size += size
+        return True
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bounds.clear()
+            self.size = 0
+
+    def get_stats(self) -> dict:
+        """Get cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+receipt_cache = ReceiptCache(max_bytes=settings.RECEIPT_CACHE_MAX_BYTES)
@@ -0,0 +1,163 @@
+"""
+Receipt templates for hw_proxy module
+
+Named Jinja2 templates under TEMPLATES_BASE_PATH/receipts render
+order data to receipt markup (see text_receipt.parse_markup),
+printed with native ESC/POS text commands.
+
+Templates are compiled once at startup and kept in the Jinja2 cache,
+auto_reload recompiles a template when its file changes.
+Autoescape is on, so order data can not inject markup tags.
+"""
+import logging
+import os
+from typing import List, Optional, Union
+from jinja2 import (
+    Environment,
+    FileSystemLoader,
+    TemplateError,
+    TemplateNotFound,
+    is_undefined,
+    pass_context
+)
+from hw_proxy.core.config import settings
+from hw_proxy.core.exceptions import HwTemplateError
+from hw_proxy.tools.text_receipt import DEFAULT_COLUMNS, parse_markup
+
+
+logger = logging.getLogger("hw_proxy")
+
+TEMPLATE_EXTENSION = ".j2"
+
+
+def format_money(
+    value: Union[float, int, str, None],
+    decimals: int = 2,
+    currency: str = ""
+) -> str:
+    """money filter: format an amount with decimals and currency."""
+    if value is None or is_undefined(value) or value == "":
+        return ""
+    if isinstance(value, str):
+        return value
+    result = f"{value:.{decimals}f}"
+    return f"{result} {currency}" if currency else result
+
+
+@pass_context
+def format_row(context, left, right="", width: Optional[int] = None) -> str:
+    """row function: left text and right aligned text on one line."""
+    width = width or context.get("columns") or DEFAULT_COLUMNS
+    left, right = str(left), str(right)
+    left = left[:max(width - len(right) - 1, 0)] if right else left[:width]
+    return left.ljust(width - len(right)) + right
+
+
+class ReceiptTemplates:
+    """
+    Compiled receipt templates of a directory.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=True,
+            auto_reload=True,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True
+        )
+        self.env.filters["money"] = format_money
+        self.env.globals["row"] = format_row
+        self.renders = 0
+        self.errors: dict = {}
+
+    def get_names(self) -> List[str]:
+        """Get template names, without extension."""
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            name[:-len(TEMPLATE_EXTENSION)]
+            for name in self.env.list_templates()
+            if name.endswith(TEMPLATE_EXTENSION)
+        ]
+
+    @staticmethod
+    def get_file_name(name: str) -> str:
+        """Get template file name of a template name."""
+        if name.endswith(TEMPLATE_EXTENSION):
+            return name
+        return name + TEMPLATE_EXTENSION
+
+    def exists(self, name: str) -> bool:
+        """Test if a template file exists."""
+        return os.path.isfile(
+            os.path.join(self.directory, self.get_file_name(name))
+        )
+
+    def load(self) -> int:
+        """Compile all templates, logging invalid ones."""
+        if not os.path.isdir(self.directory):
+            logger.warning(
+                f"[ReceiptTemplates] Templates directory not found: "
+                f"{self.directory}"
+            )
+            return 0
+        loaded = 0
+        self.errors = {}
+        for name in self.get_names():
+            try:
+                self.env.get_template(self.get_file_name(name))
+                loaded += 1
+            except TemplateError as e:
+                self.errors[name] = str(e)
+                logger.error(
+                    f"[ReceiptTemplates] Invalid template {name}, error: {e}"
+                )
+        logger.debug(f"[ReceiptTemplates] {loaded} receipt templates loaded.")
+        return loaded
+
+    def render(self, name: str, data: dict, columns: Optional[int] = None) -> str:
+        """
+        Render a template to receipt markup.
+
+        data is available as "data" and as top level variables,
+        columns is the printer characters per line.
+        """
+        if ".." in name.replace("\\", "/").split("/"):
+            raise HwTemplateError(f"Invalid receipt template name: {name}")
+        try:
+            template = self.env.get_template(self.get_file_name(name))
+        except TemplateNotFound as e:
+            raise HwTemplateError(f"Unknown receipt template: {name}") from e
+        except TemplateError as e:
+            raise HwTemplateError(
+                f"Invalid receipt template {name}, error: {e}"
+            ) from e
+        try:
+            markup = template.render({
+                **data,
+                "data": data,
+                "columns": columns or DEFAULT_COLUMNS
+            })
+            parse_markup(markup)
+        except (TemplateError, TypeError, ValueError) as e:
+            raise HwTemplateError(
+                f"Unable to render receipt template {name}, error: {e}"
+            ) from e
+        self.renders += 1
+        return markup
+
+    def get_stats(self) -> dict:
+        """Get templates state."""
+        return {
+            "directory": self.directory,
+            "templates": self.get_names(),
+            "renders": self.renders,
+            "errors": self.errors
+        }
+
+
+receipt_templates = ReceiptTemplates(
+    os.path.join(settings.TEMPLATES_BASE_PATH, "receipts")
+)
@@ -0,0 +1,292 @@
+"""
+Spool journal for hw_proxy module
+
+Accepted print jobs are journaled in a SQLite database in WAL mode,
+under PRINT_SPOOL_DIR, and marked finished once the printer action
+returned, so jobs left queued or printing by a crash or a restart
+are replayed in order on startup.
+
+Writes are queued to a single writer thread which commits
+every write queued while the previous commit was running at once
+(group commit): the fsync cost is shared by all jobs accepted
+meanwhile instead of paid by each one.
+"""
+import base64
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from time import time
+from typing import Any, List, Optional, Tuple
+from pydantic import BaseModel
+from hw_proxy.core.config import settings
+
+
+logger = logging.getLogger("hw_proxy")
+
+JOURNAL_FILE = "spool.sqlite3"
+# Job statuses written once the printer action returned
+FINISHED_STATUSES = ("done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    device_key TEXT NOT NULL,
+    action TEXT,
+    receipt_type TEXT NOT NULL,
+    receipt BLOB,
+    request_id TEXT,
+    cut INTEGER NOT NULL,
+    cashdrawer INTEGER NOT NULL,
+    printer_group TEXT,
+    members TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+)
+"""
+
+
+def dump_receipt(receipt: Any) -> Tuple[str, Optional[bytes]]:
+    """Get receipt type and stored value, models are stored as dicts."""
+    if receipt is None:
+        return "none", None
+    if isinstance(receipt, (bytes, bytearray)):
+        return "bytes", bytes(receipt)
+    if isinstance(receipt, str):
+        return "str", receipt.encode("utf-8")
+    if isinstance(receipt, BaseModel):
+        receipt = receipt.model_dump()
+    return "json", json.dumps(receipt, default=_dump_json).encode("utf-8")
+
+
+def _dump_json(value: Any) -> Any:
+    """Encode batch raw bytes as base64, as print_raw accepts them."""
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Unable to journal value of type {type(value)}")
+
+
+def load_receipt(receipt_type: str, value: Optional[bytes]) -> Any:
+    """Get receipt from its stored type and value."""
+    if receipt_type == "none" or value is None:
+        return None
+    if receipt_type == "bytes":
+        return bytes(value)
+    if receipt_type == "str":
+        return bytes(value).decode("utf-8")
+    return json.loads(bytes(value).decode("utf-8"))
+
+
+class SpoolJournal:
+    """
+    Persistent journal of print jobs, disabled without directory.
+    """
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 history_size: int = 200
+                 ):
+        self.directory = directory
+        # Finished jobs kept in journal, for inspection
+        self.history_size = history_size
+        self.path = os.path.join(directory, JOURNAL_FILE)\
+            if directory is not None else None
+        self.commits = 0
+        self.writes = 0
+        self.replayed = 0
+        self.last_error: Optional[str] = None
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def connect(self) -> sqlite3.Connection:
+        """Open journal database, creating it if needed."""
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Sync WAL on each commit, so committed jobs survive power loss
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute(SCHEMA)
+        return connection
+
+    def start(self):
+        """Start journal writer thread."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            # Fail on startup rather than on first job
+            self.connect().close()
+            self._writer = threading.Thread(
+                target=self._run,
+                name="hw_proxy-spool-journal",
+                daemon=True
+            )
+            self._writer.start()
+
+    def stop(self, timeout: float = 5):
+        """Stop writer thread once queued writes are committed."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join(timeout=timeout)
+
+    def _write(self, sql: str, params: tuple) -> Future:
+        """Queue a write, future is set once committed."""
+        future: Future = Future()
+        if not self.enabled:
+            future.set_result(False)
+            return future
+        self.start()
+        self._writes.put((sql, params, future))
+        return future
+
+    def append(self, job) -> Future:
+        """Journal an accepted job, future is set once committed."""
+        receipt_type, receipt = dump_receipt(job.receipt)
+        return self._write(
+            "INSERT OR REPLACE INTO jobs (job_id, device_key, action, "
+            "receipt_type, receipt, request_id, cut, cashdrawer, "
+            "printer_group, members, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+            (
+                job.job_id,
+                job.device_key,
+                job.action,
+                receipt_type,
+                receipt,
+                json.dumps(job.request_id, default=str),
+                int(job.cut),
+                int(job.cashdrawer),
+                job.group,
+                json.dumps(job.members),
+                job.created_at
+            )
+        )
+
+    def finish(self, job_id: str, status: str) -> Future:
+        """Mark a job finished, it is not replayed anymore."""
+        return self._write(
+            "UPDATE jobs SET status = ?, receipt = NULL, finished_at = ? "
+            "WHERE job_id = ?",
+            (status, time(), job_id)
+        )
+
+    def get_pending(self) -> List[dict]:
+        """Get jobs not finished, in acceptance order."""
+        if not self.enabled or not os.path.exists(self.path):
+            return []
+        connection = self.connect()
+        try:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(
+                "SELECT * FROM jobs WHERE status NOT IN (?, ?) ORDER BY seq",
+                FINISHED_STATUSES
+            ).fetchall()
+        finally:
+            connection.close()
+        return [
+            {
+                "job_id": row["job_id"],
+                "device_key": row["device_key"],
+                "action": row["action"],
+                "receipt": load_receipt(row["receipt_type"], row["receipt"]),
+                "request_id": json.loads(row["request_id"]),
+                "cut": bool(row["cut"]),
+                "cashdrawer": bool(row["cashdrawer"]),
+                "group": row["printer_group"],
+                "members": json.loads(row["members"] or "[]"),
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        ]
+
+    def _take_writes(self) -> Tuple[list, bool]:
+        """Wait for a write, then take all writes already queued."""
+        writes = []
+        item = self._writes.get()
+        while item is not None:
+            writes.append(item)
+            try:
+                item = self._writes.get_nowait()
+            except queue.Empty:
+                return writes, False
+        return writes, True
+
+    def _commit(self, connection: sqlite3.Connection, writes: list):
+        """Run writes in one transaction and resolve their futures."""
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for sql, params, _ in writes:
+                connection.execute(sql, params)
+            connection.execute("COMMIT")
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self.last_error = str(e)
+            logger.error(
+                f"[SpoolJournal] Unable to commit {len(writes)} writes, "
+                f"error: {e}"
+            )
+            for _, _, future in writes:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.writes += len(writes)
+        for _, _, future in writes:
+            future.set_result(True)
+
+    def purge(self, connection: sqlite3.Connection):
+        """Delete oldest finished jobs over history_size."""
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND seq NOT IN "
+            "(SELECT seq FROM jobs WHERE status IN (?, ?) "
+            "ORDER BY seq DESC LIMIT ?)",
+            FINISHED_STATUSES + FINISHED_STATUSES + (self.history_size,)
+        )
+
+    def _run(self):
+        """Writer loop, one commit per batch of queued writes."""
+        connection = self.connect()
+        try:
+            stopping = False
+            while not stopping:
+                writes, stopping = self._take_writes()
+                if writes:
+                    self._commit(connection, writes)
+                if self.commits % 100 == 0 or stopping:
+                    try:
+                        self.purge(connection)
+                    except sqlite3.Error as e:
+                        logger.error(f"[SpoolJournal] Purge error: {e}")
+        finally:
+            connection.close()
+
+    def get_stats(self) -> dict:
+        """Get journal usage stats."""
+        return {
+            "path": self.path,
+            "commits": self.commits,
+            "writes": self.writes,
+            "replayed": self.replayed,
+            "queue_size": self._writes.qsize(),
+            "last_error": self.last_error
+        }
+
+
+spool_journal = SpoolJournal(
+    directory=settings.PRINT_SPOOL_DIR,
+    history_size=settings.PRINT_JOB_HISTORY
+)
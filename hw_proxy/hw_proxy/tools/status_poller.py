@@ -0,0 +1,235 @@
+"""
+Printer status poller for hw_proxy module
+
+A background thread per device refreshes the printer status
+so status requests are answered from cache,
+whatever the number of polling clients.
+"""
+import logging
+import threading
+from time import monotonic, time
+from typing import Dict, Iterable, Optional
+from hw_proxy.tools.connection_manager import (
+    PrinterConnectionManager,
+    connection_manager
+)
+from hw_proxy.tools.device_registry import RegistrySnapshot, device_registry
+from hw_proxy.core.config import settings
+from hw_proxy.core.supported_devices import DeviceType
+from hw_proxy.core.exceptions import HwPrinterError
+
+
+logger = logging.getLogger("hw_proxy")
+
+
+class PrinterStatus:
+    """
+    Cached printer status of a device.
+    """
+    def __init__(self,
+                 status: Optional[dict] = None,
+                 updated_at: Optional[float] = None
+                 ):
+        self.status = status or {
+            "is_online": False,
+            "paper_status": "unknown"
+        }
+        self.updated_at = updated_at
+
+    def is_ready(self) -> bool:
+        """Test if printer is online with paper."""
+        return self.status.get("is_online", False) is True\
+            and self.status.get("paper_status", "unknown") == "ok"
+
+    def get_str_status(self) -> str:
+        """Get String representation of printer status."""
+        return "connected" if self.is_ready() else "disconnected"
+
+    def get_age(self) -> Optional[float]:
+        """Get seconds since last status update."""
+        if self.updated_at is None:
+            return None
+        return round(max(0.0, time() - self.updated_at), 3)
+
+    def to_dict(self) -> dict:
+        """Get printer status with staleness info."""
+        result = dict(self.status)
+        result.update({
+            "updated_at": self.updated_at,
+            "age": self.get_age()
+        })
+        return result
+
+
+class DeviceStatusPoller(threading.Thread):
+    """
+    Status refresh thread of a device.
+
+    Refreshes every interval seconds, or sooner on request,
+    but never more often than every min_interval seconds.
+    """
+    def __init__(self,
+                 device_key: str,
+                 connections: PrinterConnectionManager,
+                 interval: float,
+                 min_interval: float
+                 ):
+        threading.Thread.__init__(
+            self,
+            name=f"hw_proxy-status-{device_key}",
+            daemon=True
+        )
+        self.device_key = device_key
+        self.connections = connections
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.status = PrinterStatus()
+        self.queries = 0
+        self._last_query: Optional[float] = None
+        self._refresh_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def request_refresh(self):
+        """Ask for a status refresh as soon as min_interval allows it."""
+        self._refresh_event.set()
+
+    def stop(self):
+        """Stop refresh thread."""
+        self._stop_event.set()
+        self._refresh_event.set()
+
+    def query_status(self) -> dict:
+        """Query printer status on the device."""
+        try:
+            with self.connections.borrow(self.device_key) as pos:
+                return pos.get_full_printer_status()
+        except HwPrinterError as e:
+            logger.debug(
+                f"[DeviceStatusPoller] Printer {self.device_key} "
+                f"not available: {e}"
+            )
+            return {
+                "is_online": False,
+                "paper_status": "unknown",
+                "error": str(e)
+            }
+
+    def refresh(self):
+        """Refresh cached status."""
+        self._last_query = monotonic()
+        self.queries += 1
+        status = self.query_status()
+        self.status = PrinterStatus(status=status, updated_at=time())
+
+    def _get_wait_time(self, requested: bool) -> float:
+        """Get seconds to wait before next query."""
+        if self._last_query is None:
+            return 0
+        delay = self.min_interval if requested else self.interval
+        return max(0.0, self._last_query + delay - monotonic())
+
+    def run(self):
+        while not self._stop_event.is_set():
+            wait_time = self._get_wait_time(self._refresh_event.is_set())
+            if wait_time > 0:
+                # Wake up early only for a refresh request
+                if self._refresh_event.wait(wait_time):
+                    wait_time = self._get_wait_time(True)
+                    if wait_time > 0:
+                        self._stop_event.wait(wait_time)
+                if self._stop_event.is_set():
+                    break
+            self._refresh_event.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(
+                    f"[DeviceStatusPoller] Unable to refresh status of "
+                    f"{self.device_key}, error: {e}"
+                )
+
+
+class StatusPoller:
+    """
+    Process-wide printer status cache, refreshed in background.
+    """
+    def __init__(self,
+                 connections: PrinterConnectionManager,
+                 interval: float = 10,
+                 min_interval: float = 2
+                 ):
+        self.connections = connections
+        self.interval = interval
+        self.min_interval = min_interval
+        self._pollers: Dict[str, DeviceStatusPoller] = {}
+        self._lock = threading.Lock()
+
+    def get_poller(self, device_key: str) -> DeviceStatusPoller:
+        """Get or start status poller of a device."""
+        with self._lock:
+            poller = self._pollers.get(device_key)
+            if poller is None or not poller.is_alive():
+                poller = DeviceStatusPoller(
+                    device_key=device_key,
+                    connections=self.connections,
+                    interval=self.interval,
+                    min_interval=self.min_interval
+                )
+                poller.start()
+                self._pollers[device_key] = poller
+            return poller
+
+    def get_status(self, device_key: str) -> PrinterStatus:
+        """Get cached printer status of a device."""
+        return self.get_poller(device_key).status
+
+    def request_refresh(self, device_key: str):
+        """Ask for a status refresh of a device, e.g. after a job."""
+        poller = self._pollers.get(device_key)
+        if poller is not None:
+            poller.request_refresh()
+
+    def start(self, device_keys: Iterable[str]):
+        """Start status pollers of devices."""
+        for device_key in device_keys:
+            self.get_poller(device_key)
+
+    def stop_poller(self, device_key: str):
+        """Stop status poller of a device."""
+        with self._lock:
+            poller = self._pollers.pop(device_key, None)
+        if poller is not None:
+            poller.stop()
+
+    def on_registry_update(self, old: RegistrySnapshot, new: RegistrySnapshot):
+        """Poll added printers, stop polling removed devices."""
+        with self._lock:
+            if not self._pollers:
+                # Pollers not started yet
+                return
+        for device_key in old.devices:
+            if device_key not in new.devices:
+                self.stop_poller(device_key)
+        self.start(
+            key for key, device in new.devices.items()
+            if device.type == DeviceType.PRINTER
+            and key not in old.devices
+        )
+
+    def stop(self):
+        """Stop all status pollers."""
+        with self._lock:
+            pollers = list(self._pollers.values())
+            self._pollers = {}
+        for poller in pollers:
+            poller.stop()
+        for poller in pollers:
+            poller.join(timeout=5)
+
+
+status_poller = StatusPoller(
+    connections=connection_manager,
+    interval=settings.PRINTER_STATUS_INTERVAL,
+    min_interval=settings.PRINTER_STATUS_MIN_INTERVAL
+)
+device_registry.add_listener(status_poller.on_registry_update)
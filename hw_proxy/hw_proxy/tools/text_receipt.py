@@ -0,0 +1,590 @@
+"""
+Text receipt renderer for hw_proxy module
+
+Structured receipts are printed with native ESC/POS text,
+code page and style commands, so the printer fonts do the rendering
+and a receipt is a few hundred bytes instead of a raster image.
+Lines holding characters that no printer code page can encode
+are composed from the glyph atlas and printed as images,
+consecutive ones in a single raster band.
+
+Receipt templates render to a small markup, see parse_markup().
+"""
+import html
+import logging
+import re
+import textwrap
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from escpos.capabilities import get_profile
+from escpos.magicencode import Encoder
+from escpos.printer import Dummy
+import numpy as np
+from PIL import Image
+from hw_proxy.tools.glyph_atlas import GlyphAtlas, glyph_atlas
+from hw_proxy.core.schemas import (
+    ItemTicketsSchemas,
+    TextBlockSchemas,
+    TextReceiptLineSchemas,
+    TextReceiptSchemas
+)
+
+
+logger = logging.getLogger("hw_proxy")
+
+# Font A cell on 180 dpi printers, used when the profile misses it
+DEFAULT_COLUMNS = 42
+DEFAULT_LINE_HEIGHT = 24
+DEFAULT_WIDTH_PIXELS = 512
+
+ImageEncoder = Callable[[Image.Image], Iterable[bytes]]
+
+# Receipt markup tags, e.g. <center><b>Title</b></center> or <cut/>
+MARKUP_TAG = re.compile(
+    r'<(/?)([a-z]+)((?:\s+[a-z]+="[^"<>]*")*)\s*(/?)>'
+)
+MARKUP_ATTRIBUTE = re.compile(r'([a-z]+)="([^"<>]*)"')
+STYLE_TAGS = {
+    "b": ("bold",),
+    "u": ("underline",),
+    "dw": ("double_width",),
+    "dh": ("double_height",),
+    "big": ("double_width", "double_height")
+}
+ALIGN_TAGS = ("left", "center", "right")
+COMMAND_TAGS = ("cut", "drawer", "feed", "hr")
+# Lines fed by <feed n=""/>, ESC d n range
+MAX_FEED_LINES = 255
+CASHDRAWER_PULSE = [27, 112, 0, 25, 250]
+
+
+class TextLine:
+    """
+    Receipt line with its print style.
+    """
+    __slots__ = (
+        "text", "align", "bold", "underline", "double_width", "double_height"
+    )
+
+    def __init__(self,
+                 text: str,
+                 align: str = "left",
+                 bold: bool = False,
+                 underline: bool = False,
+                 double_width: bool = False,
+                 double_height: bool = False
+                 ):
+        self.text = text
+        self.align = align
+        self.bold = bold
+        self.underline = underline
+        self.double_width = double_width
+        self.double_height = double_height
+
+    def get_style(self) -> Tuple[str, bool, bool, bool, bool]:
+        """Get style, to only send style commands on changes."""
+        return (
+            self.align,
+            self.bold,
+            self.underline,
+            self.double_width,
+            self.double_height
+        )
+
+
+def get_profile_columns(profile=None) -> int:
+    """Get Font A characters per line of an escpos profile or profile name."""
+    if not hasattr(profile, "profile_data"):
+        profile = get_profile(profile)
+    fonts = profile.profile_data.get("fonts") or {}
+    columns = (fonts.get("0") or {}).get("columns")
+    return columns if isinstance(columns, int) else DEFAULT_COLUMNS
+
+
+def get_profile_dpi(profile=None) -> Optional[int]:
+    """Get resolution of an escpos profile or profile name, if known."""
+    if not hasattr(profile, "profile_data"):
+        profile = get_profile(profile)
+    dpi = (profile.profile_data.get("media") or {}).get("dpi")
+    return dpi if isinstance(dpi, int) else None
+
+
+class MarkupTag:
+    """
+    Receipt markup tag.
+    """
+    __slots__ = ("name", "closing", "attributes")
+
+    def __init__(self, name: str, closing: bool = False,
+                 attributes: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.closing = closing
+        self.attributes = attributes or {}
+
+
+MarkupLine = List[Union[str, MarkupTag]]
+
+
+def parse_markup(markup: str) -> List[MarkupLine]:
+    """
+    Parse receipt markup into lines of text and tags.
+
+    Markup is text with tags:
+        - styles: <b>, <u>, <dw> double width, <dh> double height,
+          <big> double size, closed as </b>...
+        - alignment: <left>, <center>, <right>, from line start
+        - commands: <cut/>, <drawer/>, <feed n="3"/>, <hr/> rule line
+    Text is HTML unescaped, so that &lt; prints a "<".
+    Raises ValueError on unknown tags or invalid attributes.
+    """
+    lines: List[MarkupLine] = [[]]
+    position = 0
+    for match in MARKUP_TAG.finditer(markup):
+        _add_markup_text(lines, markup[position:match.start()])
+        position = match.end()
+        name = match.group(2)
+        if name not in STYLE_TAGS and name not in ALIGN_TAGS\
+                and name not in COMMAND_TAGS:
+            raise ValueError(f"Unknown receipt markup tag: {match.group(0)}")
+        tag = MarkupTag(
+            name,
+            closing=match.group(1) == "/",
+            attributes=dict(MARKUP_ATTRIBUTE.findall(match.group(3)))
+        )
+        if name == "feed":
+            get_feed_lines(tag)
+        lines[-1].append(tag)
+    _add_markup_text(lines, markup[position:])
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def get_feed_lines(tag: MarkupTag) -> int:
+    """
+    Get lines fed by a feed tag, bounded to 0-MAX_FEED_LINES.
+    Raises ValueError if n is not an integer.
+    """
+    value = tag.attributes.get("n", "1")
+    try:
+        lines = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid receipt markup feed lines: {value!r}")
+    return min(max(lines, 0), MAX_FEED_LINES)
+
+
+def _add_markup_text(lines: List[MarkupLine], text: str):
+    """Add text to markup lines, starting a line at each new line."""
+    for index, part in enumerate(text.split("\n")):
+        if index > 0:
+            lines.append([])
+        if part:
+            lines[-1].append(html.unescape(part))
+
+
+def apply_markup_tag(style: TextLine, tag: MarkupTag):
+    """Update style from a markup style or alignment tag."""
+    if tag.name in ALIGN_TAGS:
+        style.align = "left" if tag.closing else tag.name
+        return
+    for attribute in STYLE_TAGS.get(tag.name, ()):
+        setattr(style, attribute, not tag.closing)
+
+
+class TextReceiptRenderer:
+    """
+    Render structured receipts to ESC/POS bytes.
+
+    Text goes through escpos MagicEncode, which switches code pages
+    as needed among the ones of the printer profile.
+    """
+    def __init__(self,
+                 profile: Optional[str] = None,
+                 columns: Optional[int] = None,
+                 encode_image: Optional[ImageEncoder] = None,
+                 font_path: Optional[str] = None,
+                 atlas: Optional[GlyphAtlas] = None
+                 ):
+        # Commands are buffered, with profile code pages and fonts
+        self.printer = Dummy(profile=profile)
+        self.columns = columns or self.get_profile_columns()
+        self.encode_image = encode_image
+        # Glyphs of image lines, from TEXT_RECEIPT_FONT by default
+        self.atlas = atlas or glyph_atlas
+        self.font_path = font_path
+        self.encoder = Encoder(self.printer.profile.get_code_pages())
+        self._supported: Dict[str, bool] = {}
+        # Image lines bitmaps, sent as one image before next text
+        self._band: List[np.ndarray] = []
+        self.stats = {"text_lines": 0, "image_lines": 0}
+        self._style: Optional[Tuple[str, bool, bool, bool, bool]] = None
+
+    def get_profile_columns(self) -> int:
+        """Get Font A characters per line of the printer profile."""
+        return get_profile_columns(self.printer.profile)
+
+    def get_width_pixels(self) -> int:
+        """Get printable width in dots of the printer profile."""
+        media = self.printer.profile.profile_data.get("media") or {}
+        pixels = (media.get("width") or {}).get("pixels")
+        return pixels if isinstance(pixels, int) else DEFAULT_WIDTH_PIXELS
+
+    def is_supported(self, text: str) -> bool:
+        """Test if every character of text has a printer code page."""
+        for char in text:
+            if char < "\x80":
+                continue
+            supported = self._supported.get(char)
+            if supported is None:
+                supported = self.encoder.find_suitable_encoding(char) is not None
+                self._supported[char] = supported
+            if not supported:
+                return False
+        return True
+
+    def format_amount(
+        self,
+        amount: Optional[Union[float, str]],
+        receipt: TextReceiptSchemas
+    ) -> str:
+        """Format an amount with receipt decimals and currency."""
+        if amount is None:
+            return ""
+        if isinstance(amount, str):
+            return amount
+        value = f"{amount:.{receipt.decimals}f}"
+        return f"{value} {receipt.currency}" if receipt.currency else value
+
+    @staticmethod
+    def format_qty(qty: Union[int, float]) -> str:
+        """Format a quantity, without useless decimals."""
+        if float(qty).is_integer():
+            return str(int(qty))
+        return f"{qty:g}"
+
+    def justify(self, left: str, right: str, columns: int) -> List[str]:
+        """Get lines of left text wrapped before right aligned text."""
+        width = max(columns - len(right) - 1, 1) if right else columns
+        parts = textwrap.wrap(left, width=width) or [""]
+        first = parts[0]
+        if right:
+            first = first.ljust(columns - len(right)) + right
+        return [first] + parts[1:]
+
+    def get_block_lines(self, block: TextBlockSchemas) -> List[TextLine]:
+        """Get header or footer block lines, wrapped to line width."""
+        columns = self.columns // 2 if block.double_width else self.columns
+        lines = []
+        for paragraph in block.text.splitlines() or [""]:
+            for text in textwrap.wrap(paragraph, width=columns) or [""]:
+                lines.append(TextLine(
+                    text,
+                    align=block.align,
+                    bold=block.bold,
+                    underline=block.underline,
+                    double_width=block.double_width,
+                    double_height=block.double_height
+                ))
+        return lines
+
+    def get_item_lines(
+        self,
+        item: TextReceiptLineSchemas,
+        receipt: TextReceiptSchemas
+    ) -> List[TextLine]:
+        """Get item lines: name and price, quantity detail and note."""
+        name = item.name
+        detail = None
+        if item.qty is not None:
+            qty = self.format_qty(item.qty)
+            if item.unit_price is not None:
+                detail = f"  {qty} x {self.format_amount(item.unit_price, receipt)}"
+            else:
+                name = f"{qty} x {name}"
+        lines = [
+            TextLine(text) for text in self.justify(
+                name,
+                self.format_amount(item.price, receipt),
+                self.columns
+            )
+        ]
+        if detail is not None:
+            lines.append(TextLine(detail[:self.columns]))
+        if item.note:
+            lines.extend(
+                TextLine(f"  {text}")
+                for text in textwrap.wrap(item.note, width=self.columns - 2)
+            )
+        return lines
+
+    def get_lines(self, receipt: TextReceiptSchemas) -> List[TextLine]:
+        """Get all receipt lines, sections separated by a rule."""
+        sections = [
+            [
+                line for block in receipt.header
+                for line in self.get_block_lines(block)
+            ],
+            [
+                line for item in receipt.lines
+                for line in self.get_item_lines(item, receipt)
+            ],
+            [
+                TextLine(
+                    text,
+                    bold=total.bold,
+                    double_height=total.double_height
+                )
+                for total in receipt.totals
+                for text in self.justify(
+                    total.label,
+                    self.format_amount(total.amount, receipt),
+                    self.columns
+                )
+            ],
+            [
+                line for block in receipt.footer
+                for line in self.get_block_lines(block)
+            ]
+        ]
+        lines = []
+        for section in sections:
+            if not section:
+                continue
+            if lines:
+                lines.append(TextLine("-" * self.columns))
+            lines.extend(section)
+        return lines
+
+    def set_style(self, line: TextLine):
+        """Send line style commands, if it differs from the current one."""
+        style = line.get_style()
+        if style == self._style:
+            return
+        self._style = style
+        self.printer.set(
+            align=line.align,
+            bold=line.bold,
+            underline=1 if line.underline else 0,
+            normal_textsize=True,
+            double_width=line.double_width,
+            double_height=line.double_height
+        )
+
+    def add_image_line(self, line: TextLine):
+        """Rasterize a line from glyph atlas, in the pending band."""
+        self._band.append(self.atlas.render_line(
+            line.text,
+            width=self.get_width_pixels(),
+            height=DEFAULT_LINE_HEIGHT,
+            align=line.align,
+            bold=line.bold,
+            underline=line.underline,
+            double_width=line.double_width,
+            double_height=line.double_height,
+            font_path=self.font_path
+        ))
+        self.stats["image_lines"] += 1
+
+    def iter_flush_band(self) -> Iterator[bytes]:
+        """Get pending text bytes, then ESC/POS bytes of the pending band."""
+        if not self._band:
+            return
+        printer = self.printer
+        printer.set(align="left")
+        self._style = None
+        if printer.output:
+            yield printer.output
+            printer.clear()
+        yield from self.encode_image(self.atlas.compose_band(self._band))
+        self._band = []
+
+    def is_image_line(self, text: str) -> bool:
+        """Test if a line must be printed as an image."""
+        return self.encode_image is not None and not self.is_supported(text)
+
+    def begin(self):
+        """Start a new ESC/POS buffer, from printer defaults."""
+        self.printer.clear()
+        self.printer.hw("INIT")
+        self._style = None
+        self._band = []
+        self.stats = {"text_lines": 0, "image_lines": 0}
+
+    def iter_end(self) -> Iterator[bytes]:
+        """Get remaining bytes, restoring printer default style."""
+        yield from self.iter_flush_band()
+        self.printer.set_with_default()
+        self._style = None
+        if self.printer.output:
+            yield self.printer.output
+        self.printer.clear()
+
+    def iter_lines(self, lines: Iterable[TextLine]) -> Iterator[bytes]:
+        """Get ESC/POS bytes of lines, text runs ended by each image line."""
+        for line in lines:
+            if self.is_image_line(line.text):
+                self.add_image_line(line)
+                continue
+            yield from self.iter_flush_band()
+            self.set_style(line)
+            self.printer.textln(line.text)
+            self.stats["text_lines"] += 1
+
+    def iter_render(self, receipt: TextReceiptSchemas) -> Iterator[bytes]:
+        """
+        Get ESC/POS bytes of a receipt,
+        text runs ended by each image line.
+        """
+        self.begin()
+        yield from self.iter_lines(self.get_lines(receipt))
+        yield from self.iter_end()
+
+    def render_lines(self, lines: Iterable[TextLine]) -> bytes:
+        """Get ESC/POS bytes of lines, the next line sets its style again."""
+        data = b"".join(self.iter_lines(lines))
+        data += b"".join(self.iter_flush_band()) + self.printer.output
+        self.printer.clear()
+        self._style = None
+        return data
+
+    def get_ticket_items(
+        self,
+        receipt: ItemTicketsSchemas
+    ) -> List[TextReceiptLineSchemas]:
+        """Get item line of each ticket, split per unit if requested."""
+        items = []
+        for item in receipt.lines:
+            qty = item.qty
+            if not receipt.per_unit or qty is None\
+                    or not float(qty).is_integer() or qty <= 1:
+                items.append(item)
+                continue
+            price = item.unit_price
+            if price is None and isinstance(item.price, (int, float)):
+                price = item.price / qty
+            unit = item.model_copy(update={
+                "qty": 1,
+                "unit_price": None,
+                "price": price
+            })
+            items.extend([unit] * int(qty))
+        return items
+
+    def iter_render_tickets(
+        self,
+        receipt: ItemTicketsSchemas
+    ) -> Iterator[bytes]:
+        """
+        Get ESC/POS bytes of one ticket per item, cut between tickets.
+
+        Header and footer are rendered once, and their bytes
+        reused by every ticket, only item lines are rendered per ticket.
+        """
+        self.begin()
+        rule = TextLine("-" * self.columns)
+        header = [
+            line for block in receipt.header
+            for line in self.get_block_lines(block)
+        ]
+        footer = [
+            line for block in receipt.footer
+            for line in self.get_block_lines(block)
+        ]
+        init = self.printer.output
+        self.printer.clear()
+        header_data = self.render_lines(header + [rule] if header else [])
+        footer_data = self.render_lines([rule] + footer if footer else [])
+        self.printer.cut(feed=True)
+        cut_data = self.printer.output
+        self.printer.clear()
+        items = self.get_ticket_items(receipt)
+        yield init
+        for index, item in enumerate(items):
+            lines = self.get_item_lines(item, receipt)
+            if receipt.numbering:
+                lines.append(TextLine(
+                    f"{index + 1}/{len(items)}",
+                    align="right"
+                ))
+            yield header_data
+            yield self.render_lines(lines)
+            yield footer_data
+            if index < len(items) - 1:
+                yield cut_data
+        yield from self.iter_end()
+        self.stats["tickets"] = len(items)
+
+    def render_tickets(self, receipt: ItemTicketsSchemas) -> bytes:
+        """Get ESC/POS bytes of per item tickets."""
+        return b"".join(self.iter_render_tickets(receipt))
+
+    def render(self, receipt: TextReceiptSchemas) -> bytes:
+        """Get ESC/POS bytes of a receipt."""
+        return b"".join(self.iter_render(receipt))
+
+    def run_command(self, tag: MarkupTag, style: TextLine):
+        """Run a markup command tag: cut, drawer, feed or hr."""
+        printer = self.printer
+        if tag.name == "cut":
+            printer.cut(feed=True)
+        elif tag.name == "drawer":
+            # Same pulse as EscPosHelper CMD_CASHDRAWER
+            printer.cashdraw(CASHDRAWER_PULSE)
+        elif tag.name == "feed":
+            # ESC d n, one command whatever the number of lines
+            printer.print_and_feed(get_feed_lines(tag))
+        elif tag.name == "hr":
+            self.set_style(style)
+            columns = self.columns // 2 if style.double_width else self.columns
+            printer.textln(tag.attributes.get("char", "-")[:1] * columns)
+
+    def iter_render_markup(self, markup: str) -> Iterator[bytes]:
+        """
+        Get ESC/POS bytes of a receipt markup, see parse_markup().
+
+        Lines are printed as images when some of their characters
+        have no printer code page, with the style of their first text.
+        """
+        self.begin()
+        style = TextLine("")
+        for tokens in parse_markup(markup):
+            text = "".join(
+                token for token in tokens if isinstance(token, str)
+            )
+            commands = []
+            if self.is_image_line(text):
+                line = None
+                for token in tokens:
+                    if isinstance(token, str):
+                        if line is None:
+                            line = TextLine(text, *style.get_style())
+                    elif token.name in COMMAND_TAGS:
+                        commands.append(token)
+                    else:
+                        apply_markup_tag(style, token)
+                self.add_image_line(line)
+            else:
+                yield from self.iter_flush_band()
+                for token in tokens:
+                    if isinstance(token, str):
+                        self.set_style(style)
+                        self.printer.text(token)
+                    elif token.name in COMMAND_TAGS:
+                        if token.name == "hr" and text:
+                            commands.append(token)
+                        else:
+                            self.run_command(token, style)
+                    else:
+                        apply_markup_tag(style, token)
+                # Lines with tags only are not printed
+                if text or not tokens:
+                    self.printer.text("\n")
+                    self.stats["text_lines"] += 1
+            if commands:
+                yield from self.iter_flush_band()
+            for command in commands:
+                self.run_command(command, style)
+        yield from self.iter_end()
+
+    def render_markup(self, markup: str) -> bytes:
+        """Get ESC/POS bytes of a receipt markup."""
+        return b"".join(self.iter_render_markup(markup))
@@ -0,0 +1,172 @@
+"""
+Span timing hooks for hw_proxy module
+
+Print path stages run inside named spans.
+Hooks are called when spans start and end,
+so metrics, logs, profilers or tracers can follow each stage.
+
+Hooks are objects with optional on_start(span) and on_end(span) methods,
+or plain callables called with ended spans.
+They are added with tracer.add_hook(), or listed in TRACE_HOOKS setting
+as "module.path:attribute" of a hook or of a hook factory.
+"""
+import importlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Union
+from hw_proxy.core.config import settings
+
+
+logger = logging.getLogger("hw_proxy")
+
+
+class Span:
+    """
+    Timed stage of a printer operation.
+    """
+    __slots__ = (
+        "name", "attributes", "parent", "started_at", "start", "end", "error"
+    )
+
+    def __init__(self,
+                 name: str,
+                 attributes: Optional[dict] = None,
+                 parent: Optional["Span"] = None
+                 ):
+        self.name = name
+        self.attributes = attributes or {}
+        self.parent = parent
+        # Wall clock start, and perf_counter bounds
+        self.started_at = time()
+        self.start = perf_counter()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Get span seconds, until now if not ended."""
+        end = self.end if self.end is not None else perf_counter()
+        return end - self.start
+
+    def to_dict(self) -> dict:
+        """Get span as dict, for structured logs."""
+        return {
+            "span": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 6),
+            "error": self.error,
+            **self.attributes
+        }
+
+
+class SpanHook:
+    """
+    Base span hook, override on_start and/or on_end.
+    """
+    def on_start(self, span: Span):
+        """Called when span starts."""
+
+    def on_end(self, span: Span):
+        """Called when span ends."""
+
+
+class LoggingSpanHook(SpanHook):
+    """
+    Log ended spans as JSON lines, at debug level.
+    """
+    def on_end(self, span: Span):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[span] {json.dumps(span.to_dict(), default=str)}")
+
+
+Hook = Union[SpanHook, Callable[[Span], None]]
+
+
+class Tracer:
+    """
+    Span factory calling registered hooks.
+
+    Spans opened in a thread are nested under its current span.
+    Hook errors are logged, never raised in the print path.
+    """
+    def __init__(self):
+        self._hooks: List[Hook] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_hook(self, hook: Hook) -> Hook:
+        """Add a span hook."""
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook: Hook):
+        """Remove a span hook."""
+        with self._lock:
+            self._hooks = [item for item in self._hooks if item is not hook]
+
+    def load_hooks(self, paths: Iterable[str]):
+        """
+        Add hooks from "module.path:attribute" paths.
+
+        Attributes which are classes are instantiated.
+        """
+        for path in paths:
+            try:
+                module_name, _, attribute = path.partition(":")
+                hook = getattr(importlib.import_module(module_name), attribute)
+                if isinstance(hook, type):
+                    hook = hook()
+                self.add_hook(hook)
+                logger.debug(f"[Tracer] Span hook loaded: {path}")
+            except Exception as e:
+                logger.error(
+                    f"[Tracer] Unable to load span hook {path}, error: {e}"
+                )
+
+    def get_current_span(self) -> Optional[Span]:
+        """Get innermost open span of current thread."""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a span."""
+        hooks = self._hooks
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, attributes, parent=stack[-1] if stack else None)
+        self._call(hooks, "on_start", span)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.end = perf_counter()
+            stack.pop()
+            self._call(hooks, "on_end", span)
+
+    @staticmethod
+    def _call(hooks: List[Hook], method: str, span: Span):
+        """Call hooks method, plain callables on end only."""
+        for hook in hooks:
+            try:
+                if hasattr(hook, method):
+                    getattr(hook, method)(span)
+                elif method == "on_end" and callable(hook):
+                    hook(span)
+            except Exception as e:
+                logger.error(f"[Tracer] Span hook error: {e}")
+
+
+tracer = Tracer()
+if settings.TRACE_LOG_SPANS:
+    tracer.add_hook(LoggingSpanHook())
+tracer.load_hooks(settings.TRACE_HOOKS)